@@ -1,6 +1,6 @@
 # __init__.py
 from fastapi import APIRouter
-from api import plan_trip, fetch_destinations, weather, flights, hotels
+from api import plan_trip, fetch_destinations, weather, flights, hotels, autocomplete, nearby, profiles
 
 api_router = APIRouter()
 api_router.include_router(plan_trip.router, prefix="/plan-trip", tags=["Trip Planning"])
@@ -8,3 +8,6 @@ api_router.include_router(fetch_destinations.router, prefix="/fetch-destinations
 api_router.include_router(weather.router, prefix="/weather", tags=["Weather"])
 api_router.include_router(flights.router, prefix="/flights", tags=["Flights"])
 api_router.include_router(hotels.router, prefix="/hotels", tags=["Hotels"])
+api_router.include_router(autocomplete.router, prefix="/autocomplete", tags=["Destinations"])
+api_router.include_router(nearby.router, prefix="/nearby", tags=["Destinations"])
+api_router.include_router(profiles.router, prefix="/profiles", tags=["Diagnostics"])
@@ -0,0 +1,29 @@
+# autocomplete.py
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services.autocomplete import get_autocomplete_index
+
+router = APIRouter()
+
+KINDS = ("city", "airport")
+
+
+# async: the lookup is a few microseconds of in-memory work, not worth a threadpool hop
+@router.get("/")
+async def autocomplete(
+	q: str = Query(..., min_length=1, max_length=100),
+	limit: int = Query(8, ge=1, le=20),
+	types: str = Query("city,airport", description="Comma-separated: city, airport"),
+	lat: Optional[float] = Query(None, ge=-90, le=90),
+	lon: Optional[float] = Query(None, ge=-180, le=180),
+):
+	"""Typeahead suggestions for origin/destination fields, served from memory."""
+	kinds = tuple(k for k in (t.strip() for t in types.split(",")) if k)
+	unknown = [k for k in kinds if k not in KINDS]
+	if unknown:
+		raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+	near = (lat, lon) if lat is not None and lon is not None else None
+	suggestions = get_autocomplete_index().search(q, limit=limit, kinds=kinds or None, near=near)
+	return {"query": q, "suggestions": suggestions}
@@ -0,0 +1,45 @@
+# nearby.py
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services.geo_index import KINDS, get_destination_index
+
+router = APIRouter()
+
+
+# async: queries run against an in-memory index in well under a millisecond
+@router.get("/")
+async def nearby(
+	destination: str = Query(..., min_length=1, max_length=100),
+	lat: Optional[float] = Query(None, ge=-90, le=90),
+	lon: Optional[float] = Query(None, ge=-180, le=180),
+	anchor: Optional[str] = Query(None, description="place_id, property_id or name of an indexed point"),
+	types: str = Query("place,hotel,restaurant", description="Comma-separated: place, hotel, restaurant"),
+	radius_km: Optional[float] = Query(None, gt=0, le=50),
+	k: int = Query(10, ge=1, le=100),
+):
+	"""
+	Places, hotels and restaurants near a point or an indexed anchor, from
+	the destination's index built by earlier trip plans. With radius_km,
+	everything within the radius (up to k); otherwise the k nearest.
+	"""
+	kinds = tuple(t for t in (t.strip() for t in types.split(",")) if t)
+	unknown = [t for t in kinds if t not in KINDS]
+	if unknown:
+		raise HTTPException(status_code=400, detail=f"Unknown types: {', '.join(unknown)}")
+	index = get_destination_index(destination)
+	if index is None:
+		raise HTTPException(status_code=404, detail=f"No indexed places for {destination}; plan a trip there first")
+	if anchor:
+		found = index.find(anchor)
+		if found is None:
+			raise HTTPException(status_code=404, detail=f"Anchor not found: {anchor}")
+		lat, lon = found[1]["lat"], found[1]["lon"]
+	elif lat is None or lon is None:
+		raise HTTPException(status_code=400, detail="Pass lat and lon, or an anchor")
+	if radius_km is not None:
+		results = index.radius(lat, lon, radius_km, kinds=kinds or None, limit=k)
+	else:
+		results = index.nearest(lat, lon, k, kinds=kinds or None)
+	return {"destination": destination, "center": {"lat": lat, "lon": lon}, "results": results}
@@ -1,12 +1,14 @@
 # plan_trip.py
 from fastapi import APIRouter
 from models.trip import TripRequest, TripResponse
-from services.ai_trip_planner import generate_itinerary
 
 router = APIRouter()
 
 @router.post("/", response_model=TripResponse)
 async def plan_trip(request: TripRequest):
+    # Imported on first use to keep app startup lean
+    from services.ai_trip_planner import generate_itinerary
+
     payload = request.dict()
     result = await generate_itinerary(payload)
 
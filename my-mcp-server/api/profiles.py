@@ -0,0 +1,33 @@
+# profiles.py
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from core.profiling import authorized, load_flamegraph, load_profile
+
+router = APIRouter()
+
+
+def _require_token(x_profile: str) -> None:
+	# the same PROFILE_TOKEN that turns profiling on; a profile exposes file paths and timings
+	if not authorized(x_profile):
+		raise HTTPException(status_code=403, detail="Profiling is not enabled for this caller")
+
+
+@router.get("/{profile_id}")
+async def get_profile(profile_id: str, x_profile: str = Header(None)):
+	"""Summary of a profiled run: duration, sample count, hottest stacks and top allocations."""
+	_require_token(x_profile)
+	profile = load_profile(profile_id)
+	if profile is None:
+		raise HTTPException(status_code=404, detail=f"No profile {profile_id}")
+	return profile
+
+
+@router.get("/{profile_id}/flamegraph", response_class=PlainTextResponse)
+async def get_flamegraph(profile_id: str, x_profile: str = Header(None)):
+	"""Collapsed stacks for flamegraph.pl or speedscope."""
+	_require_token(x_profile)
+	folded = load_flamegraph(profile_id)
+	if folded is None:
+		raise HTTPException(status_code=404, detail=f"No profile {profile_id}")
+	return PlainTextResponse(folded)
@@ -1,64 +1,201 @@
 # API endpoints for comprehensive travel planning workflow
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from models.trip import TripRequest, TripResponse
-from services.ai_trip_planner import generate_itinerary
-from services.booking_integration import create_trip_summary_export
-from typing import Dict, Any
+from core.serialization import dumps
+from core.responses import FastJSONResponse
+from services.response_shaping import shape_plan_response
+from services.trip_store import get_trip_store
+from services.trip_export import get_export_manager, MEDIA_TYPES
+from services.live_alerts import get_alert_hub, forecast_alerts
+from services.plan_jobs import get_job_manager, job_status, JobQueueFull, DEFAULT_PRIORITY, TERMINAL_STATES
+from typing import Dict, Any, Optional, Tuple
+import asyncio
 import json
+import os
+import re
 
 router = APIRouter(prefix="/api/v1/travel", tags=["travel-planning"])
 
+_EXPORT_FILENAME = re.compile(r"^([0-9a-f]{64})\.(pdf|ics|eml)$")
+
+
+async def _load_trip(trip_id: str) -> Dict[str, Any]:
+    """Fetch a stored plan or 404; never recomputes anything."""
+    plan = await get_trip_store().get(trip_id)
+    if plan is None:
+        raise HTTPException(status_code=404, detail=f"Trip {trip_id} not found")
+    return plan
+
+async def _plan_and_store(payload: Dict[str, Any], progress=None) -> Tuple[str, Dict[str, Any]]:
+    """Generate a plan and persist a compact copy; returns (trip_id, result)."""
+    # Imported on first use to keep app startup lean
+    from services.ai_trip_planner import generate_itinerary
+
+    result = await generate_itinerary(payload, progress=progress)
+
+    # Persist a compact copy (the summary is rebuilt from trip_data on read)
+    trip_id = await get_trip_store().save({
+        "request": payload,
+        "trip_data": result.get("trip_data", {}),
+        "estimated_cost": result.get("estimated_cost"),
+    })
+    return trip_id, result
+
+def _quick_summary(payload: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+    trip_data = result.get("trip_data", {})
+    return {
+        "destination": payload.get("destination"),
+        "dates": f"{payload.get('start_date')} to {payload.get('end_date')}",
+        "estimated_cost": result.get("estimated_cost"),
+        "total_activities": len(result.get("itinerary", [])),
+        "hotels_found": len(trip_data.get("hotels", [])),
+        "flights_found": len(trip_data.get("flights", [])),
+        "restaurants_found": len(trip_data.get("restaurants", [])),
+        "events_found": len(trip_data.get("events", []))
+    }
+
+async def _run_plan_job(payload: Dict[str, Any], progress) -> Dict[str, Any]:
+    """Job runner: the plan itself goes to the trip store, the job keeps a small result."""
+    trip_id, result = await _plan_and_store(payload, progress=progress)
+    return {
+        "trip_id": trip_id,
+        "result_url": f"/api/v1/travel/plan/{trip_id}",
+        "quick_summary": _quick_summary(payload, result)
+    }
+
+async def start_plan_jobs() -> None:
+    await get_job_manager().start(runner=_run_plan_job)
+
+def _client_id(request: Request) -> str:
+    return request.headers.get("x-client-id") or (request.client.host if request.client else "anonymous")
+
 @router.post("/plan", response_model=Dict[str, Any])
-async def create_travel_plan(request: TripRequest):
+async def create_travel_plan(
+    request: TripRequest,
+    http_request: Request,
+    mode: str = Query("sync", pattern="^(sync|job)$"),
+    priority: int = Query(DEFAULT_PRIORITY, ge=0, le=9),
+    fields: Optional[str] = Query(None, description="Comma-separated dotted paths to keep, e.g. trip_plan.itinerary,trip_plan.hotels.name"),
+    normalized: bool = Query(False, description="List each flight/hotel/restaurant/event once under `entities` and reference it by id"),
+):
     """
     Phase 1-3: Comprehensive travel planning with data gathering,
     planning, and detailed recommendations.
+
+    With mode=job the plan is queued and a job id is returned immediately;
+    poll /jobs/{job_id} or subscribe to /jobs/{job_id}/events.
+    `fields` and `normalized` shape the response (see services.response_shaping).
     """
+    # Convert request to dict for orchestration
+    payload = request.dict()
+
+    if mode == "job":
+        try:
+            job = await get_job_manager().submit(payload, client_id=_client_id(http_request), priority=priority)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+        return JSONResponse(status_code=202, content={
+            "status": "accepted",
+            "job_id": job["job_id"],
+            "status_url": f"/api/v1/travel/jobs/{job['job_id']}",
+            "events_url": f"/api/v1/travel/jobs/{job['job_id']}/events"
+        })
+
     try:
-        # Convert request to dict for orchestration
-        payload = request.dict()
-        
         # Generate comprehensive trip plan
-        result = await generate_itinerary(payload)
+        trip_id, result = await _plan_and_store(payload)
         
-        return {
+        return FastJSONResponse(shape_plan_response({
             "status": "success",
+            "trip_id": trip_id,
             "trip_plan": result.get("trip_data", {}),
-            "quick_summary": {
-                "destination": payload.get("destination"),
-                "dates": f"{payload.get('start_date')} to {payload.get('end_date')}",
-                "estimated_cost": result.get("estimated_cost"),
-                "total_activities": len(result.get("itinerary", [])),
-                "hotels_found": len(result.get("trip_data", {}).get("hotels", [])),
-                "flights_found": len(result.get("trip_data", {}).get("flights", [])),
-                "restaurants_found": len(result.get("trip_data", {}).get("restaurants", [])),
-                "events_found": len(result.get("trip_data", {}).get("events", []))
-            }
-        }
+            "quick_summary": _quick_summary(payload, result)
+        }, fields=fields, normalized=normalized))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Trip planning failed: {str(e)}")
 
+@router.get("/plan/{trip_id}")
+async def get_trip_plan(
+    trip_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated dotted paths to keep"),
+    normalized: bool = Query(False, description="Reference repeated entities by id"),
+):
+    """Return a stored plan (used as the result of plan jobs)."""
+    plan = await _load_trip(trip_id)
+    return FastJSONResponse(shape_plan_response({
+        "status": "success",
+        "trip_id": trip_id,
+        "trip_plan": plan.get("trip_data", {}),
+        "estimated_cost": plan.get("estimated_cost")
+    }, fields=fields, normalized=normalized))
+
+@router.get("/jobs/{job_id}")
+async def get_plan_job(job_id: str):
+    """Poll a plan job's status; the result carries the trip_id once it succeeds."""
+    job = await get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_status(job)
+
+@router.delete("/jobs/{job_id}")
+async def cancel_plan_job(job_id: str):
+    job = await get_job_manager().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job_status(job)
+
+@router.get("/jobs/{job_id}/events")
+async def stream_plan_job(job_id: str):
+    """Server-sent events with every status/stage change until the job finishes."""
+    manager = get_job_manager()
+    job = await manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def events():
+        queue = manager.subscribe(job_id)
+        try:
+            status = job_status(job)
+            yield f"event: status\ndata: {dumps(status)}\n\n"
+            while status["status"] not in TERMINAL_STATES:
+                try:
+                    status = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: status\ndata: {dumps(status)}\n\n"
+        finally:
+            manager.unsubscribe(job_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
 @router.get("/plan/{trip_id}/summary")
 async def get_trip_summary(trip_id: str):
     """
     Phase 4: Generate formatted trip summary with booking links,
     maps, and export options.
     """
-    # In a real implementation, you'd fetch trip data from database
-    # For now, return structure for testing
-    
+    from services.booking_integration import create_trip_summary_export
+
+    plan = await _load_trip(trip_id)
+    trip_data = plan.get("trip_data", {})
+    booking_links = trip_data.get("booking_links", {})
+    summary = await create_trip_summary_export(trip_data, trip_id=trip_id)
+
     return {
         "trip_id": trip_id,
         "summary_ready": True,
+        "summary": summary,
         "export_options": {
             "pdf": f"/api/v1/travel/export/{trip_id}/pdf",
             "calendar": f"/api/v1/travel/export/{trip_id}/calendar", 
             "email": f"/api/v1/travel/export/{trip_id}/email"
         },
         "booking_integration": {
-            "hotels_bookable": True,
-            "flights_bookable": True,
-            "packages_available": True
+            "hotels_bookable": bool(booking_links.get("hotels")),
+            "flights_bookable": bool(booking_links.get("flights")),
+            "packages_available": bool(booking_links.get("packages"))
         },
         "maps_integration": {
             "route_map": f"/api/v1/travel/maps/{trip_id}/route",
@@ -74,34 +211,36 @@ async def initiate_booking(trip_id: str, booking_request: Dict[str, Any]):
     """
     booking_type = booking_request.get("type")  # hotel, flight, package
     selected_items = booking_request.get("items", [])
-    
-    if booking_type == "hotel":
-        # Generate hotel booking links
-        booking_links = []
-        for item in selected_items:
-            booking_links.append({
-                "hotel_name": item.get("name"),
-                "booking_url": f"https://booking.com/hotel/{item.get('id')}",
-                "provider": "booking.com"
-            })
-        return {"booking_links": booking_links}
-    
-    elif booking_type == "flight":
-        # Generate flight booking links
-        booking_links = []
-        for item in selected_items:
-            booking_links.append({
-                "flight": item.get("flight_number"),
-                "booking_options": [
-                    {"provider": "expedia", "url": f"https://expedia.com/flights/{item.get('id')}"},
-                    {"provider": "kayak", "url": f"https://kayak.com/flights/{item.get('id')}"}
-                ]
-            })
-        return {"booking_links": booking_links}
-    
-    else:
+    if booking_type not in ("hotel", "flight", "package"):
         raise HTTPException(status_code=400, detail="Invalid booking type")
 
+    plan = await _load_trip(trip_id)
+    stored_links = plan.get("trip_data", {}).get("booking_links", {})
+
+    if booking_type == "package":
+        return {"trip_id": trip_id, "booking_links": stored_links.get("packages", [])}
+
+    # Links were generated with the plan; select them by index or name
+    key, name_field = ("hotels", "hotel_name") if booking_type == "hotel" else ("flights", "flight_info")
+    candidates = stored_links.get(key, [])
+    if not selected_items:
+        return {"trip_id": trip_id, "booking_links": candidates}
+
+    by_name = {str(link.get(name_field, "")).lower(): link for link in candidates}
+    booking_links = []
+    for item in selected_items:
+        idx = item.get("index")
+        if isinstance(idx, int) and 0 <= idx < len(candidates):
+            booking_links.append(candidates[idx])
+            continue
+        name = str(item.get("name") or item.get("flight_number") or "").lower()
+        link = by_name.get(name)
+        if link is None and name:
+            link = next((l for n, l in by_name.items() if name in n), None)
+        if link is not None:
+            booking_links.append(link)
+    return {"trip_id": trip_id, "booking_links": booking_links}
+
 @router.get("/export/{trip_id}/{format}")
 async def export_trip(trip_id: str, format: str):
     """
@@ -109,15 +248,92 @@ async def export_trip(trip_id: str, format: str):
     """
     if format not in ["pdf", "calendar", "email"]:
         raise HTTPException(status_code=400, detail="Invalid export format")
-    
-    # In real implementation, generate actual files
+    plan = await _load_trip(trip_id)
+
+    # Rendering happens in the export worker pool; poll again while "pending"
+    try:
+        export = await get_export_manager().request(trip_id, plan.get("trip_data", {}), format)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Export failed: {str(e)}")
+
     return {
         "trip_id": trip_id,
         "format": format,
-        "download_url": f"/downloads/{trip_id}.{format}",
-        "status": "ready",
-        "generated_at": "2024-01-15T10:30:00Z"
+        "download_url": f"/api/v1/travel/downloads/{export['filename']}",
+        "status": export["status"],
+        "size": export.get("size"),
+        "generated_at": export.get("generated_at")
+    }
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single `bytes=` range; returns inclusive (start, end) or None if unsatisfiable."""
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:  # suffix range: last N bytes
+            length = int(last)
+            if length <= 0:
+                return None
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return None
+    return start, min(end, size - 1)
+
+def _iter_file(path: str, start: int, length: int, chunk_size: int = 64 * 1024):
+    # Sync generator: Starlette runs it in the threadpool, off the event loop
+    with open(path, "rb") as fh:
+        fh.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = fh.read(min(chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+@router.get("/downloads/{filename}")
+async def download_export(filename: str, request: Request):
+    """
+    Stream a rendered export. Files are content-addressed, so they are served
+    as immutable with the digest as ETag; single byte ranges are supported.
+    """
+    match = _EXPORT_FILENAME.match(filename)
+    if not match:
+        raise HTTPException(status_code=404, detail="Export not found")
+    path = get_export_manager().path_for(filename)
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Export not found")
+
+    etag = f'"{match.group(1)}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
     }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    media_type = MEDIA_TYPES[match.group(2)]
+    range_header = request.headers.get("range")
+    if range_header:
+        byte_range = _parse_range(range_header, size)
+        if byte_range is None:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        start, end = byte_range
+        length = end - start + 1
+        headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)})
+        return StreamingResponse(_iter_file(path, start, length), status_code=206, media_type=media_type, headers=headers)
+
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(_iter_file(path, 0, size), media_type=media_type, headers=headers)
 
 @router.post("/feedback/{trip_id}")
 async def submit_feedback(trip_id: str, feedback: Dict[str, Any]):
@@ -141,6 +357,19 @@ async def get_ongoing_support(trip_id: str):
     """
     Phase 5: Provide ongoing travel support and real-time updates.
     """
+    plan = await _load_trip(trip_id)
+    trip_data = plan.get("trip_data", {})
+
+    # Live alerts from the city's poller; until its first poll, fall back to
+    # the forecast stored with the plan
+    hub = _register_live_trip(trip_id, trip_data)
+    current_alerts = hub.current_alerts(trip_id)
+    if current_alerts is None:
+        current_alerts = list(forecast_alerts(trip_data.get("forecast", [])).values())
+    safety = trip_data.get("safety_info") or {}
+    for advisory in safety.get("advisories", []):
+        current_alerts.append({"type": "safety", "message": advisory, "severity": "medium"})
+
     return {
         "trip_id": trip_id,
         "support_features": {
@@ -150,13 +379,11 @@ async def get_ongoing_support(trip_id: str):
             "local_recommendations": True,
             "emergency_contacts": True
         },
-        "current_alerts": [
-            {
-                "type": "weather",
-                "message": "Light rain expected tomorrow, consider indoor activities",
-                "severity": "low"
-            }
-        ],
+        "live_updates": {
+            "websocket": f"/api/v1/travel/support/{trip_id}/ws",
+            "events": f"/api/v1/travel/support/{trip_id}/events"
+        },
+        "current_alerts": current_alerts,
         "emergency_info": {
             "local_emergency": "911",
             "embassy_contact": "+1-555-0123",
@@ -164,6 +391,58 @@ async def get_ongoing_support(trip_id: str):
         }
     }
 
+def _register_live_trip(trip_id: str, trip_data: Dict[str, Any]):
+    hub = get_alert_hub()
+    hub.register(trip_id, trip_data.get("destination") or "", trip_data.get("start_date"), trip_data.get("end_date"))
+    return hub
+
+@router.get("/support/{trip_id}/events")
+async def stream_support_alerts(trip_id: str):
+    """Server-sent alert snapshot followed by deltas as the city's forecast changes."""
+    plan = await _load_trip(trip_id)
+    hub = _register_live_trip(trip_id, plan.get("trip_data", {}))
+
+    async def events():
+        queue = hub.subscribe(trip_id)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: {message['type']}\ndata: {dumps(message)}\n\n"
+        finally:
+            hub.unsubscribe(trip_id, queue)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/support/{trip_id}/ws")
+async def support_alerts_ws(websocket: WebSocket, trip_id: str):
+    """WebSocket variant of the alert stream."""
+    plan = await get_trip_store().get(trip_id)
+    if plan is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    hub = _register_live_trip(trip_id, plan.get("trip_data", {}))
+    queue = hub.subscribe(trip_id)
+
+    async def pump():
+        while True:
+            await websocket.send_text(dumps(await queue.get()))
+
+    sender = asyncio.create_task(pump())
+    try:
+        while True:
+            # client messages are ignored; receiving notices disconnects promptly
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        hub.unsubscribe(trip_id, queue)
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint for monitoring."""
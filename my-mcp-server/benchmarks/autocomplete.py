@@ -0,0 +1,104 @@
+"""
+Throughput benchmark for the autocomplete endpoint.
+
+Replays a mix of typeahead queries (short prefixes, full names, IATA codes,
+typos, misses) against the in-memory index directly and through the ASGI app
+(in-process, no network), then reports queries per second and latency
+percentiles for each. The ASGI figures include the in-process httpx client
+and the app's middleware, so they understate what a uvicorn worker serves.
+
+Run (from project root):
+  python benchmarks/autocomplete.py
+  python benchmarks/autocomplete.py --seconds 5 --skip-asgi
+
+Exits non-zero when index throughput falls below AUTOCOMPLETE_MIN_QPS
+(default 2000) or p99 latency exceeds AUTOCOMPLETE_MAX_P99_MS (default 10).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MIN_QPS = float(os.getenv("AUTOCOMPLETE_MIN_QPS", "2000"))
+MAX_P99_MS = float(os.getenv("AUTOCOMPLETE_MAX_P99_MS", "10"))
+
+# what a user types, keystroke by keystroke, plus typos and misses
+WORDS = ["london", "paris", "new york", "tokyo", "san francisco", "barcelona", "munich", "sao paulo"]
+QUERIES = [w[:n] for w in WORDS for n in range(1, len(w) + 1)]
+QUERIES += ["lhr", "jfk", "cdg", "heathrow", "tokio", "barcelna", "amstrdam", "zzzz"]
+
+
+def _percentiles(samples_ms: List[float]) -> Tuple[float, float, float]:
+    qs = statistics.quantiles(samples_ms, n=100)
+    return qs[49], qs[94], qs[98]
+
+
+def run_sync(fn: Callable[[str], object], seconds: float) -> Tuple[float, List[float]]:
+    samples: List[float] = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for q in QUERIES:
+            t = time.perf_counter()
+            fn(q)
+            samples.append((time.perf_counter() - t) * 1000)
+    return len(samples) / sum(samples) * 1000, samples
+
+
+async def run_asgi(seconds: float) -> Tuple[float, List[float]]:
+    import httpx
+    from main import app
+
+    samples: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            for q in QUERIES:
+                t = time.perf_counter()
+                resp = await client.get("/autocomplete/", params={"q": q})
+                resp.raise_for_status()
+                samples.append((time.perf_counter() - t) * 1000)
+    return len(samples) / sum(samples) * 1000, samples
+
+
+def report(name: str, qps: float, samples: List[float]) -> None:
+    p50, p95, p99 = _percentiles(samples)
+    print(f"== {name}: {qps:,.0f} qps over {len(samples)} queries")
+    print(f"   p50 {p50:.3f} ms, p95 {p95:.3f} ms, p99 {p99:.3f} ms")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=2.0, help="duration of each run")
+    parser.add_argument("--skip-asgi", action="store_true", help="only benchmark the index")
+    args = parser.parse_args()
+
+    from services.autocomplete import get_autocomplete_index
+
+    t = time.perf_counter()
+    index = get_autocomplete_index()
+    print(f"index built in {(time.perf_counter() - t) * 1000:.1f} ms ({len(index.keys)} keys)")
+
+    qps, samples = run_sync(index.search, args.seconds)
+    report("index", qps, samples)
+    ok = qps >= MIN_QPS and _percentiles(samples)[2] <= MAX_P99_MS
+
+    if not args.skip_asgi:
+        qps, samples = asyncio.run(run_asgi(args.seconds))
+        report("asgi", qps, samples)
+
+    print("OK" if ok else f"FAIL (need >= {MIN_QPS:.0f} qps and p99 <= {MAX_P99_MS:.0f} ms on the index)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Latency benchmark for the trip budget optimizer.
+
+Optimizes a ten-day trip (10 flight itineraries, 10 hotels, 50 events and
+two restaurant price levels) for a party of three several times and reports
+the median and worst run.
+
+Run (from project root):
+  python benchmarks/budget_optimizer.py
+  python benchmarks/budget_optimizer.py --runs 50
+
+Exits non-zero when the median exceeds BUDGET_OPTIMIZER_MAX_MS (default 50).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MAX_MS = float(os.getenv("BUDGET_OPTIMIZER_MAX_MS", "50"))
+
+DAYS = [f"2026-06-{d:02d}" for d in range(1, 11)]
+
+
+def trip(seed: int = 5) -> Dict[str, Any]:
+    rng = random.Random(seed)
+    return {
+        "itineraries": [
+            {"total_price": round(200 + rng.random() * 400, 2), "legs": [{"airline": "AZ", "stops": rng.randint(0, 1)}]}
+            for _ in range(10)
+        ],
+        "hotels": [
+            {"property_id": f"h{i}", "name": f"Hotel {i}", "price_per_night": round(50 + rng.random() * 250, 2),
+             "rating": round(2.5 + rng.random() * 2.5, 1)}
+            for i in range(10)
+        ],
+        "events": [{"name": f"Gig {i}", "date": DAYS[i % 10], "price": 30 + i} for i in range(50)],
+        "restaurants": [
+            {"name": "Cheap Eats", "price_level": "$", "rating": 4.0},
+            {"name": "Bistro", "price_level": "$$$", "rating": 4.6},
+        ],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=20, help="timed runs after one warm-up")
+    args = parser.parse_args()
+
+    from services.budget_optimizer import optimize_budget
+
+    external = trip()
+    optimize_budget(external, DAYS, budget=6000)  # warm-up (imports, NumPy paths)
+    samples: List[float] = []
+    for _ in range(args.runs):
+        t = time.perf_counter()
+        optimize_budget(external, DAYS, budget=6000, trip_style="luxury", adults=2, children=1)
+        samples.append((time.perf_counter() - t) * 1000)
+
+    median = statistics.median(samples)
+    print(f"== optimize_budget, 10 days / 50 events: median {median:.1f} ms, max {max(samples):.1f} ms over {args.runs} runs")
+    ok = median <= MAX_MS
+    print("OK" if ok else f"FAIL (median must be <= {MAX_MS:.0f} ms)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
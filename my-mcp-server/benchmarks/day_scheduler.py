@@ -0,0 +1,82 @@
+"""
+Latency benchmark for the itinerary day scheduler.
+
+Schedules 200 places (mixed opening hours, some closed one weekday) over two
+weeks with two bad-weather days, several times, and reports the median and
+worst run.
+
+Run (from project root):
+  python benchmarks/day_scheduler.py
+  python benchmarks/day_scheduler.py --runs 20 --places 400
+
+Exits non-zero when the median exceeds SCHEDULER_MAX_MS (default 200).
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+MAX_MS = float(os.getenv("SCHEDULER_MAX_MS", "200"))
+
+DAYS = [f"2026-05-{d:02d}" for d in range(1, 15)]
+
+
+def _hours(open_: str, close: str, closed_day: Optional[int] = None) -> Dict[str, Any]:
+    return {"periods": [
+        {"open": {"day": d, "time": open_}, "close": {"day": (d + (close < open_)) % 7, "time": close}}
+        for d in range(7) if d != closed_day
+    ]}
+
+
+def places(n: int, seed: int = 11) -> List[Dict[str, Any]]:
+    rng = random.Random(seed)
+    result = []
+    for i in range(n):
+        place = {
+            "name": f"Place {i}", "place_id": f"p{i}", "rating": round(3.5 + rng.random() * 1.5, 1),
+            "lat": 41.85 + rng.random() * 0.1, "lon": 12.45 + rng.random() * 0.1,
+            "types": [rng.choice(["museum", "park", "church", "tourist_attraction", "art_gallery"])],
+        }
+        roll = rng.random()
+        if roll < 0.5:
+            place["opening_hours"] = _hours("0900", "1700", closed_day=rng.randint(0, 6))
+        elif roll < 0.7:
+            place["opening_hours"] = _hours("1000", "1400")
+        result.append(place)
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="timed runs after one warm-up")
+    parser.add_argument("--places", type=int, default=200, help="candidate places")
+    args = parser.parse_args()
+
+    from services.day_scheduler import schedule_days
+
+    candidates = places(args.places)
+    schedule_days(DAYS[:1], candidates)  # warm-up (imports, NumPy paths)
+    samples: List[float] = []
+    for _ in range(args.runs):
+        t = time.perf_counter()
+        schedule_days(DAYS, candidates, bad_weather_days=DAYS[5:7], base={"lat": 41.9, "lon": 12.5}, mode="walking")
+        samples.append((time.perf_counter() - t) * 1000)
+
+    median = statistics.median(samples)
+    print(f"== schedule_days, {args.places} places / {len(DAYS)} days: median {median:.1f} ms, max {max(samples):.1f} ms over {args.runs} runs")
+    ok = median <= MAX_MS
+    print("OK" if ok else f"FAIL (median must be <= {MAX_MS:.0f} ms)")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
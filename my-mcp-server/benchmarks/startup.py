@@ -0,0 +1,135 @@
+"""
+Startup-time benchmark and import-time report for the server entrypoints.
+
+Each entrypoint is imported in a fresh interpreter under `python -X importtime`
+several times. The median wall time is compared against a budget and the
+slowest direct imports are listed, so a new eager import shows up by name.
+
+Run (from project root):
+  python benchmarks/startup.py                  # all entrypoints
+  python benchmarks/startup.py --entry mcp_server --runs 10 --top 15
+
+Budgets (ms) can be overridden with STARTUP_BUDGET_MS_<ENTRY>, e.g.
+STARTUP_BUDGET_MS_MCP_SERVER=600. Exits non-zero when a budget is exceeded
+or a module that should be lazy was imported at startup.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# entry module -> default budget in milliseconds
+BUDGETS_MS: Dict[str, float] = {
+    "mcp_server": 800.0,
+    "main": 1200.0,
+    "mcp_http_server": 1500.0,
+}
+
+# Modules that must not be imported until first use. httpx isn't listed: the
+# mcp SDK's session layer (and fastmcp) import it themselves.
+LAZY_MODULES: Dict[str, List[str]] = {
+    "mcp_server": ["core.http_client", "services.ai_trip_planner", "services.flights_api", "services.hotels_api"],
+    "main": ["services.ai_trip_planner"],
+    "mcp_http_server": ["readabilipy", "markdownify"],
+}
+
+# mcp_http_server refuses to import without these
+ENTRY_ENV: Dict[str, Dict[str, str]] = {
+    "mcp_http_server": {"AUTH_TOKEN": "benchmark", "MY_NUMBER": "0"},
+}
+
+
+def _budget_ms(entry: str) -> float:
+    env_key = f"STARTUP_BUDGET_MS_{entry.upper()}"
+    return float(os.getenv(env_key, BUDGETS_MS[entry]))
+
+
+def parse_importtime(stderr: str) -> List[Tuple[str, int, int, int]]:
+    """Parse `-X importtime` output into (module, depth, self_us, cumulative_us) rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        self_us, cum_us, raw_name = parts
+        # nesting is encoded as two extra spaces per level after the pipe
+        depth = (len(raw_name) - len(raw_name.lstrip(" ")) - 1) // 2
+        rows.append((raw_name.strip(), depth, int(self_us), int(cum_us)))
+    return rows
+
+
+def run_once(entry: str) -> Tuple[float, str]:
+    code = (
+        "import sys, time; t = time.perf_counter(); "
+        f"import {entry}; "
+        "print((time.perf_counter() - t) * 1000); "
+        f"print(','.join(m for m in {LAZY_MODULES.get(entry, [])!r} if m in sys.modules))"
+    )
+    env = {**os.environ, **ENTRY_ENV.get(entry, {})}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {entry} failed:\n{proc.stderr[-2000:]}")
+    out = proc.stdout.splitlines()
+    eager = out[1] if len(out) > 1 else ""
+    return float(out[0]), proc.stderr + "\n#eager:" + eager
+
+
+def bench(entry: str, runs: int, top: int) -> bool:
+    timings: List[float] = []
+    last_stderr = ""
+    for _ in range(runs):
+        import_ms, last_stderr = run_once(entry)
+        timings.append(import_ms)
+
+    eager = last_stderr.rsplit("#eager:", 1)[1].strip()
+    rows = parse_importtime(last_stderr)
+    # direct imports of the entrypoint (depth 1) are the actionable ones
+    direct = sorted((r for r in rows if r[1] == 1), key=lambda r: r[3], reverse=True)[:top]
+
+    median = statistics.median(timings)
+    budget = _budget_ms(entry)
+    ok = median <= budget and not eager
+
+    print(f"== {entry}: median {median:.1f} ms over {runs} runs (budget {budget:.0f} ms) {'OK' if ok else 'FAIL'}")
+    print(f"   min {min(timings):.1f} ms, max {max(timings):.1f} ms")
+    for name, _, self_us, cum_us in direct:
+        print(f"   {cum_us / 1000:8.1f} ms  {name}")
+    if eager:
+        print(f"   eagerly imported (should be lazy): {eager}")
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entry", action="append", choices=sorted(BUDGETS_MS), help="entrypoint(s) to measure")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="direct imports to list")
+    args = parser.parse_args()
+
+    ok = True
+    for entry in args.entry or list(BUDGETS_MS):
+        try:
+            ok = bench(entry, args.runs, args.top) and ok
+        except RuntimeError as e:
+            print(f"== {entry}: {e}")
+            ok = False
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
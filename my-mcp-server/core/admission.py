@@ -0,0 +1,242 @@
+# admission.py
+"""
+Adaptive admission control. Each route class (trip planning, cheap lookups)
+gets a concurrency limit that follows observed latency: while requests run
+about as fast as the long-run baseline and the limit is actually in use, it
+grows by ~sqrt(limit); when short-term latency climbs above
+ADMISSION_TOLERANCE x baseline it shrinks in proportion. Requests over the
+limit wait in a bounded FIFO queue for up to the class's queue timeout; once
+the queue is full (or the wait runs out) they get an immediate 503 with
+Retry-After instead of piling onto saturated upstream connections.
+Health, metrics, docs and long-lived streams are never limited.
+"""
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from urllib.parse import parse_qs
+
+from core.serialization import dumps_bytes
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") != "0"
+# Short-term latency may reach this multiple of the baseline before the limit shrinks
+ADMISSION_TOLERANCE = float(os.getenv("ADMISSION_TOLERANCE", "1.5"))
+# EWMA weights: the short-term average reacts within a few requests; the
+# baseline follows improvements as fast but takes ~1000 requests to accept a slowdown
+SHORT_ALPHA = 0.2
+LONG_ALPHA = 0.002
+# How far each sample moves the limit toward its new estimate
+SMOOTHING = 0.2
+MAX_RETRY_AFTER = 60
+
+# Never limited: probes must see an overloaded server, and streams hold a
+# connection for minutes without doing per-request work
+EXEMPT_PATHS = {"/", "/health", "/metrics", "/favicon.ico", "/docs", "/redoc", "/openapi.json", "/api/v1/travel/health"}
+# Synchronous plan generation (seconds, 7+ provider calls). Job submits
+# (mode=job, 202 in milliseconds) and booking lookups are cheap and stay in
+# "lookup", so they can't drag the planning latency baseline down.
+PLANNING_PATHS = {"/plan-trip", "/api/v1/travel/plan"}
+
+
+class AdaptiveLimiter:
+    """Latency-driven concurrency limit with a bounded wait queue. Event-loop only."""
+
+    def __init__(
+        self,
+        name: str,
+        initial: int,
+        min_limit: int = 1,
+        max_limit: int = 1000,
+        max_queue: int = 0,
+        queue_timeout: float = 0.0,
+    ):
+        self.name = name
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.short_latency: Optional[float] = None
+        self.long_latency: Optional[float] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def _has_room(self) -> bool:
+        return self.in_flight < max(self.min_limit, int(self.limit))
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting in the queue if there is room; False means shed."""
+        if self._has_room() and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except BaseException as exc:
+            if waiter.done() and not waiter.cancelled():
+                # granted just as we gave up: hand the slot on
+                self._release_slot()
+            else:
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+            if isinstance(exc, asyncio.TimeoutError):
+                self.rejected += 1
+                return False
+            raise
+        self.admitted += 1
+        return True
+
+    def _release_slot(self) -> None:
+        self.in_flight -= 1
+        while self._waiters and self._has_room():
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def release(self, latency: Optional[float] = None) -> None:
+        """Free a slot; latency (seconds) of the finished request feeds the limit."""
+        in_flight = self.in_flight
+        if latency is not None:
+            self.record(latency, in_flight)
+        self._release_slot()
+
+    def record(self, latency: float, in_flight: int) -> None:
+        if self.short_latency is None:
+            self.short_latency = self.long_latency = latency
+            return
+        self.short_latency += SHORT_ALPHA * (latency - self.short_latency)
+        if self.short_latency < self.long_latency:
+            self.long_latency += SHORT_ALPHA * (self.short_latency - self.long_latency)
+        else:
+            self.long_latency += LONG_ALPHA * (latency - self.long_latency)
+        if in_flight < self.limit / 2 and self.short_latency <= self.long_latency * ADMISSION_TOLERANCE:
+            # mostly idle and healthy: no evidence about where the limit should be
+            return
+        gradient = max(0.5, min(1.0, ADMISSION_TOLERANCE * self.long_latency / max(self.short_latency, 1e-6)))
+        estimate = self.limit * gradient + math.sqrt(self.limit)
+        limit = self.limit * (1 - SMOOTHING) + estimate * SMOOTHING
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), limit))
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained."""
+        per_request = self.short_latency or 1.0
+        waves = (self.queued + self.in_flight) / max(self.limit, 1.0)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil(per_request * waves)))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "latency_ms": round(self.short_latency * 1000, 1) if self.short_latency is not None else None,
+            "baseline_ms": round(self.long_latency * 1000, 1) if self.long_latency is not None else None,
+        }
+
+
+def _limiter_from_env(name: str, initial: int, max_limit: int, queue: int, timeout: float) -> AdaptiveLimiter:
+    prefix = f"ADMISSION_{name.upper()}_"
+    return AdaptiveLimiter(
+        name,
+        initial=int(os.getenv(prefix + "LIMIT", str(initial))),
+        min_limit=int(os.getenv(prefix + "MIN_LIMIT", "1")),
+        max_limit=int(os.getenv(prefix + "MAX_LIMIT", str(max_limit))),
+        max_queue=int(os.getenv(prefix + "QUEUE", str(queue))),
+        queue_timeout=float(os.getenv(prefix + "QUEUE_TIMEOUT", str(timeout))),
+    )
+
+
+_limiters: Optional[Dict[str, AdaptiveLimiter]] = None
+
+
+def get_limiters() -> Dict[str, AdaptiveLimiter]:
+    """The process-wide limiter per route class."""
+    global _limiters
+    if _limiters is None:
+        _limiters = {
+            # each plan fans out to 7+ providers, so a few at a time keeps the httpx pool usable
+            "planning": _limiter_from_env("planning", initial=8, max_limit=32, queue=16, timeout=10.0),
+            "lookup": _limiter_from_env("lookup", initial=32, max_limit=256, queue=64, timeout=2.0),
+        }
+    return _limiters
+
+
+def admission_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: limiter.stats() for name, limiter in get_limiters().items()}
+
+
+def route_class(scope) -> Optional[str]:
+    """The request's route class, or None for routes that are never limited."""
+    if scope["type"] != "http":
+        return None
+    path = scope.get("path", "")
+    if path in EXEMPT_PATHS or path.endswith("/events"):
+        return None
+    if scope.get("method") == "POST" and path.rstrip("/") in PLANNING_PATHS and not _is_job_submit(scope):
+        return "planning"
+    return "lookup"
+
+
+def _is_job_submit(scope) -> bool:
+    query = scope.get("query_string") or b""
+    if b"mode=" not in query:
+        return False
+    return parse_qs(query.decode("latin-1")).get("mode", ["sync"])[-1] == "job"
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the route class's limiter to each request."""
+
+    def __init__(self, app, limiters: Optional[Dict[str, AdaptiveLimiter]] = None, enabled: bool = ADMISSION_ENABLED):
+        self.app = app
+        self.limiters = limiters
+        self.enabled = enabled
+
+    async def __call__(self, scope, receive, send) -> None:
+        cls = route_class(scope) if self.enabled else None
+        limiter = (self.limiters or get_limiters()).get(cls) if cls else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+        if not await limiter.acquire():
+            await _shed(send, limiter)
+            return
+        started = time.monotonic()
+        latency = None
+        try:
+            await self.app(scope, receive, send)
+            latency = time.monotonic() - started
+        finally:
+            # failures don't say how fast the server is; only successes adjust the limit
+            limiter.release(latency)
+
+
+async def _shed(send, limiter: AdaptiveLimiter) -> None:
+    body = dumps_bytes({"detail": "Server is busy, please retry later", "route_class": limiter.name})
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(limiter.retry_after()).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -1,8 +1,11 @@
 import asyncio
 from typing import Any, Optional
+from urllib.parse import urlsplit
 
 import httpx
 
+from core.tracing import current_request_id, span
+
 
 _client: Optional[httpx.AsyncClient] = None
 
@@ -35,20 +38,29 @@ async def request_json(
 ) -> Any:
     """HTTP JSON helper with simple retry/backoff using a shared client."""
     last_exc: Optional[Exception] = None
+    rid = current_request_id()
+    if rid is not None:
+        kwargs["headers"] = {"X-Request-ID": rid, **(kwargs.get("headers") or {})}
+    parts = urlsplit(url)
     for attempt in range(retries + 1):
-        try:
-            client = get_client()
-            resp = await client.request(method, url, **kwargs)
-            resp.raise_for_status()
-            ct = resp.headers.get("content-type", "")
-            if "application/json" in ct or resp.text.strip().startswith("{"):
-                return resp.json()
-            return resp.text
-        except Exception as e:
-            last_exc = e
-            if attempt >= retries:
-                break
-            await asyncio.sleep(backoff * (2 ** attempt))
+        with span(f"HTTP {method}", **{"http.host": parts.netloc, "http.path": parts.path, "attempt": attempt}) as sp:
+            if attempt:
+                sp.set("retry", True)
+            try:
+                client = get_client()
+                resp = await client.request(method, url, **kwargs)
+                sp.set("http.status_code", resp.status_code)
+                resp.raise_for_status()
+                ct = resp.headers.get("content-type", "")
+                if "application/json" in ct or resp.text.strip().startswith("{"):
+                    return resp.json()
+                return resp.text
+            except Exception as e:
+                last_exc = e
+                sp.event("error", type=type(e).__name__)
+                if attempt >= retries:
+                    break
+        await asyncio.sleep(backoff * (2 ** attempt))
     assert last_exc is not None
     raise last_exc
 
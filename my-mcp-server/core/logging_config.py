@@ -1,13 +1,179 @@
 # logging_config.py
+"""
+Non-blocking structured logging.
+
+Log calls on the event loop only format the message and put the record on a
+bounded in-memory queue (QueueHandler); a QueueListener thread does the JSON
+encoding and the disk and console I/O. Each line carries the request id (and
+trace/span ids when the request is traced) from core.tracing's context
+variables, so one plan's lines can be pulled out of a busy log. The file
+rotates at LOG_MAX_BYTES, keeping LOG_BACKUP_COUNT old files. DEBUG records
+are sampled (LOG_DEBUG_SAMPLE_RATE) and a full queue drops records instead
+of blocking the caller.
+"""
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+from typing import Iterable, Optional
+
+from core.serialization import dumps_bytes
+from core.tracing import current_request_id, current_span
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # json | text (console only; the file is always JSON)
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Share of DEBUG records kept; everything at INFO and above is kept
+LOG_DEBUG_SAMPLE_RATE = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.01"))
+
+_TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(request_id)s - %(message)s"
+
+
+class JSONFormatter(logging.Formatter):
+	"""One JSON object per line; runs on the listener thread."""
+
+	def format(self, record: logging.LogRecord) -> str:
+		entry = {
+			"ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+			"level": record.levelname,
+			"logger": record.name,
+			"msg": record.getMessage(),
+			"request_id": getattr(record, "request_id", None),
+		}
+		trace_id = getattr(record, "trace_id", None)
+		if trace_id:
+			entry["trace_id"] = trace_id
+			entry["span_id"] = getattr(record, "span_id", None)
+		if record.exc_info and not record.exc_text:
+			record.exc_text = self.formatException(record.exc_info)
+		if record.exc_text:
+			entry["exc"] = record.exc_text
+		return dumps_bytes(entry).decode("utf-8")
+
+
+class DebugSampler(logging.Filter):
+	"""Keeps every record above DEBUG and a `rate` share of DEBUG ones."""
+
+	def __init__(self, rate: float = LOG_DEBUG_SAMPLE_RATE):
+		super().__init__()
+		self.rate = rate
+
+	def filter(self, record: logging.LogRecord) -> bool:
+		return record.levelno > logging.DEBUG or random.random() < self.rate
+
+
+class ContextQueueHandler(logging.handlers.QueueHandler):
+	"""
+	QueueHandler that captures the request context on the calling thread and
+	never blocks: when the listener falls behind, records are counted and dropped.
+	"""
+
+	def __init__(self, log_queue: "queue.Queue"):
+		super().__init__(log_queue)
+		self.dropped = 0
+
+	def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+		# context variables only exist on the calling side
+		record.request_id = current_request_id()
+		active = current_span()
+		if active is not None:
+			record.trace_id = active.trace.trace_id
+			record.span_id = active.span_id
+		# merge args now so later mutation can't change the message; the
+		# traceback is rendered here because frames don't outlive the call
+		record.msg = record.getMessage()
+		record.args = None
+		if record.exc_info:
+			record.exc_text = logging.Formatter().formatException(record.exc_info)
+			record.exc_info = None
+		return record
+
+	def enqueue(self, record: logging.LogRecord) -> None:
+		try:
+			self.queue.put_nowait(record)
+		except queue.Full:
+			self.dropped += 1
+
+
+class _Listener(logging.handlers.QueueListener):
+	def enqueue_sentinel(self) -> None:
+		# shutdown may find the queue full; wait for room rather than fail
+		self.queue.put(self._sentinel)
+
+
+class _TextFormatter(logging.Formatter):
+	def format(self, record: logging.LogRecord) -> str:
+		if not hasattr(record, "request_id"):
+			record.request_id = None
+		return super().format(record)
+
+
+_listener: Optional[_Listener] = None
+_queue_handler: Optional[ContextQueueHandler] = None
+
+
+def configure_logging(
+	level: str = LOG_LEVEL,
+	path: Optional[str] = LOG_FILE,
+	console: bool = True,
+	handlers: Optional[Iterable[logging.Handler]] = None,
+	debug_sample_rate: float = LOG_DEBUG_SAMPLE_RATE,
+	queue_size: int = LOG_QUEUE_SIZE,
+) -> ContextQueueHandler:
+	"""
+	Route the root logger through a queue to a background listener writing a
+	rotating JSON file (path) and the console. `handlers` replaces both, e.g.
+	in tests. Calling it again reconfigures.
+	"""
+	global _listener, _queue_handler
+	shutdown_logging()
+	if handlers is None:
+		handlers = []
+		if path:
+			file_handler = logging.handlers.RotatingFileHandler(
+				path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8",
+			)
+			file_handler.setFormatter(JSONFormatter())
+			handlers.append(file_handler)
+		if console:
+			stream_handler = logging.StreamHandler(sys.stderr)
+			stream_handler.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else _TextFormatter(_TEXT_FORMAT))
+			handlers.append(stream_handler)
+	handlers = list(handlers)
+
+	_queue_handler = ContextQueueHandler(queue.Queue(maxsize=queue_size))
+	_queue_handler.addFilter(DebugSampler(debug_sample_rate))
+	_listener = _Listener(_queue_handler.queue, *handlers, respect_handler_level=True)
+	_listener.start()
+
+	root = logging.getLogger()
+	for handler in list(root.handlers):
+		root.removeHandler(handler)
+	root.addHandler(_queue_handler)
+	root.setLevel(level)
+	return _queue_handler
+
+
+def shutdown_logging() -> None:
+	"""Drain the queue and stop the listener thread (its handlers are closed)."""
+	global _listener, _queue_handler
+	if _listener is not None:
+		listener, _listener = _listener, None
+		listener.stop()
+		for handler in listener.handlers:
+			handler.close()
+	if _queue_handler is not None:
+		logging.getLogger().removeHandler(_queue_handler)
+		_queue_handler = None
+
 
-logging.basicConfig(
-	level=logging.INFO,
-	format="%(asctime)s - %(levelname)s - %(message)s",
-	handlers=[
-		logging.FileHandler("app.log"),
-		logging.StreamHandler()
-	]
-)
+atexit.register(shutdown_logging)
 
 logger = logging.getLogger(__name__)
@@ -0,0 +1,271 @@
+# profiling.py
+"""
+Opt-in profiling of single runs.
+
+A caller holding PROFILE_TOKEN (X-Profile header on the HTTP API, `profile`
+argument on MCP tools) gets that one generate_itinerary run or tool call
+profiled: a thread samples the event-loop thread's stack every
+PROFILE_INTERVAL seconds, counting only samples taken while a task of the
+run is executing (tasks are tagged by a task factory installed for the
+duration of the run), and tracemalloc records where the run allocated.
+The result is stored under PROFILE_DIR as <id>.folded (collapsed stacks
+for flamegraph.pl / speedscope) and <id>.json (summary and top
+allocations); the newest PROFILE_KEEP are kept. One run is profiled at a
+time. Without an authorized request the only cost is a context-variable
+lookup per run, and nothing is available at all unless PROFILE_TOKEN is set.
+"""
+import asyncio
+import contextvars
+import functools
+import hmac
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+import weakref
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from core.serialization import dumps_bytes
+from core.tracing import current_request_id
+
+logger = logging.getLogger(__name__)
+
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+PROFILE_TOP_ALLOCATIONS = int(os.getenv("PROFILE_TOP_ALLOCATIONS", "25"))
+# tracemalloc slows allocation-heavy code several times over while on; one
+# frame per allocation (the allocating line) keeps that to the minimum
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+MAX_STACK_DEPTH = 128
+
+_SAFE_ID = re.compile(r"^[A-Za-z0-9._-]{1,128}$")
+_EVENTS_FILE = os.path.join(os.path.dirname(asyncio.__file__), "events.py")
+# loop -> running task; private, so without it every sample of the loop thread counts
+_current_tasks = getattr(asyncio.tasks, "_current_tasks", None)
+
+class ProfileRequest:
+    """An authorized ask to profile the next profiled() run; profile_id is set once it starts."""
+
+    __slots__ = ("profile_id",)
+
+    def __init__(self):
+        self.profile_id: Optional[str] = None
+
+
+profile_requested: contextvars.ContextVar[Optional[ProfileRequest]] = contextvars.ContextVar("profile_requested", default=None)
+_run_var: contextvars.ContextVar[Optional["_Run"]] = contextvars.ContextVar("profile_run", default=None)
+_active: Optional["_Run"] = None
+
+
+def authorized(credential: Optional[str]) -> bool:
+    if not PROFILE_TOKEN or not credential:
+        return False
+    return hmac.compare_digest(credential.encode(), PROFILE_TOKEN.encode())
+
+
+@contextmanager
+def profiling_requested(credential: Optional[str]) -> Iterator[Optional[ProfileRequest]]:
+    """Ask for the next profiled() run in this context to be profiled; yields None unless the credential is valid."""
+    if not authorized(credential):
+        yield None
+        return
+    request = ProfileRequest()
+    token = profile_requested.set(request)
+    try:
+        yield request
+    finally:
+        profile_requested.reset(token)
+
+
+def profile_id_for(value: Optional[str]) -> str:
+    """A file-safe id: value when it already is one, else a fresh uuid."""
+    return value if value and _SAFE_ID.match(value) else uuid.uuid4().hex
+
+
+def _fold(frame) -> str:
+    """Collapsed stack (root first) from the task's coroutine down to the sampled frame."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        if code.co_name == "_run" and code.co_filename == _EVENTS_FILE:
+            break  # Handle._run: everything below is the event loop itself
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _task_factory(previous: Optional[Callable], loop, coro, **kwargs):
+    task = previous(loop, coro, **kwargs) if previous is not None else asyncio.Task(coro, loop=loop, **kwargs)
+    run = _run_var.get()
+    if run is not None:
+        run.tasks.add(task)
+    return task
+
+
+class _Run:
+    def __init__(self, profile_id: str, name: str, interval: Optional[float] = None):
+        self.profile_id = profile_id
+        self.name = name
+        self.interval = interval or PROFILE_INTERVAL
+        self.loop = asyncio.get_running_loop()
+        self.tasks: "weakref.WeakSet[asyncio.Task]" = weakref.WeakSet()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started = time.time()
+        self._started_at = time.perf_counter()
+        self.duration = 0.0
+        self.allocations: list = []
+        self.peak_bytes = 0
+        self._thread_id = threading.get_ident()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._previous_factory = None
+        self._own_tracemalloc = False
+
+    def start(self) -> None:
+        current = asyncio.current_task()
+        if current is not None:
+            self.tasks.add(current)
+        self._previous_factory = self.loop.get_task_factory()
+        self.loop.set_task_factory(functools.partial(_task_factory, self._previous_factory))
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            self._own_tracemalloc = True
+        tracemalloc.reset_peak()
+        self._sampler = threading.Thread(target=self._sample, name="profile-sampler", daemon=True)
+        self._sampler.start()
+
+    def _sample(self) -> None:
+        frames = sys._current_frames
+        while not self._stop.wait(self.interval):
+            if _current_tasks is not None and _current_tasks.get(self.loop) not in self.tasks:
+                continue
+            frame = frames().get(self._thread_id)
+            if frame is not None:
+                self.stacks[_fold(frame)] += 1
+                self.samples += 1
+
+    def stop(self) -> None:
+        self.duration = time.perf_counter() - self._started_at
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        self.loop.set_task_factory(self._previous_factory)
+        snapshot = tracemalloc.take_snapshot()
+        self.peak_bytes = tracemalloc.get_traced_memory()[1]
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ))
+        self.allocations = [
+            {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}", "size_kb": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in snapshot.statistics("lineno")[:PROFILE_TOP_ALLOCATIONS]
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "profile_id": self.profile_id,
+            "name": self.name,
+            "started_at": self.started,
+            "duration_ms": round(self.duration * 1000, 1),
+            "interval_ms": self.interval * 1000,
+            "samples": self.samples,
+            "hottest_stacks": [{"stack": s, "samples": n} for s, n in self.stacks.most_common(10)],
+            "peak_memory_kb": round(self.peak_bytes / 1024, 1),
+            "top_allocations": self.allocations,
+        }
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.profile_id)
+        with open(base + ".folded", "w", encoding="utf-8") as fh:
+            fh.writelines(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+        with open(base + ".json", "wb") as fh:
+            fh.write(dumps_bytes(self.summary()))
+        _prune(directory, PROFILE_KEEP)
+
+
+def _prune(directory: str, keep: int) -> None:
+    summaries = sorted(
+        (os.path.join(directory, f) for f in os.listdir(directory) if f.endswith(".json")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for path in summaries[keep:]:
+        for old in (path, path[:-len(".json")] + ".folded"):
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+
+@asynccontextmanager
+async def profile_run(profile_id: str, name: str, directory: Optional[str] = None):
+    """Profile the block; yields the run, or None when another run is already being profiled."""
+    global _active
+    if _active is not None:
+        yield None
+        return
+    run = _active = _Run(profile_id, name)
+    token = _run_var.set(run)
+    run.start()
+    try:
+        yield run
+    finally:
+        _run_var.reset(token)
+        try:
+            run.stop()
+            await asyncio.to_thread(run.save, directory or PROFILE_DIR)
+        except Exception:
+            logger.warning("saving profile %s failed", profile_id, exc_info=True)
+        finally:
+            _active = None
+
+
+def profiled(name: str) -> Callable:
+    """Decorator: profile a coroutine function's run when profiling was requested for this context."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            request = profile_requested.get()
+            if request is None or request.profile_id is not None:
+                return await fn(*args, **kwargs)
+            request.profile_id = profile_id_for(current_request_id())
+            async with profile_run(request.profile_id, name) as run:
+                if run is None:
+                    request.profile_id = None  # another run holds the profiler
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def load_profile(profile_id: str, directory: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    if not _SAFE_ID.match(profile_id or ""):
+        return None
+    try:
+        with open(os.path.join(directory or PROFILE_DIR, profile_id + ".json"), "rb") as fh:
+            return json.loads(fh.read())
+    except FileNotFoundError:
+        return None
+
+
+def load_flamegraph(profile_id: str, directory: Optional[str] = None) -> Optional[str]:
+    """Collapsed stacks ("frame;frame;frame count" per line) for a stored profile."""
+    if not _SAFE_ID.match(profile_id or ""):
+        return None
+    try:
+        with open(os.path.join(directory or PROFILE_DIR, profile_id + ".folded"), encoding="utf-8") as fh:
+            return fh.read()
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,187 @@
+# responses.py
+"""
+Response encoding: a JSON response class backed by core.serialization
+(orjson when installed) and ASGI middleware that compresses responses with
+brotli or gzip, whichever the client prefers and the server supports.
+"""
+import gzip
+import os
+import zlib
+from typing import Any, Callable, List, Optional, Tuple
+
+from starlette.responses import Response
+
+from core.serialization import dumps_bytes
+
+try:
+    import brotli  # optional, ~15-20% smaller than gzip for JSON
+except ImportError:  # pragma: no cover
+    brotli = None
+
+# Bodies smaller than this aren't worth the CPU or the extra header
+COMPRESS_MIN_BYTES = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "5"))
+
+_COMPRESSIBLE = ("application/json", "text/", "application/javascript", "application/xml", "image/svg+xml")
+# SSE has to reach the client event by event
+_NEVER = ("text/event-stream",)
+
+
+class FastJSONResponse(Response):
+    """JSONResponse that encodes with orjson (stdlib json without it), skipping jsonable_encoder when returned directly."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps_bytes(content)
+
+
+def supported_encodings() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str, supported: Tuple[str, ...] = None) -> Optional[str]:
+    """Best supported content coding for an Accept-Encoding header (server order breaks q ties), or None."""
+    supported = supported or supported_encodings()
+    q = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        q[token] = weight
+    best, best_q = None, 0.0
+    for coding in supported:
+        weight = q.get(coding, q.get("*", 0.0))
+        if weight > best_q:
+            best, best_q = coding, weight
+    return best
+
+
+class _Encoder:
+    def __init__(self, coding: str):
+        if coding == "br":
+            self._c = brotli.Compressor(quality=BROTLI_QUALITY)
+            self._compress, self._flush, self._finish = self._c.process, self._c.flush, self._c.finish
+        else:
+            # gzip framing, so clients get a complete .gz stream
+            self._c = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self._compress = self._c.compress
+            self._flush = lambda: self._c.flush(zlib.Z_SYNC_FLUSH)
+            self._finish = self._c.flush
+
+    def chunk(self, data: bytes, last: bool) -> bytes:
+        out = self._compress(data)
+        return out + (self._finish() if last else self._flush())
+
+
+def compress(data: bytes, coding: str) -> bytes:
+    if coding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+class CompressionMiddleware:
+    """
+    Compresses JSON/text responses of at least `minimum_size` bytes. Skips
+    responses that are already encoded, partial (Range), range-capable
+    (Accept-Ranges) or SSE; streamed bodies are compressed chunk by chunk
+    and flushed as they go.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = ""
+        for name, value in scope.get("headers") or ():
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        coding = negotiate_encoding(accept) if accept else None
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+        await self.app(scope, receive, _CompressingSend(send, coding, self.minimum_size))
+
+
+class _CompressingSend:
+    def __init__(self, send: Callable, coding: str, minimum_size: int):
+        self._send = send
+        self._coding = coding
+        self._minimum = minimum_size
+        self._start: Optional[dict] = None
+        self._encoder: Optional[_Encoder] = None
+        self._passthrough = False
+
+    def _eligible(self, headers: List[Tuple[bytes, bytes]]) -> bool:
+        found = {name.lower(): value.decode("latin-1").lower() for name, value in headers}
+        content_type = found.get(b"content-type", "")
+        if b"content-encoding" in found or b"content-range" in found:
+            return False
+        # byte-addressable files: an encoded 200 and an identity 206 would share
+        # the ETag, and a resumed download would splice the two together
+        if found.get(b"accept-ranges", "none") != "none":
+            return False
+        if any(content_type.startswith(t) for t in _NEVER):
+            return False
+        return any(content_type.startswith(t) for t in _COMPRESSIBLE)
+
+    def _headers(self, start: dict, length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        original = start.get("headers") or []
+        vary = [v.decode("latin-1") for k, v in original if k.lower() == b"vary"]
+        if not any("accept-encoding" in v.lower() for v in vary):
+            vary.append("Accept-Encoding")
+        headers = [(k, v) for k, v in original if k.lower() not in (b"content-length", b"vary")]
+        headers += [(b"content-encoding", self._coding.encode()), (b"vary", ", ".join(vary).encode("latin-1"))]
+        if length is not None:
+            headers.append((b"content-length", str(length).encode()))
+        return headers
+
+    async def __call__(self, message: dict) -> None:
+        kind = message["type"]
+        if kind == "http.response.start":
+            self._start = message
+            status = message.get("status", 200)
+            self._passthrough = status in (204, 206, 304) or not self._eligible(message.get("headers") or [])
+            if self._passthrough:
+                await self._send(message)
+            return
+        if kind != "http.response.body" or self._passthrough:
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more = message.get("more_body", False)
+        if self._encoder is None:
+            start = self._start
+            if not more:
+                # the whole body in one message: compress it in one go, or not at all
+                if len(body) < self._minimum:
+                    self._passthrough = True
+                    await self._send(start)
+                    await self._send(message)
+                    return
+                data = compress(body, self._coding)
+                await self._send({**start, "headers": self._headers(start, len(data))})
+                await self._send({"type": "http.response.body", "body": data})
+                return
+            self._encoder = _Encoder(self._coding)
+            await self._send({**start, "headers": self._headers(start, None)})
+        await self._send({
+            "type": "http.response.body",
+            "body": self._encoder.chunk(body, last=not more),
+            "more_body": more,
+        })
@@ -0,0 +1,37 @@
+# serialization.py
+"""JSON encoding helpers: orjson when installed, stdlib json otherwise."""
+import json
+from typing import Any
+
+try:
+    import orjson  # optional, much faster for large provider payloads
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def _default(obj: Any) -> Any:
+    # pydantic models and anything else that isn't plain JSON
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    return str(obj)
+
+
+def dumps_bytes(payload: Any, sort_keys: bool = False) -> bytes:
+    """Serialize payload to UTF-8 JSON bytes (sort_keys gives a stable encoding for hashing)."""
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(payload, default=_default, option=option)
+    return json.dumps(payload, default=_default, separators=(",", ":"), sort_keys=sort_keys).encode("utf-8")
+
+
+def dumps(payload: Any) -> str:
+    """Serialize payload to a JSON string."""
+    return dumps_bytes(payload).decode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,22 @@
+# tasks.py
+"""Task helpers that keep cancellation flowing into provider calls."""
+import asyncio
+from typing import Any, Awaitable, List
+
+
+async def gather_cancelling(*aws: Awaitable[Any]) -> List[Any]:
+    """
+    Like asyncio.gather, but if any task fails or the caller is cancelled,
+    the remaining tasks are cancelled and awaited before the error propagates,
+    so no orphaned provider call keeps holding an upstream connection.
+    """
+    tasks = [asyncio.ensure_future(a) for a in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            if not t.done():
+                t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
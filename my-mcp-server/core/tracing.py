@@ -0,0 +1,360 @@
+# tracing.py
+"""
+Lightweight request tracing.
+
+The request id and the active span live in context variables, so asyncio
+tasks started inside a request (provider fan-out) inherit them and their
+spans nest under whatever span was active when the task was created.
+Sampling is decided once per request (head sampling, TRACE_SAMPLE_RATE, or
+the sampled flag of an incoming W3C traceparent); unsampled requests only
+pay a context-variable lookup per span. Finished traces are queued and
+exported by a background thread, either as JSON lines (TRACE_EXPORTER=file,
+TRACE_FILE) or as OTLP/HTTP JSON to a local collector
+(TRACE_EXPORTER=otlp, TRACE_OTLP_ENDPOINT). Tracing is off unless
+TRACE_EXPORTER is set.
+"""
+import atexit
+import contextvars
+import functools
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+
+from core.serialization import dumps_bytes
+
+logger = logging.getLogger(__name__)
+
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "").lower()  # "" | file | otlp
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "ai-trip-planner")
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "5"))
+# Traces waiting for export beyond this are dropped rather than buffered
+TRACE_MAX_QUEUED = int(os.getenv("TRACE_MAX_QUEUED", "1000"))
+# A runaway trace (e.g. thousands of retries) stops recording spans here
+MAX_SPANS_PER_TRACE = 2000
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+_current: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return request_id_var.get()
+
+
+class _Trace:
+    __slots__ = ("trace_id", "request_id", "spans")
+
+    def __init__(self, trace_id: str, request_id: Optional[str]):
+        self.trace_id = trace_id
+        self.request_id = request_id
+        self.spans: List["Span"] = []
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "events", "error")
+
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.events: List[Dict[str, Any]] = []
+        self.error: Optional[str] = None
+
+    def set(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def event(self, name: str, **attributes: Any) -> None:
+        self.events.append({"name": name, "time_ns": time.time_ns(), "attributes": attributes})
+
+    def traceparent(self) -> str:
+        return f"00-{self.trace.trace_id}-{self.span_id}-01"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_ns": self.start_ns,
+            "duration_ms": round(((self.end_ns or self.start_ns) - self.start_ns) / 1e6, 3),
+            "attributes": self.attributes,
+            "events": self.events,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span when the request isn't sampled."""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any) -> None:
+        pass
+
+    def event(self, name: str, **attributes: Any) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def annotate(key: str, value: Any) -> None:
+    """Set an attribute on the active span, if the request is traced."""
+    active = _current.get()
+    if active is not None:
+        active.attributes[key] = value
+
+
+def add_event(name: str, **attributes: Any) -> None:
+    """Record a timestamped event on the active span, if the request is traced."""
+    active = _current.get()
+    if active is not None:
+        active.event(name, **attributes)
+
+
+def _parse_traceparent(header: Optional[str]):
+    """(trace_id, parent span id, sampled) from a W3C traceparent, or None."""
+    parts = (header or "").strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+@contextmanager
+def start_trace(
+    name: str,
+    request_id: Optional[str] = None,
+    traceparent: Optional[str] = None,
+    **attributes: Any,
+) -> Iterator[Any]:
+    """
+    Root span for one request. Sets the request id for the duration and,
+    when the request is sampled, records spans until the block exits.
+    """
+    rid_token = request_id_var.set(request_id)
+    try:
+        parent = _parse_traceparent(traceparent)
+        if parent is not None:
+            sampled = parent[2]
+        else:
+            sampled = bool(TRACE_EXPORTER) and random.random() < TRACE_SAMPLE_RATE
+        if not sampled or not TRACE_EXPORTER:
+            yield NOOP_SPAN
+            return
+        trace = _Trace(parent[0] if parent else os.urandom(16).hex(), request_id)
+        root = Span(trace, name, parent[1] if parent else None, attributes)
+        trace.spans.append(root)
+        token = _current.set(root)
+        try:
+            yield root
+        except BaseException as exc:
+            root.error = repr(exc)
+            raise
+        finally:
+            _current.reset(token)
+            root.end_ns = time.time_ns()
+            exporter = get_exporter()
+            if exporter is not None:
+                exporter.submit(trace)
+    finally:
+        request_id_var.reset(rid_token)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Child span of the active span; a no-op outside a sampled trace."""
+    parent = _current.get()
+    if parent is None or len(parent.trace.spans) >= MAX_SPANS_PER_TRACE:
+        yield NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.span_id, attributes)
+    parent.trace.spans.append(child)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.error = repr(exc)
+        raise
+    finally:
+        _current.reset(token)
+        child.end_ns = time.time_ns()
+
+
+def traced(name: str) -> Callable:
+    """Decorator running a coroutine function inside span(name)."""
+    def decorate(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if _current.get() is None:
+                return await fn(*args, **kwargs)
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+async def traced_await(name: str, awaitable: Any, **attributes: Any) -> Any:
+    """Await inside span(name); wrap coroutines with this before handing them to gather."""
+    with span(name, **attributes):
+        return await awaitable
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None]
+
+
+def to_otlp(traces: List[_Trace]) -> Dict[str, Any]:
+    """OTLP/HTTP JSON body (ExportTraceServiceRequest) for finished traces."""
+    spans = []
+    for trace in traces:
+        for s in trace.spans:
+            attributes = dict(s.attributes)
+            if trace.request_id:
+                attributes["request.id"] = trace.request_id
+            spans.append({
+                "traceId": trace.trace_id,
+                "spanId": s.span_id,
+                **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                "name": s.name,
+                "kind": 2 if s.parent_id is None else 1,  # SERVER for the root, INTERNAL below
+                "startTimeUnixNano": str(s.start_ns),
+                "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                "attributes": _otlp_attributes(attributes),
+                "events": [
+                    {"timeUnixNano": str(e["time_ns"]), "name": e["name"], "attributes": _otlp_attributes(e["attributes"])}
+                    for e in s.events
+                ],
+                "status": {"code": 2, "message": s.error} if s.error else {},
+            })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": _otlp_attributes({"service.name": TRACE_SERVICE_NAME})},
+            "scopeSpans": [{"scope": {"name": "core.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class TraceExporter:
+    """Queues finished traces and writes them from a background thread."""
+
+    def __init__(
+        self,
+        kind: str = TRACE_EXPORTER,
+        path: str = TRACE_FILE,
+        endpoint: str = TRACE_OTLP_ENDPOINT,
+        flush_interval: float = TRACE_FLUSH_INTERVAL,
+        max_queued: int = TRACE_MAX_QUEUED,
+    ):
+        self.kind = kind
+        self.path = path
+        self.endpoint = endpoint
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.dropped = 0
+        self._queue: Deque[_Trace] = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, trace: _Trace) -> None:
+        if len(self._queue) >= self.max_queued:
+            self.dropped += 1
+            return
+        self._queue.append(trace)
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.warning("trace export failed", exc_info=True)
+
+    def flush(self) -> int:
+        """Export everything queued so far; returns the number of traces."""
+        with self._flush_lock:
+            traces = []
+            while self._queue:
+                traces.append(self._queue.popleft())
+            if not traces:
+                return 0
+            if self.kind == "otlp":
+                import urllib.request  # only the OTLP exporter needs it (~40 ms to import)
+
+                request = urllib.request.Request(
+                    self.endpoint, data=dumps_bytes(to_otlp(traces)), headers={"Content-Type": "application/json"},
+                )
+                urllib.request.urlopen(request, timeout=5).close()
+            else:
+                with open(self.path, "ab") as fh:
+                    for trace in traces:
+                        fh.write(dumps_bytes({
+                            "trace_id": trace.trace_id,
+                            "request_id": trace.request_id,
+                            "spans": [s.to_dict() for s in trace.spans],
+                        }) + b"\n")
+            return len(traces)
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+
+_exporter: Optional[TraceExporter] = None
+
+
+def get_exporter() -> Optional[TraceExporter]:
+    global _exporter
+    if _exporter is None and TRACE_EXPORTER:
+        _exporter = TraceExporter()
+        atexit.register(close_tracer)
+    return _exporter
+
+
+def close_tracer() -> None:
+    global _exporter
+    if _exporter is not None:
+        try:
+            _exporter.close()
+        except Exception:
+            logger.warning("trace export failed on shutdown", exc_info=True)
+        finally:
+            _exporter = None
@@ -2,10 +2,22 @@ from fastapi import FastAPI, Request, HTTPException
 from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
+from core.responses import CompressionMiddleware, FastJSONResponse
+from core.admission import AdmissionMiddleware, admission_stats
+from core.tracing import close_tracer, start_trace
+from core.logging_config import configure_logging, shutdown_logging
+from core.profiling import profiling_requested
 import os
-from api import plan_trip, fetch_destinations, weather, flights, hotels
-from api.travel_endpoints import router as travel_router
-from core.http_client import close_client
+from api import plan_trip, fetch_destinations, weather, flights, hotels, autocomplete, nearby, profiles
+from api.travel_endpoints import router as travel_router, start_plan_jobs
+from services.trip_store import close_trip_store
+from services.trip_export import close_export_manager
+from services.plan_jobs import close_job_manager
+from services.live_alerts import close_alert_hub
+from services.analytics_sink import close_analytics_sink
+from services.autocomplete import get_autocomplete_index
+from services.visa_data import get_visa_matrix
+import sys
 import uuid
 import logging
 
@@ -13,7 +25,7 @@ import logging
 load_dotenv(".env")
 load_dotenv("local.env", override=True)
 
-app = FastAPI(title="AI Trip Planner API", version="1.0.0")
+app = FastAPI(title="AI Trip Planner API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # CORS: allow Next.js dev server and optional origins from env
 origins = {
@@ -33,32 +45,75 @@ app.add_middleware(
 	allow_methods=["*"],
 	allow_headers=["*"],
 )
+# gzip/brotli by Accept-Encoding for JSON and text bodies over COMPRESS_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+# Per route class concurrency limits that follow latency; sheds with 503 + Retry-After
+app.add_middleware(AdmissionMiddleware)
 
 @app.middleware("http")
 async def add_request_id(request: Request, call_next):
 	rid = request.headers.get("x-request-id") or str(uuid.uuid4())
 	response = None
+	# the id (and the trace, when sampled) follow the request into provider tasks and upstream calls
+	with start_trace(
+		f"{request.method} {request.url.path}",
+		request_id=rid,
+		traceparent=request.headers.get("traceparent"),
+		**{"http.method": request.method, "http.path": request.url.path},
+	) as root, profiling_requested(request.headers.get("x-profile")) as profile:
+		# a valid X-Profile token profiles this request's plan; x-profile-id names the stored profile
+		try:
+			response = await call_next(request)
+			root.set("http.status_code", response.status_code)
+			return response
+		finally:
+			if response is not None:
+				response.headers["x-request-id"] = rid
+				if profile is not None and profile.profile_id:
+					response.headers["x-profile-id"] = profile.profile_id
+
+
+@app.on_event("startup")
+async def startup_event():
+	# JSON lines with request ids, written off the event loop by a listener thread
+	configure_logging()
+	# Resume plan jobs left in the local queue by a previous run
+	await start_plan_jobs()
+	# Build the typeahead index now rather than on the first keystroke
+	get_autocomplete_index()
+	# Map the visa matrix (compiling the bundled dataset on first run)
 	try:
-		response = await call_next(request)
-		return response
-	finally:
-		if response is not None:
-			response.headers["x-request-id"] = rid
+		get_visa_matrix()
+	except Exception:
+		logging.getLogger(__name__).warning("Visa matrix unavailable; visa checks use the remote API", exc_info=True)
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
-	# Close shared HTTP client
-	try:
-		await close_client()
-	except Exception as e:
-		logging.getLogger(__name__).warning(f"Error closing HTTP client: {e}")
+	await close_job_manager()
+	await close_alert_hub()
+	close_trip_store()
+	close_export_manager()
+	close_analytics_sink()
+	close_tracer()
+	# Close shared HTTP client (imported lazily by the services, so it may not exist)
+	http_client = sys.modules.get("core.http_client")
+	if http_client is not None:
+		try:
+			await http_client.close_client()
+		except Exception as e:
+			logging.getLogger(__name__).warning(f"Error closing HTTP client: {e}")
+	# last, so everything above can still log
+	shutdown_logging()
 
 app.include_router(plan_trip.router, prefix="/plan-trip", tags=["Trip Planning"])
 app.include_router(fetch_destinations.router, prefix="/fetch-destinations", tags=["Destinations"])
 app.include_router(weather.router, prefix="/weather", tags=["Weather"])
 app.include_router(flights.router, prefix="/flights", tags=["Flights"])
 app.include_router(hotels.router, prefix="/hotels", tags=["Hotels"])
+app.include_router(autocomplete.router, prefix="/autocomplete", tags=["Destinations"])
+app.include_router(nearby.router, prefix="/nearby", tags=["Destinations"])
+app.include_router(profiles.router, prefix="/profiles", tags=["Diagnostics"])
 app.include_router(travel_router, tags=["Comprehensive Travel Planning"])
 
 
@@ -72,6 +127,11 @@ def health():
 	return {"status": "healthy"}
 
 
+@app.get("/metrics")
+def metrics():
+	return {"admission": admission_stats()}
+
+
 @app.get("/favicon.ico")
 def favicon():
 	# Return 204 to avoid 404 noise when browsers request favicon
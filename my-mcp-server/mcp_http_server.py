@@ -9,15 +9,14 @@ load_dotenv(".env")
 load_dotenv("local.env", override=True)
 
 from fastmcp import FastMCP
-from fastmcp.server.auth.providers.bearer import BearerAuthProvider, RSAKeyPair
+from fastmcp.server.auth import TokenVerifier
 from mcp import ErrorData, McpError
 from mcp.server.auth.provider import AccessToken
 from mcp.types import TextContent, ImageContent, INVALID_PARAMS, INTERNAL_ERROR
 from pydantic import BaseModel, Field, AnyUrl
 
-import httpx
-import markdownify
-import readabilipy
+# httpx, readabilipy and markdownify are imported inside the Fetch helpers:
+# they are only needed once a tool actually fetches a page.
 
 # --- Config ---
 TOKEN = os.environ.get("AUTH_TOKEN") or os.environ.get("MCP_BEARER_TOKEN")
@@ -28,13 +27,17 @@ assert MY_NUMBER is not None, "Please set MY_NUMBER in your .env file"
 
 
 # --- Auth Provider ---
-class SimpleBearerAuthProvider(BearerAuthProvider):
+class SimpleBearerAuthProvider(TokenVerifier):
+    """
+    Static bearer token auth. Tokens are compared directly, so unlike a JWT
+    verifier this needs no signing key (and no RSA key generation at startup).
+    """
+
     def __init__(self, token: str):
-        k = RSAKeyPair.generate()
-        super().__init__(public_key=k.public_key, jwks_uri=None, issuer=None, audience=None)
+        super().__init__()
         self.token = token
 
-    async def load_access_token(self, token: str) -> AccessToken | None:
+    async def verify_token(self, token: str) -> AccessToken | None:
         if token == self.token:
             return AccessToken(
                 token=token,
@@ -63,6 +66,8 @@ class Fetch:
         user_agent: str,
         force_raw: bool = False,
     ) -> tuple[str, str]:
+        import httpx
+
         async with httpx.AsyncClient() as client:
             try:
                 response = await client.get(
@@ -93,6 +98,9 @@ class Fetch:
     @staticmethod
     def extract_content_from_html(html: str) -> str:
         """Extract and convert HTML content to Markdown format."""
+        import markdownify
+        import readabilipy
+
         ret = readabilipy.simple_json.simple_json_from_html_string(html, use_readability=True)
         if not ret or not ret.get("content"):
             return "<error>Page failed to be simplified from HTML</error>"
@@ -105,6 +113,8 @@ class Fetch:
         Perform a scoped DuckDuckGo search and return a list of URLs.
         (Using DuckDuckGo because Google blocks most programmatic scraping.)
         """
+        import httpx
+
         ddg_url = f"https://html.duckduckgo.com/html/?q={query.replace(' ', '+')}"
         links: list[str] = []
 
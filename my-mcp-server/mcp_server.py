@@ -7,18 +7,29 @@ Exposes tools:
 - search_hotels
 - get_weather
 - search_places
+- get_profile
+
+Every tool takes an optional `profile` argument: with the server's
+PROFILE_TOKEN the call is profiled (core.profiling) and the reply ends with
+a profile_id to pass to get_profile.
 
 Run (from project root):
   python mcp_server.py
 
 Then configure your MCP client (e.g., Puch AI) to launch this command.
+
+The host launches this process per session, so startup is kept lean: service
+modules (and httpx behind them) are imported on the first call of the tool
+that needs them. Check the budget with `python benchmarks/startup.py`.
 """
 from __future__ import annotations
 
 import asyncio
-import json
+import functools
 import os
-from typing import Any, Dict
+import sys
+import uuid
+from typing import Any, Dict, List
 
 from dotenv import load_dotenv
 
@@ -26,28 +37,118 @@ from dotenv import load_dotenv
 load_dotenv(".env")
 load_dotenv("local.env", override=True)
 
-# Reuse existing services
-from services.ai_trip_planner import generate_itinerary
-from services.flights_api import search_flights as svc_search_flights
-from services.hotels_api import search_hotels as svc_search_hotels
-from services.weather_api import get_weather as svc_get_weather
-from services.places_api import search_places as svc_search_places
-
 # MCP server primitives
 from mcp.server import Server
 from mcp.types import Tool, TextContent
 from mcp.server.stdio import stdio_server
-from core.http_client import close_client
+from core.serialization import dumps
 
 
 server = Server("ai-trip-planner")
 
+# name -> (Tool, handler); filled by @_tool and served by list_tools/call_tool
+_TOOLS: Dict[str, tuple[Tool, Any]] = {}
+
+# The host fires several tool calls in parallel; cap how many run at once so a
+# burst of plan_trip calls can't exhaust the shared HTTP pool.
+MAX_CONCURRENT_TOOLS = int(os.getenv("MCP_MAX_CONCURRENT_TOOLS", "8"))
+_tool_slots = asyncio.Semaphore(MAX_CONCURRENT_TOOLS)
+
+PROFILE_PROPERTIES = {
+    "profile": {"type": "string", "description": "Profiling token (PROFILE_TOKEN): profile this call and return a profile_id"},
+}
+
+PAGINATION_PROPERTIES = {
+    "limit": {"type": "integer", "description": "Max items to return (enables paging)"},
+    "offset": {"type": "integer", "default": 0},
+}
+
 
 def _json_content(payload: Any) -> list[TextContent]:
-    return [TextContent(type="text", text=json.dumps(payload))]
+    return [TextContent(type="text", text=dumps(payload))]
+
+
+def _tool(name: str, description: str, input_schema: Dict[str, Any]):
+    """Register a tool handler (called with the arguments as keywords)."""
+    def decorate(fn):
+        _TOOLS[name] = (Tool(name=name, description=description, inputSchema=input_schema), fn)
+        return fn
+    return decorate
+
+
+@server.list_tools()
+async def list_tools() -> list[Tool]:
+    return [tool for tool, _ in _TOOLS.values()]
+
+
+@server.call_tool()
+async def call_tool(name: str, arguments: Dict[str, Any]) -> list[TextContent]:
+    if name not in _TOOLS:
+        raise ValueError(f"Unknown tool: {name}")
+    _, handler = _TOOLS[name]
+    return await handler(**(arguments or {}))
+
+
+async def _run_tool(coro) -> Any:
+    """
+    Run a tool's service call concurrently with other tools. The server runs
+    each call in its own task, so a client cancellation lands in the awaited
+    service call (gather_cancelling cancels its provider tasks) and frees the slot.
+    """
+    async with _tool_slots:
+        return await coro
+
+
+def _profilable(fn):
+    """
+    Profile the tool call when a valid `profile` token is passed; the reply
+    then ends with {"profile_id": ...}. Without one this is a dict pop.
+    """
+    @functools.wraps(fn)
+    async def wrapper(**kwargs: Any):
+        credential = kwargs.pop("profile", None)
+        if credential is None:
+            return await fn(**kwargs)
+        from core.profiling import authorized, profile_run
+
+        if not authorized(credential):
+            return await fn(**kwargs)
+        profile_id = uuid.uuid4().hex
+        async with profile_run(profile_id, fn.__name__) as run:
+            contents = await fn(**kwargs)
+        return contents if run is None else contents + _json_content({"profile_id": profile_id})
+    return wrapper
+
 
+def _paginate(items: List[Any], kwargs: Dict[str, Any]) -> Any:
+    """Return items unchanged, or a page envelope when limit/offset are given."""
+    limit = kwargs.get("limit")
+    offset = max(0, int(kwargs.get("offset") or 0))
+    if limit is None and not offset:
+        return items
+    end = len(items) if limit is None else offset + max(0, int(limit))
+    page = items[offset:end]
+    return {
+        "items": page,
+        "total": len(items),
+        "offset": offset,
+        "next_offset": end if end < len(items) else None,
+    }
 
-@server.tool(
+
+def _trim_plan(result: Dict[str, Any], max_results: int | None) -> Dict[str, Any]:
+    """Cap the flight and hotel lists of a plan so large searches stay small on the wire."""
+    if not max_results or not isinstance(result, dict):
+        return result
+    trip_data = result.get("trip_data")
+    if isinstance(trip_data, dict):
+        for key in ("flights", "return_flights", "itineraries", "hotels"):
+            if isinstance(trip_data.get(key), list):
+                trip_data[key] = trip_data[key][:max_results]
+    return result
+
+
+@_tool(
     name="plan_trip",
     description="Generate an itinerary using flights/hotels/weather/places and user preferences.",
     input_schema={
@@ -74,35 +175,63 @@ def _json_content(payload: Any) -> list[TextContent]:
             "detail_level": {"type": "string"},
             "max_itinerary_days": {"type": "integer"},
             "language": {"type": "string"},
+            "max_results": {"type": "integer", "description": "Trim flight and hotel lists to this many entries"},
+            **PROFILE_PROPERTIES,
         },
         "required": ["origin", "destination", "start_date", "end_date"],
         "additionalProperties": True,
     },
 )
+@_profilable
 async def tool_plan_trip(**kwargs: Dict[str, Any]):
-    result = await generate_itinerary(kwargs)
-    return _json_content(result)
+    from services.ai_trip_planner import generate_itinerary
 
+    max_results = kwargs.pop("max_results", None)
+    result = await _run_tool(generate_itinerary(kwargs))
+    return _json_content(_trim_plan(result, max_results))
 
-@server.tool(
+
+@_tool(
     name="search_flights",
-    description="Search flights for a given origin, destination, and date.",
+    description="Search flights for a given origin, destination, and date; pass return_date for priced round-trip itineraries.",
     input_schema={
         "type": "object",
         "properties": {
             "origin": {"type": "string"},
             "destination": {"type": "string"},
             "date": {"type": "string"},
+            "return_date": {"type": "string"},
             "adults": {"type": "integer", "default": 1},
             "currency": {"type": "string", "default": "USD"},
             "cabin_class": {"type": "string", "default": "economy"},
             "preferred_airlines": {"type": "array", "items": {"type": "string"}},
+            "max_itineraries": {"type": "integer", "default": 20, "description": "Round trips: cheapest itineraries to return"},
+            **PAGINATION_PROPERTIES,
+            **PROFILE_PROPERTIES,
         },
         "required": ["origin", "destination", "date"],
     },
 )
+@_profilable
 async def tool_search_flights(**kwargs: Dict[str, Any]):
-    flights = await svc_search_flights(
+    from services.flights_api import search_flights as svc_search_flights, search_round_trip
+
+    if kwargs.get("return_date"):
+        result = await _run_tool(search_round_trip(
+            kwargs["origin"],
+            kwargs["destination"],
+            kwargs["date"],
+            kwargs["return_date"],
+            adults=int(kwargs.get("adults", 1)),
+            currency=kwargs.get("currency", "USD"),
+            cabin_class=kwargs.get("cabin_class", "economy"),
+            preferred_airlines=kwargs.get("preferred_airlines"),
+            top_n=int(kwargs.get("max_itineraries", 20)),
+        ))
+        result["itineraries"] = _paginate(result["itineraries"], kwargs)
+        return _json_content(result)
+
+    flights = await _run_tool(svc_search_flights(
         kwargs["origin"],
         kwargs["destination"],
         kwargs["date"],
@@ -110,11 +239,11 @@ async def tool_search_flights(**kwargs: Dict[str, Any]):
         currency=kwargs.get("currency", "USD"),
         cabin_class=kwargs.get("cabin_class", "economy"),
         preferred_airlines=kwargs.get("preferred_airlines"),
-    )
-    return _json_content(flights)
+    ))
+    return _json_content(_paginate(flights, kwargs))
 
 
-@server.tool(
+@_tool(
     name="search_hotels",
     description="Search hotels for a location and date range.",
     input_schema={
@@ -127,12 +256,19 @@ async def tool_search_flights(**kwargs: Dict[str, Any]):
             "accommodation_type": {"type": "string"},
             "min_rating": {"type": "number"},
             "page_size": {"type": "integer", "default": 10},
+            "pages": {"type": "integer", "default": 1, "description": "Provider pages to scan concurrently; >1 returns the best page_size hotels"},
+            "sort_by": {"type": "string", "enum": ["value", "rating", "price"], "default": "value"},
+            **PAGINATION_PROPERTIES,
+            **PROFILE_PROPERTIES,
         },
         "required": ["location", "check_in", "check_out"],
     },
 )
+@_profilable
 async def tool_search_hotels(**kwargs: Dict[str, Any]):
-    hotels = await svc_search_hotels(
+    from services.hotels_api import search_hotels as svc_search_hotels
+
+    hotels = await _run_tool(svc_search_hotels(
         kwargs["location"],
         kwargs["check_in"],
         kwargs["check_out"],
@@ -140,49 +276,85 @@ async def tool_search_hotels(**kwargs: Dict[str, Any]):
         page_size=int(kwargs.get("page_size", 10)),
         accommodation_type=kwargs.get("accommodation_type"),
         min_rating=kwargs.get("min_rating"),
-    )
-    return _json_content(hotels)
+        pages=int(kwargs.get("pages", 1)),
+        sort_by=kwargs.get("sort_by", "value"),
+    ))
+    return _json_content(_paginate(hotels, kwargs))
 
 
-@server.tool(
+@_tool(
     name="get_weather",
     description="Get current weather for a city.",
     input_schema={
         "type": "object",
-        "properties": {"city": {"type": "string"}, "units": {"type": "string", "default": "metric"}},
+        "properties": {"city": {"type": "string"}, "units": {"type": "string", "default": "metric"}, **PROFILE_PROPERTIES},
         "required": ["city"],
     },
 )
+@_profilable
 async def tool_get_weather(**kwargs: Dict[str, Any]):
-    data = await svc_get_weather(kwargs["city"], units=kwargs.get("units", "metric"))
+    from services.weather_api import get_weather as svc_get_weather
+
+    data = await _run_tool(svc_get_weather(kwargs["city"], units=kwargs.get("units", "metric")))
     return _json_content(data)
 
 
-@server.tool(
+@_tool(
     name="search_places",
     description="Search places/attractions using a free-text query (e.g., 'museums in Rome').",
     input_schema={
         "type": "object",
-        "properties": {"query": {"type": "string"}, "region": {"type": "string"}, "limit": {"type": "integer"}},
+        "properties": {"query": {"type": "string"}, "region": {"type": "string"}, "limit": {"type": "integer"}, **PROFILE_PROPERTIES},
         "required": ["query"],
     },
 )
+@_profilable
 async def tool_search_places(**kwargs: Dict[str, Any]):
-    results = await svc_search_places(kwargs["query"], region=kwargs.get("region"), limit=kwargs.get("limit", 10))
+    from services.places_api import search_places as svc_search_places
+
+    results = await _run_tool(svc_search_places(kwargs["query"], region=kwargs.get("region"), limit=kwargs.get("limit", 10)))
     return _json_content(results)
 
 
+@_tool(
+    name="get_profile",
+    description="Fetch a stored profile: duration, hottest stacks, top allocations and, with flamegraph=true, collapsed stacks.",
+    input_schema={
+        "type": "object",
+        "properties": {
+            "profile_id": {"type": "string"},
+            "profile": {"type": "string", "description": "Profiling token (PROFILE_TOKEN)"},
+            "flamegraph": {"type": "boolean", "default": False},
+        },
+        "required": ["profile_id", "profile"],
+    },
+)
+async def tool_get_profile(**kwargs: Dict[str, Any]):
+    from core.profiling import authorized, load_flamegraph, load_profile
+
+    if not authorized(kwargs.get("profile")):
+        raise ValueError("Profiling is not enabled for this caller")
+    profile = load_profile(kwargs["profile_id"])
+    if profile is None:
+        raise ValueError(f"No profile {kwargs['profile_id']}")
+    if kwargs.get("flamegraph"):
+        profile["flamegraph"] = load_flamegraph(kwargs["profile_id"])
+    return _json_content(profile)
+
+
 async def amain():
     # Run MCP server over stdio
     try:
         async with stdio_server() as (read, write):
-            await server.run(read, write)
+            await server.run(read, write, server.create_initialization_options())
     finally:
-        # Close shared http client used by services
-        try:
-            await close_client()
-        except Exception:
-            pass
+        # Close shared http client used by services (only if a tool created it)
+        http_client = sys.modules.get("core.http_client")
+        if http_client is not None:
+            try:
+                await http_client.close_client()
+            except Exception:
+                pass
 
 
 def main():
@@ -2,21 +2,29 @@
 AI Trip Planner Orchestration
 - Consumes TripRequest-like payload
 - Gathers external data (flights, hotels, weather, places)
-- Applies simple weather avoidance and budget heuristics
+- Applies simple weather avoidance and a budget optimizer
 - Optionally calls an MCP AI service; falls back to a heuristic plan
 """
-from typing import Dict, Any, List
-import asyncio
+from typing import Dict, Any, List, Callable, Optional
 from datetime import datetime, timedelta
 
-from .flights_api import search_flights
-from .hotels_api import search_hotels
+from .flights_api import search_flights, search_round_trip
+from .hotels_api import search_hotels, HOTEL_MAX_PAGES
 from .weather_api import get_forecast
-from .places_api import search_places
-from .events_api import search_events
+from .weather_rules import is_bad_weather_day
+from .places_api import search_places, enrich_places
+from .events_api import search_events, filter_events_by_days
 from .restaurants_api import search_restaurants
 from .visa_api import check_visa_requirements, get_safety_advisories
+from .destinations import resolve
+from .analytics_sink import get_analytics_sink
+from .budget_optimizer import optimize_budget
+from .day_scheduler import schedule_days
+from .geo_index import update_destination_index
 from .booking_integration import get_booking_links, create_trip_summary_export
+from core.tasks import gather_cancelling
+from core.tracing import add_event, span, traced, traced_await
+from core.profiling import profiled
 try:
     from .mcp_client import get_ai_trip_plan  # optional
 except Exception:  # pragma: no cover
@@ -40,6 +48,7 @@ def _date_range(start_str: str, end_str: str, limit: int | None = None) -> List[
     return days
 
 
+@traced("gather_external_data")
 async def gather_external_data(
     origin: str,
     destination: str,
@@ -55,6 +64,12 @@ async def gather_external_data(
 ) -> Dict[str, Any]:
     """Fetch flights, hotels, weather, and places in parallel and return a dict."""
     activities = activities or []
+    # Canonical destination first, so every provider sees the same spelling
+    # and equivalent requests share cache entries
+    dest = resolve(destination)
+    if dest is not None:
+        destination = dest.name
+    region = dest.region if dest is not None else None
 
     # Build places queries from activities; fallback to generic
     place_queries = [f"{a} in {destination}" for a in activities] or [f"things to do in {destination}"]
@@ -64,7 +79,7 @@ async def gather_external_data(
         results: List[Dict[str, Any]] = []
         for q in place_queries[:3]:
             try:
-                chunk = await search_places(q)
+                chunk = await search_places(q, region=region)
                 results.extend(chunk[:5])
             except Exception:
                 continue
@@ -76,12 +91,19 @@ async def gather_external_data(
             if name and name not in seen:
                 seen.add(name)
                 deduped.append(p)
-        return deduped
+        # opening hours for scheduling; a failed lookup just leaves them unknown
+        try:
+            return await enrich_places(deduped)
+        except Exception:
+            return deduped
 
     async def _gather_events():
         # Fetch events during travel dates
         try:
-            return await search_events(destination, start_date, end_date, activities)
+            return await search_events(
+                destination, start_date, end_date, activities,
+                per_day=EVENTS_PER_DAY, max_results=EVENTS_PER_DAY * len(_date_range(start_date, end_date)),
+            )
         except Exception:
             return []
 
@@ -96,6 +118,29 @@ async def gather_external_data(
         except Exception:
             return []
 
+    async def _gather_flights():
+        # Round trip when the dates allow it: both legs are fetched together
+        # and joined into priced itineraries
+        if start_date and end_date and end_date > start_date:
+            return await search_round_trip(
+                origin,
+                destination,
+                start_date,
+                end_date,
+                adults=adults,
+                cabin_class=cabin_class,
+                preferred_airlines=preferred_airlines,
+            )
+        outbound = await search_flights(
+            origin,
+            destination,
+            start_date,
+            adults=adults,
+            cabin_class=cabin_class,
+            preferred_airlines=preferred_airlines,
+        )
+        return {"outbound": outbound, "return": [], "itineraries": []}
+
     async def _gather_visa_safety():
         # Check visa requirements and safety advisories
         try:
@@ -105,37 +150,35 @@ async def gather_external_data(
         except Exception:
             return {"visa": {}, "safety": {}}
 
-    tasks = [
-        asyncio.create_task(
-            search_flights(
-                origin,
-                destination,
-                start_date,
-                adults=adults,
-                cabin_class=cabin_class,
-                preferred_airlines=preferred_airlines,
-            )
+    # gather_cancelling tears down sibling tasks on failure or cancellation,
+    # so a cancelled plan releases its upstream connections immediately.
+    # each provider task records its own span under the plan's
+    flights, hotels, forecast, places, events, restaurants, visa_safety = await gather_cancelling(
+        traced_await("provider.flights", _gather_flights()),
+        traced_await("provider.hotels", search_hotels(
+            destination,
+            start_date,
+            end_date,
+            adults=adults,
+            accommodation_type=accommodation_type,
+            min_rating=hotel_rating,
+            pages=HOTEL_MAX_PAGES,
+            top_k=10,
+        )),
+        traced_await(
+            "provider.weather",
+            get_forecast(lat=dest.lat, lon=dest.lon) if dest is not None else get_forecast(destination),
         ),
-        asyncio.create_task(
-            search_hotels(
-                destination,
-                start_date,
-                end_date,
-                adults=adults,
-                accommodation_type=accommodation_type,
-                min_rating=hotel_rating,
-            )
-        ),
-        asyncio.create_task(get_forecast(destination)),
-        asyncio.create_task(_gather_places()),
-        asyncio.create_task(_gather_events()),
-        asyncio.create_task(_gather_restaurants()),
-        asyncio.create_task(_gather_visa_safety()),
-    ]
-    flights, hotels, forecast, places, events, restaurants, visa_safety = await asyncio.gather(*tasks, return_exceptions=False)
+        traced_await("provider.places", _gather_places()),
+        traced_await("provider.events", _gather_events()),
+        traced_await("provider.restaurants", _gather_restaurants()),
+        traced_await("provider.visa_safety", _gather_visa_safety()),
+    )
 
-    return {
-        "flights": flights or [],
+    result = {
+        "flights": flights.get("outbound") or [],
+        "return_flights": flights.get("return") or [],
+        "itineraries": flights.get("itineraries") or [],
         "hotels": hotels or [],
         "forecast": forecast or [],
         "places": places or [],
@@ -144,25 +187,48 @@ async def gather_external_data(
         "visa_info": visa_safety.get("visa", {}),
         "safety_info": visa_safety.get("safety", {}),
     }
+    # keep the city's proximity index warm for /nearby and later plans
+    try:
+        update_destination_index(destination, result["places"], result["hotels"], result["restaurants"])
+    except Exception:
+        pass
+    # queue for the analytics store; conversion and writes happen off the request path
+    sink = get_analytics_sink()
+    if sink is not None:
+        try:
+            sink.record(
+                {"origin": origin, "destination": destination, "start_date": start_date, "end_date": end_date},
+                result,
+            )
+        except Exception:
+            pass
+    return result
+
+
+# Events kept per trip day, so one busy evening doesn't crowd out the rest
+EVENTS_PER_DAY = 5
 
 
 def _filter_days_by_weather(days: List[str], forecast: List[Dict[str, Any]], avoid_bad_weather: bool) -> List[str]:
     if not avoid_bad_weather or not forecast:
         return days
-    bad_keywords = {"rain", "storm", "snow", "thunder"}
-    bad_dates = set()
-    for entry in forecast:
-        desc = (entry.get("description") or "").lower()
-        date = entry.get("date")
-        if date and any(k in desc for k in bad_keywords):
-            bad_dates.add(date)
+    bad_dates = {entry["date"] for entry in forecast if entry.get("date") and is_bad_weather_day(entry)}
     return [d for d in days if d not in bad_dates] or days  # never drop all days
 
 
-def _estimate_cost(flights: List[Dict[str, Any]], hotels: List[Dict[str, Any]], nights: int) -> float | None:
+def _estimate_cost(
+    flights: List[Dict[str, Any]],
+    hotels: List[Dict[str, Any]],
+    nights: int,
+    itineraries: List[Dict[str, Any]] | None = None,
+) -> float | None:
     try:
-        flight_prices = [f.get("price") for f in flights if isinstance(f.get("price"), (int, float))]
-        flight_cost = min(flight_prices) if flight_prices else 0
+        if itineraries:
+            # cheapest round trip (itineraries are sorted by total price)
+            flight_cost = itineraries[0]["total_price"]
+        else:
+            flight_prices = [f.get("price") for f in flights if isinstance(f.get("price"), (int, float))]
+            flight_cost = min(flight_prices) if flight_prices else 0
         hotel_prices = [h.get("price_per_night") for h in hotels if isinstance(h.get("price_per_night"), (int, float))]
         nightly = sum(hotel_prices[:1]) or (hotel_prices[0] if hotel_prices else 0)  # pick top option
         hotel_cost = nightly * max(0, nights)
@@ -171,24 +237,37 @@ def _estimate_cost(flights: List[Dict[str, Any]], hotels: List[Dict[str, Any]],
         return None
 
 
-def _build_itinerary(days: List[str], places: List[Dict[str, Any]], language: str = "en") -> List[Dict[str, Any]]:
-    # naive assignment: 3 activities per day
-    itinerary: List[Dict[str, Any]] = []
-    idx = 0
-    for d in days:
-        activities = []
-        for _ in range(3):
-            if idx < len(places):
-                name = places[idx].get("name")
-                if name:
-                    activities.append(f"Visit {name}")
-                idx += 1
-        itinerary.append({"date": d, "activities": activities})
-    return itinerary
-
-
-async def generate_itinerary(payload: Dict[str, Any]) -> Dict[str, Any]:
-    """Main orchestration entrypoint used by the API layer."""
+def _build_itinerary(
+    days: List[str],
+    places: List[Dict[str, Any]],
+    language: str = "en",
+    bad_weather_days: List[str] | None = None,
+    base: Dict[str, Any] | None = None,
+    mode: str | None = None,
+) -> List[Dict[str, Any]]:
+    """
+    Timed visits per day from the ranked places (see services.day_scheduler):
+    each visit fits the place's opening hours, with travel time from the
+    previous stop by `mode`; bad-weather days only get indoor places.
+    """
+    return schedule_days(days, places, bad_weather_days=bad_weather_days or (), base=base, mode=mode)
+
+
+@profiled("generate_itinerary")
+@traced("generate_itinerary")
+async def generate_itinerary(
+    payload: Dict[str, Any],
+    progress: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    """
+    Main orchestration entrypoint used by the API layer.
+    `progress`, if given, is called with the name of each stage as it starts.
+    """
+    def _stage(name: str) -> None:
+        add_event("stage", stage=name)
+        if progress is not None:
+            progress(name)
+
     origin = payload.get("origin")
     destination = payload.get("destination")
     start_date = payload.get("start_date")
@@ -202,6 +281,7 @@ async def generate_itinerary(payload: Dict[str, Any]) -> Dict[str, Any]:
     language = payload.get("language") or "en"
 
     # Gather data
+    _stage("gathering_data")
     external = await gather_external_data(
         origin=origin,
         destination=destination,
@@ -213,14 +293,17 @@ async def generate_itinerary(payload: Dict[str, Any]) -> Dict[str, Any]:
         preferred_airlines=payload.get("preferred_airlines") or [],
         accommodation_type=payload.get("accommodation_type"),
         hotel_rating=payload.get("hotel_rating"),
-        dietary_restrictions=payload.get("dietary_restrictions") or [],
+        dietary_restrictions=payload.get("dietary_restrictions") or payload.get("dietary_preferences") or [],
     )
 
     # Days to plan
-    days = _date_range(start_date, end_date, limit=max_days)
-    days = _filter_days_by_weather(days, external.get("forecast", []), avoid_bad_weather)
+    planned_days = _date_range(start_date, end_date, limit=max_days)
+    # events on any planned day count, even ones the weather filter drops (they may be indoors)
+    external["events"] = filter_events_by_days(external.get("events", []), planned_days)
+    days = _filter_days_by_weather(planned_days, external.get("forecast", []), avoid_bad_weather)
 
     # Try MCP AI first (if available)
+    _stage("planning")
     itinerary: List[Dict[str, Any]] = []
     estimated_cost = None
     if get_ai_trip_plan is not None:
@@ -229,33 +312,68 @@ async def generate_itinerary(payload: Dict[str, Any]) -> Dict[str, Any]:
             "external": external,
             "days": days,
         }
-        try:
-            ai_resp = await get_ai_trip_plan(mcp_payload)
-            itinerary = ai_resp.get("itinerary", []) if isinstance(ai_resp, dict) else []
-            estimated_cost = ai_resp.get("estimated_cost") if isinstance(ai_resp, dict) else None
-        except Exception:
-            itinerary = []
+        with span("ai_plan") as ai_span:
+            try:
+                ai_resp = await get_ai_trip_plan(mcp_payload)
+                itinerary = ai_resp.get("itinerary", []) if isinstance(ai_resp, dict) else []
+                estimated_cost = ai_resp.get("estimated_cost") if isinstance(ai_resp, dict) else None
+            except Exception:
+                itinerary = []
+            ai_span.set("days", len(itinerary))
 
-    # Fallback: heuristic plan
-    if not itinerary:
-        itinerary = _build_itinerary(days, external.get("places", []), language=language)
+    # Flight, hotel, events and dining chosen to fit the budget
+    try:
+        budget_plan = optimize_budget(
+            external,
+            planned_days,
+            budget=payload.get("budget"),
+            trip_style=payload.get("trip_style"),
+            adults=adults,
+            children=int(payload.get("children") or 0),
+            senior_citizens=int(payload.get("senior_citizens") or 0),
+            preferred_airlines=payload.get("preferred_airlines") or [],
+            activities=activities,
+        )
+    except Exception:
+        budget_plan = None
+    if not isinstance(estimated_cost, (int, float)):
+        estimated_cost = (
+            budget_plan["plan"]["total_cost"]
+            if budget_plan is not None
+            else _estimate_cost(
+                external.get("flights", []),
+                external.get("hotels", []),
+                nights=max(0, len(days) - 1),
+                itineraries=external.get("itineraries"),
+            )
+        )
 
-    # Simple cost estimate
-    estimated_cost = (
-        estimated_cost
-        if isinstance(estimated_cost, (int, float))
-        else _estimate_cost(external.get("flights", []), external.get("hotels", []), nights=max(0, len(days) - 1))
-    )
+    # Fallback: heuristic plan, timed around opening hours and travel from the hotel;
+    # days the weather filter dropped stay in the plan with indoor places only
+    if not itinerary:
+        hotel = (budget_plan or {}).get("plan", {}).get("hotel") or next(
+            (h for h in external.get("hotels", []) if h.get("lat") is not None), None
+        )
+        itinerary = _build_itinerary(
+            planned_days,
+            external.get("places", []),
+            language=language,
+            bad_weather_days=[d for d in planned_days if d not in days],
+            base=hotel,
+            mode=payload.get("transportation_mode"),
+        )
 
     # Generate booking links for top options
-    booking_links = await get_booking_links(
-        hotels=external.get("hotels", []),
-        flights=external.get("flights", []),
-        destination=destination,
-        start_date=start_date,
-        end_date=end_date,
-        adults=adults
-    )
+    _stage("booking_links")
+    with span("booking_links"):
+        booking_links = await get_booking_links(
+            hotels=external.get("hotels", []),
+            flights=external.get("flights", []),
+            destination=destination,
+            start_date=start_date,
+            end_date=end_date,
+            adults=adults
+        )
 
     # Create comprehensive trip response
     trip_data = {
@@ -265,7 +383,10 @@ async def generate_itinerary(payload: Dict[str, Any]) -> Dict[str, Any]:
         "adults": adults,
         "itinerary": itinerary,
         "estimated_cost": estimated_cost,
+        "budget_plan": budget_plan,
         "flights": external.get("flights", []),
+        "return_flights": external.get("return_flights", []),
+        "itineraries": external.get("itineraries", []),
         "hotels": external.get("hotels", []),
         "restaurants": external.get("restaurants", []),
         "events": external.get("events", []),
@@ -276,6 +397,7 @@ async def generate_itinerary(payload: Dict[str, Any]) -> Dict[str, Any]:
     }
 
     # Create exportable summary
+    _stage("summarizing")
     trip_summary = await create_trip_summary_export(trip_data)
 
     return {
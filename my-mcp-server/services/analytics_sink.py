@@ -0,0 +1,294 @@
+# services/analytics_sink.py
+"""
+Append-only columnar store of provider results for offline analysis.
+
+Every gather_external_data run hands its normalized flights, hotels, places,
+restaurants and forecast to record(), which only snapshots the lists into an
+in-memory queue. A background thread turns queued runs into columns and
+writes one file per (kind, capture date, destination) batch:
+
+    ANALYTICS_DIR/<kind>/date=YYYY-MM-DD/destination=<slug>/part-<ts>-<pid>-<n>.arrow
+
+Files are Arrow IPC by default, which read back zero-copy through a memory
+map (read_table below, or pyarrow.dataset with format="ipc"); set
+ANALYTICS_FORMAT=parquet for smaller files. pyarrow is optional: without it
+batches are written as JSON lines with the same layout.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from core.serialization import dumps_bytes
+from services.destinations import normalize
+
+try:
+    import pyarrow as pa  # optional, needed for Arrow/Parquet output
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = None
+    pq = None
+
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "1") not in ("0", "false", "False")
+ANALYTICS_DIR = os.getenv("ANALYTICS_DIR", "analytics")
+ANALYTICS_FORMAT = os.getenv("ANALYTICS_FORMAT", "arrow")  # arrow | parquet
+# Flush once this many runs are queued, or every interval seconds
+ANALYTICS_BATCH_RUNS = int(os.getenv("ANALYTICS_BATCH_RUNS", "50"))
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "30"))
+# Runs beyond this are dropped rather than growing memory if the disk stalls
+ANALYTICS_MAX_QUEUED = int(os.getenv("ANALYTICS_MAX_QUEUED", "10000"))
+
+logger = logging.getLogger(__name__)
+
+
+def _float(value: Any) -> Optional[float]:
+    try:
+        return None if value is None else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value: Any) -> Optional[int]:
+    try:
+        return None if value is None else int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _str(value: Any) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        return "|".join(str(v) for v in value)
+    return str(value)
+
+
+# column -> (arrow type name, converter, source field)
+Columns = List[Tuple[str, str, Callable[[Any], Any], str]]
+
+_CONTEXT: Columns = [
+    ("run_id", "string", _str, "run_id"),
+    ("captured_at", "timestamp", _int, "captured_at"),
+    ("origin", "string", _str, "origin"),
+    ("destination", "string", _str, "destination"),
+    ("start_date", "string", _str, "start_date"),
+    ("end_date", "string", _str, "end_date"),
+]
+
+# kind -> (key in gather_external_data's result, row columns)
+SCHEMAS: Dict[str, Tuple[str, Columns]] = {
+    "flights": ("flights", [
+        ("leg", "string", _str, "leg"),
+        ("airline", "string", _str, "airline"),
+        ("price", "float64", _float, "price"),
+        ("departure_time", "string", _str, "departure_time"),
+        ("arrival_time", "string", _str, "arrival_time"),
+        ("stops", "int64", _int, "stops"),
+        ("duration", "string", _str, "duration"),
+    ]),
+    "hotels": ("hotels", [
+        ("property_id", "string", _str, "property_id"),
+        ("name", "string", _str, "name"),
+        ("price_per_night", "float64", _float, "price_per_night"),
+        ("rating", "float64", _float, "rating"),
+        ("accommodation_type", "string", _str, "accommodation_type"),
+    ]),
+    "places": ("places", [
+        ("place_id", "string", _str, "place_id"),
+        ("name", "string", _str, "name"),
+        ("rating", "float64", _float, "rating"),
+        ("types", "string", _str, "types"),
+        ("lat", "float64", _float, "lat"),
+        ("lon", "float64", _float, "lon"),
+    ]),
+    "restaurants": ("restaurants", [
+        ("name", "string", _str, "name"),
+        ("rating", "float64", _float, "rating"),
+        ("price_level", "string", _str, "price_level"),
+        ("cuisine", "string", _str, "cuisine"),
+        ("lat", "float64", _float, "lat"),
+        ("lon", "float64", _float, "lon"),
+        ("source", "string", _str, "source"),
+    ]),
+    "forecasts": ("forecast", [
+        ("date", "string", _str, "date"),
+        ("temp_min", "float64", _float, "temp_min"),
+        ("temp_max", "float64", _float, "temp_max"),
+        ("description", "string", _str, "description"),
+        ("pop_max", "float64", _float, "pop_max"),
+    ]),
+}
+
+
+def _arrow_schema(columns: Columns):
+    types = {"string": pa.string(), "float64": pa.float64(), "int64": pa.int64(), "timestamp": pa.timestamp("ms", tz="UTC")}
+    return pa.schema([(name, types[kind]) for name, kind, _, _ in columns])
+
+
+def _slug(destination: Any) -> str:
+    return normalize(destination or "").replace(" ", "-") or "unknown"
+
+
+class AnalyticsSink:
+    def __init__(
+        self,
+        root: str = ANALYTICS_DIR,
+        fmt: str = ANALYTICS_FORMAT,
+        batch_runs: int = ANALYTICS_BATCH_RUNS,
+        flush_interval: float = ANALYTICS_FLUSH_INTERVAL,
+        max_queued: int = ANALYTICS_MAX_QUEUED,
+    ):
+        self.root = root
+        self.format = fmt if pa is not None else "jsonl"
+        self.batch_runs = batch_runs
+        self.flush_interval = flush_interval
+        self.max_queued = max_queued
+        self.dropped = 0
+        self._queue: Deque[Tuple[Dict[str, Any], Dict[str, List[Dict[str, Any]]]]] = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._flush_lock = threading.Lock()
+        self._seq = 0
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, context: Dict[str, Any], external: Dict[str, Any]) -> None:
+        """
+        Queue one run's results. Only copies list references; conversion and
+        I/O happen on the writer thread.
+        """
+        if len(self._queue) >= self.max_queued:
+            self.dropped += 1
+            return
+        snapshot = {kind: list(external.get(key) or []) for kind, (key, _) in SCHEMAS.items()}
+        snapshot["return_flights"] = list(external.get("return_flights") or [])
+        ctx = {
+            **{k: context.get(k) for k in ("origin", "destination", "start_date", "end_date")},
+            "run_id": context.get("run_id") or uuid.uuid4().hex,
+            "captured_at": int(context.get("captured_at", time.time()) * 1000),
+        }
+        self._queue.append((ctx, snapshot))
+        self._ensure_thread()
+        if len(self._queue) >= self.batch_runs:
+            self._wake.set()
+
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="analytics-sink", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("analytics flush failed")
+
+    def flush(self) -> List[str]:
+        """Write everything queued so far; returns the files written."""
+        with self._flush_lock:
+            runs = []
+            while self._queue:
+                runs.append(self._queue.popleft())
+            if not runs:
+                return []
+            # (kind, date, destination slug) -> column name -> values
+            groups: Dict[Tuple[str, str, str], Dict[str, List[Any]]] = {}
+            for ctx, snapshot in runs:
+                day = time.strftime("%Y-%m-%d", time.gmtime(ctx["captured_at"] / 1000))
+                slug = _slug(ctx["destination"])
+                flights = [{**f, "leg": "outbound"} for f in snapshot["flights"] if isinstance(f, dict)]
+                flights += [{**f, "leg": "return"} for f in snapshot["return_flights"] if isinstance(f, dict)]
+                for kind, (_, row_columns) in SCHEMAS.items():
+                    rows = flights if kind == "flights" else snapshot[kind]
+                    if not rows:
+                        continue
+                    cols = groups.setdefault((kind, day, slug), {name: [] for name, *_ in _CONTEXT + row_columns})
+                    for row in rows:
+                        for name, _, convert, field in _CONTEXT:
+                            cols[name].append(convert(ctx[field]))
+                        for name, _, convert, field in row_columns:
+                            cols[name].append(convert(row.get(field)) if isinstance(row, dict) else None)
+            return [self._write(kind, day, slug, cols) for (kind, day, slug), cols in groups.items()]
+
+    def _write(self, kind: str, day: str, slug: str, cols: Dict[str, List[Any]]) -> str:
+        directory = os.path.join(self.root, kind, f"date={day}", f"destination={slug}")
+        os.makedirs(directory, exist_ok=True)
+        self._seq += 1
+        ext = {"arrow": "arrow", "parquet": "parquet"}.get(self.format, "jsonl")
+        path = os.path.join(directory, f"part-{int(time.time() * 1000)}-{os.getpid()}-{self._seq}.{ext}")
+        tmp = f"{path}.tmp"
+        if self.format in ("arrow", "parquet"):
+            table = pa.table(cols, schema=_arrow_schema(_CONTEXT + SCHEMAS[kind][1]))
+            if self.format == "parquet":
+                pq.write_table(table, tmp)
+            else:
+                with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        else:
+            names = list(cols)
+            with open(tmp, "wb") as fh:
+                for values in zip(*cols.values()):
+                    fh.write(dumps_bytes(dict(zip(names, values))) + b"\n")
+        # readers never see a half-written part
+        os.replace(tmp, path)
+        return path
+
+    def close(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+
+def read_table(kind: str, root: str = ANALYTICS_DIR, date: Optional[str] = None, destination: Optional[str] = None):
+    """
+    Concatenate a kind's Arrow IPC parts (optionally one date/destination
+    partition) into one pyarrow Table backed by memory maps, without copying.
+    """
+    if pa is None:
+        raise RuntimeError("pyarrow is required to read analytics tables")
+    tables = []
+    base = os.path.join(root, kind)
+    for dirpath, _, files in sorted(os.walk(base)):
+        rel = os.path.relpath(dirpath, base).split(os.sep)
+        if date and f"date={date}" not in rel:
+            continue
+        if destination and f"destination={_slug(destination)}" not in rel:
+            continue
+        for name in sorted(files):
+            if name.endswith(".arrow"):
+                tables.append(pa.ipc.open_file(pa.memory_map(os.path.join(dirpath, name))).read_all())
+    if not tables:
+        return _arrow_schema(_CONTEXT + SCHEMAS[kind][1]).empty_table()
+    return pa.concat_tables(tables)
+
+
+_sink: Optional[AnalyticsSink] = None
+
+
+def get_analytics_sink() -> Optional[AnalyticsSink]:
+    """The process-wide sink, or None when ANALYTICS_ENABLED is off."""
+    global _sink
+    if _sink is None and ANALYTICS_ENABLED:
+        _sink = AnalyticsSink()
+        # entrypoints without a shutdown hook (the MCP servers) still flush on exit
+        atexit.register(close_analytics_sink)
+    return _sink
+
+
+def close_analytics_sink() -> None:
+    global _sink
+    if _sink is not None:
+        try:
+            _sink.close()
+        finally:
+            _sink = None
@@ -0,0 +1,186 @@
+# services/autocomplete.py
+"""
+Typeahead suggestions for cities and airports, served entirely from memory.
+
+Every searchable string (city names and aliases, airport names, IATA codes)
+is normalized and stored once in a sorted list; a prefix query is a bisect
+into that list followed by a short forward scan. Matches are ranked by
+popularity (city population, airport traffic) and, when the caller passes
+its position, by distance. If a prefix has no matches the query is retried
+as a typo: keys sharing the first letter are compared by edit distance.
+"""
+import math
+from bisect import bisect_left
+from functools import lru_cache
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from core.cache import LRUCache
+from services.destinations import DestinationIndex, get_index, haversine_km, normalize
+
+# Upper bound on keys scanned per query, so very short prefixes stay cheap
+MAX_SCAN = 2000
+# Airports count for a twentieth of their annual passengers when ranked
+# against city populations, so "lon" suggests London before Heathrow
+AIRPORT_WEIGHT = 0.05
+
+
+class Entry(NamedTuple):
+    kind: str  # "city" | "airport"
+    code: str  # city id or IATA code
+    name: str
+    city_id: str
+    city: str
+    country_code: str
+    country: str
+    lat: float
+    lon: float
+    popularity: float
+
+
+def prefix_distance(q: str, key: str, limit: int) -> int:
+    """
+    Edit distance (with adjacent transpositions) from q to the closest prefix
+    of key of length len(q) +/- 1; returns limit + 1 once it is exceeded.
+    """
+    b = key[:len(q) + 1]
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(q, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and q[i - 2] == cb:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return min(prev[max(len(q) - 1, 1):])
+
+
+class AutocompleteIndex:
+    def __init__(self, destinations: DestinationIndex):
+        entries: List[Entry] = []
+        pairs: List[Tuple[str, int]] = []
+
+        def add(keys, entry: Entry) -> None:
+            idx = len(entries)
+            entries.append(entry)
+            for key in {normalize(k) for k in keys if k}:
+                pairs.append((key, idx))
+                # later words too, so "heat" finds "London Heathrow"
+                words = key.split(" ")
+                for n in range(1, len(words)):
+                    pairs.append((" ".join(words[n:]), idx))
+
+        for city in destinations.cities:
+            add(
+                (city.name, *destinations.aliases.get(city.id, ())),
+                Entry("city", city.id, city.name, city.id, city.name, city.country_code, city.country,
+                      city.lat, city.lon, float(city.population)),
+            )
+        for airport in destinations.airports.values():
+            city = destinations.by_id.get(airport.city_id)
+            if city is None:
+                continue
+            add(
+                (airport.iata, airport.name),
+                Entry("airport", airport.iata, airport.name, city.id, city.name, city.country_code, city.country,
+                      airport.lat, airport.lon, airport.passengers_m * 1e6 * AIRPORT_WEIGHT),
+            )
+
+        pairs.sort()
+        self.entries: Tuple[Entry, ...] = tuple(entries)
+        self.keys: List[str] = [k for k, _ in pairs]
+        self.refs: List[int] = [i for _, i in pairs]
+        self._fuzzy_cache = LRUCache(maxsize=4096)
+        # first-letter buckets for the typo fallback
+        self._buckets: Dict[str, Tuple[int, int]] = {}
+        for pos, key in enumerate(self.keys):
+            lo, _ = self._buckets.get(key[0], (pos, pos))
+            self._buckets[key[0]] = (lo, pos + 1)
+
+    def _prefix(self, q: str) -> Dict[int, int]:
+        """entry index -> 0 for exact key matches, 1 for prefix matches (incl. later words)."""
+        hits: Dict[int, int] = {}
+        pos = bisect_left(self.keys, q)
+        end = min(len(self.keys), pos + MAX_SCAN)
+        while pos < end and self.keys[pos].startswith(q):
+            rank = 0 if self.keys[pos] == q else 1
+            ref = self.refs[pos]
+            if rank < hits.get(ref, 2):
+                hits[ref] = rank
+            pos += 1
+        return hits
+
+    def _fuzzy(self, q: str) -> Dict[int, int]:
+        """entry index -> 1 + edit distance of the query to the key's prefix."""
+        cached = self._fuzzy_cache.get(q)
+        if cached is not None:
+            return cached
+        limit = 1 if len(q) <= 4 else 2
+        lo, hi = self._buckets.get(q[0], (0, 0))
+        hits: Dict[int, int] = {}
+        # neighbouring keys often share the compared prefix; score each one once
+        distances: Dict[str, int] = {}
+        for pos in range(lo, hi):
+            head = self.keys[pos][:len(q) + 1]
+            dist = distances.get(head)
+            if dist is None:
+                dist = distances[head] = prefix_distance(q, head, limit)
+            if dist <= limit:
+                ref = self.refs[pos]
+                hits[ref] = min(hits.get(ref, limit + 2), 1 + dist)
+        self._fuzzy_cache.set(q, hits)
+        return hits
+
+    def search(
+        self,
+        query: str,
+        limit: int = 8,
+        kinds: Optional[Tuple[str, ...]] = None,
+        near: Optional[Tuple[float, float]] = None,
+    ) -> List[Dict[str, Any]]:
+        q = normalize(query)
+        if not q:
+            return []
+        hits = self._prefix(q)
+        fuzzy = False
+        if not hits and len(q) >= 3:
+            hits, fuzzy = self._fuzzy(q), True
+
+        scored = []
+        for ref, penalty in hits.items():
+            entry = self.entries[ref]
+            if kinds and entry.kind not in kinds:
+                continue
+            score = math.log10(entry.popularity + 10) - 2.0 * penalty
+            if entry.kind == "airport" and entry.code.lower() == q:
+                score += 1.0  # an exact IATA code most likely means the airport
+            if near is not None:
+                score -= math.log10(1 + haversine_km(near[0], near[1], entry.lat, entry.lon) / 100)
+            scored.append((score, ref))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [self._as_dict(self.entries[ref], score, fuzzy) for score, ref in scored[:limit]]
+
+    @staticmethod
+    def _as_dict(entry: Entry, score: float, fuzzy: bool) -> Dict[str, Any]:
+        label = f"{entry.name} ({entry.code})" if entry.kind == "airport" else f"{entry.name}, {entry.country}"
+        return {
+            "type": entry.kind,
+            "id": entry.code,
+            "name": entry.name,
+            "label": label,
+            "city_id": entry.city_id,
+            "city": entry.city,
+            "country_code": entry.country_code,
+            "country": entry.country,
+            "lat": entry.lat,
+            "lon": entry.lon,
+            "score": round(score, 3),
+            "fuzzy": fuzzy,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_autocomplete_index() -> AutocompleteIndex:
+    return AutocompleteIndex(get_index())
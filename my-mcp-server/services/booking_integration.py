@@ -169,12 +169,15 @@ async def _search_package_deals(
     
     return package_deals
 
-async def create_trip_summary_export(trip_data: Dict[str, Any]) -> Dict[str, Any]:
+async def create_trip_summary_export(trip_data: Dict[str, Any], trip_id: str = None) -> Dict[str, Any]:
     """
     Create exportable trip summary with all booking information.
-    Returns data that can be exported to PDF, email, or calendar.
+    Returns data that can be exported to PDF, email, or calendar; once the
+    plan is stored (trip_id known) the export links point at the real
+    export endpoints.
     """
-    
+    export_base = f"/api/v1/travel/export/{trip_id}" if trip_id else "/api/trip/export"
+
     summary = {
         "trip_overview": {
             "destination": trip_data.get("destination", ""),
@@ -194,9 +197,9 @@ async def create_trip_summary_export(trip_data: Dict[str, Any]) -> Dict[str, Any
         },
         "booking_links": trip_data.get("booking_links", {}),
         "export_formats": {
-            "pdf_download": "/api/trip/export/pdf",
-            "calendar_export": "/api/trip/export/calendar",
-            "email_summary": "/api/trip/export/email"
+            "pdf_download": f"{export_base}/pdf",
+            "calendar_export": f"{export_base}/calendar",
+            "email_summary": f"{export_base}/email"
         }
     }
     
@@ -0,0 +1,346 @@
+# services/budget_optimizer.py
+"""
+Pick the flight, hotel, paid events and daily dining level that maximize a
+preference score without exceeding the trip budget.
+
+Every option gets a value (comfort, rating, interest) minus a price term
+weighted by trip_style, so "budget" trips trade comfort for savings and
+"luxury" trips the other way round. Flight and hotel are one-of choices,
+scored together as an F x H matrix; at most one event per day and exactly
+one dining level per day form a grouped knapsack solved by dynamic
+programming over the budget split into BUDGET_BINS steps, one vectorized
+array update per option. The table gives the best events + dining value for every leftover
+amount, so the best plan for any budget up to the table size, e.g. the
+cheaper and premium alternatives, is a lookup per flight/hotel pair.
+
+Costs are rounded up to whole steps, so a chosen plan never exceeds the
+budget; it may leave up to one step per item unspent.
+"""
+import math
+import os
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Budget resolution for the knapsack table
+BUDGET_BINS = int(os.getenv("BUDGET_BINS", "2000"))
+# Ticket price assumed for events whose source doesn't publish one
+EVENT_DEFAULT_PRICE = float(os.getenv("EVENT_DEFAULT_PRICE", "40"))
+# Spend per person per day at each restaurant price level ($ .. $$$$)
+DINING_COST_PER_DAY = {1: 25.0, 2: 50.0, 3: 100.0, 4: 180.0}
+# Diminishing returns: a $$$$ day isn't four times better than a $ day
+DINING_UTILITY = {1: 0.3, 2: 0.6, 3: 0.85, 4: 1.0}
+# Reference spend per traveller per day, used to price savings when no budget is set
+BUDGET_REFERENCE_DAILY = float(os.getenv("BUDGET_REFERENCE_DAILY", "200"))
+# Alternatives: cheaper costs at most this share of the chosen plan,
+# premium may spend this multiple of the budget and cares less about price
+CHEAPER_FACTOR = 0.8
+PREMIUM_FACTOR = 1.3
+PREMIUM_SAVINGS_WEIGHT = 0.25
+
+STYLE_WEIGHTS: Dict[str, Dict[str, float]] = {
+    "balanced": {"flight": 1.0, "hotel": 1.0, "events": 1.0, "dining": 1.0, "savings": 1.0},
+    "luxury": {"flight": 1.5, "hotel": 2.0, "events": 1.0, "dining": 2.0, "savings": 0.3},
+    "budget": {"flight": 0.6, "hotel": 0.6, "events": 0.8, "dining": 0.5, "savings": 2.5},
+    "backpacking": {"flight": 0.4, "hotel": 0.3, "events": 1.2, "dining": 0.4, "savings": 3.0},
+    "family-friendly": {"flight": 1.2, "hotel": 1.2, "events": 1.0, "dining": 0.8, "savings": 1.0},
+}
+_FAMILY_WORDS = ("family", "kids", "children", "zoo", "aquarium", "park", "museum", "circus", "puppet")
+_ADULT_WORDS = ("nightlife", "club", "bar ", "pub", "21+", "18+", "casino", "cocktail", "burlesque")
+
+
+class Party(NamedTuple):
+    tickets: int  # people paying for a seat or a ticket
+    diners: float  # children eat for half
+    rooms: int
+
+
+def party_size(adults: int = 1, children: int = 0, senior_citizens: int = 0) -> Party:
+    adults, children, seniors = max(0, int(adults or 0)), max(0, int(children or 0)), max(0, int(senior_citizens or 0))
+    grown = max(1, adults + seniors)
+    return Party(grown + children, grown + 0.5 * children, math.ceil(grown / 2))
+
+
+def _number(value: Any) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def price_level(value: Any) -> Optional[int]:
+    """1-4 from a Google level (1-4) or a Yelp/normalized "$".."$$$$" string."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value) if 1 <= value <= 4 else None
+    text = str(value or "").strip()
+    return len(text) if text and set(text) == {"$"} and len(text) <= 4 else None
+
+
+def _text(item: Dict[str, Any]) -> str:
+    return f" {item.get('name') or ''} {item.get('description') or ''} ".lower()
+
+
+def _flight_options(
+    itineraries: Sequence[Dict[str, Any]],
+    flights: Sequence[Dict[str, Any]],
+    return_flights: Sequence[Dict[str, Any]],
+) -> List[Tuple[Dict[str, Any], float, int, List[Any]]]:
+    """(option, price per ticket, total stops, airlines); round trips when joined itineraries exist."""
+    options = []
+    for it in itineraries or []:
+        price = _number(it.get("total_price"))
+        legs = [leg for leg in it.get("legs") or [] if isinstance(leg, dict)]
+        if price is not None:
+            stops = sum(int(_number(leg.get("stops")) or 0) for leg in legs)
+            options.append((it, price, stops, [leg.get("airline") for leg in legs]))
+    if options:
+        return options
+    # one-way fares, plus the cheapest return when there is one
+    back = [p for p in (_number(f.get("price")) for f in return_flights or []) if p is not None]
+    extra = min(back) if back else 0.0
+    for f in flights or []:
+        price = _number(f.get("price"))
+        if price is not None:
+            options.append((f, price + extra, int(_number(f.get("stops")) or 0), [f.get("airline")]))
+    return options
+
+
+class _Group(NamedTuple):
+    options: np.ndarray  # indexes into the event or dining arrays
+    steps: np.ndarray  # cost in budget steps, per option
+    values: np.ndarray
+    optional: bool  # may pick none (events) or must pick one (a day's dining)
+
+
+def _knapsack(groups: List[_Group], bins: int) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """
+    Grouped knapsack: at most (optional) or exactly one option per group.
+    Returns the best value spending at most r steps, for every r, and per
+    group the option position chosen at r (-1 for none).
+    """
+    best = np.zeros(bins + 1)
+    picks: List[np.ndarray] = []
+    for group in groups:
+        new = best.copy() if group.optional else np.full(bins + 1, -np.inf)
+        pick = np.full(bins + 1, -1, dtype=np.int16)
+        for i, (c, v) in enumerate(zip(group.steps.tolist(), group.values.tolist())):
+            if c > bins or (group.optional and v <= 0):
+                continue  # unaffordable, or never worth its price
+            cand = np.full(bins + 1, -np.inf)
+            cand[c:] = best[:bins + 1 - c] + v
+            better = cand > new
+            new = np.where(better, cand, new)
+            pick[better] = i
+        best = new
+        picks.append(pick)
+    return best, picks
+
+
+class _Problem:
+    """Scored options for one trip; after discretize(cap), solve() answers for any budget up to cap."""
+
+    def __init__(self, external, days, nights, party, weights, preferred_airlines, activities, family):
+        self.days, self.nights, self.party = days, nights, party
+
+        self.flights = _flight_options(
+            external.get("itineraries") or [], external.get("flights") or [], external.get("return_flights") or []
+        )
+        preferred = {a.lower() for a in preferred_airlines or [] if a}
+        if self.flights:
+            prices = np.array([p for _, p, _, _ in self.flights]) * party.tickets
+            stops = np.array([s for _, _, s, _ in self.flights], dtype=float)
+            liked = np.array([any(str(a or "").lower() in preferred for a in air) for _, _, _, air in self.flights])
+            flight_cost, flight_util = prices, weights["flight"] * (1.0 - 0.4 * stops + 0.5 * liked)
+        else:
+            flight_cost, flight_util = np.zeros(1), np.zeros(1)
+
+        self.hotels = [h for h in external.get("hotels") or [] if (_number(h.get("price_per_night")) or 0) > 0]
+        if self.hotels:
+            nightly = np.array([_number(h["price_per_night"]) for h in self.hotels])
+            rating = np.array([_number(h.get("rating")) or 3.0 for h in self.hotels])
+            hotel_cost = nightly * max(nights, 0) * party.rooms
+            hotel_util = weights["hotel"] * max(nights, 1) * np.clip(rating, 0, 5) / 5
+        else:
+            hotel_cost, hotel_util = np.zeros(1), np.zeros(1)
+
+        self.events = [e for e in external.get("events") or [] if e.get("name")]
+        interests = [a.lower() for a in activities or [] if a]
+        event_price = np.array([
+            _number(e.get("price")) if _number(e.get("price")) is not None else EVENT_DEFAULT_PRICE
+            for e in self.events
+        ]) if self.events else np.zeros(0)
+        self.event_cost = event_price * party.tickets
+        texts = [_text(e) for e in self.events]
+        event_util = np.array([
+            (0.2 if family and any(w in t for w in _ADULT_WORDS) else 1.0)
+            + (0.5 if family and any(w in t for w in _FAMILY_WORDS) else 0.0)
+            + (0.5 if any(a in t for a in interests) else 0.0)
+            for t in texts
+        ]) * weights["events"]
+
+        # best-rated restaurant at each price level stands for that level
+        by_level: Dict[int, List[Dict[str, Any]]] = {}
+        for r in external.get("restaurants") or []:
+            level = price_level(r.get("price_level"))
+            if level is not None:
+                by_level.setdefault(level, []).append(r)
+        for level in by_level:
+            by_level[level].sort(key=lambda r: -(_number(r.get("rating")) or 0))
+        self.restaurants = by_level
+        self.dining_levels = sorted(by_level) or sorted(DINING_COST_PER_DAY)
+        self.dining_cost = np.array([DINING_COST_PER_DAY[lv] for lv in self.dining_levels]) * party.diners
+        quality = np.array([
+            (_number(by_level[lv][0].get("rating")) or 4.0) / 5 if by_level.get(lv) else 0.8
+            for lv in self.dining_levels
+        ])
+        dining_util = weights["dining"] * np.array([DINING_UTILITY[lv] for lv in self.dining_levels]) * quality
+
+        self.flight_cost, self.hotel_cost = flight_cost, hotel_cost
+        self.flight_util, self.hotel_util = flight_util, hotel_util
+        self.event_util, self.dining_util = event_util, dining_util
+        # at most one event per day; undated events stand alone
+        by_day: Dict[str, List[int]] = {}
+        for i, e in enumerate(self.events):
+            by_day.setdefault(e.get("date") or f"#{i}", []).append(i)
+        self.event_groups = [np.array(g) for g in by_day.values()]
+        self.fixed_cost = flight_cost[:, None] + hotel_cost[None, :]
+
+    def most_expensive(self) -> float:
+        events = sum(float(self.event_cost[g].max()) for g in self.event_groups)
+        return float(self.fixed_cost.max()) + events + float(self.dining_cost.max()) * len(self.days)
+
+    def discretize(self, cap: float) -> None:
+        self.cap = cap
+        self.unit = cap / BUDGET_BINS if cap > 0 else 1.0
+        self.event_steps = np.ceil(self.event_cost / self.unit - 1e-9).astype(np.int64)
+        self.dining_steps = np.ceil(self.dining_cost / self.unit - 1e-9).astype(np.int64)
+
+    def solve(self, budget: float, savings: float) -> Optional[Dict[str, Any]]:
+        """Best plan costing at most `budget` when each unit of money costs `savings` points."""
+        bins = BUDGET_BINS
+        event_values = self.event_util - savings * self.event_cost
+        dining = _Group(
+            np.arange(len(self.dining_levels)), self.dining_steps, self.dining_util - savings * self.dining_cost, False
+        )
+        groups = [_Group(g, self.event_steps[g], event_values[g], True) for g in self.event_groups]
+        groups += [dining] * len(self.days)
+        table, picks = _knapsack(groups, bins)
+        fixed_value = (self.flight_util - savings * self.flight_cost)[:, None] + (
+            self.hotel_util - savings * self.hotel_cost)[None, :]
+        left = np.floor((min(budget, self.cap) - self.fixed_cost) / self.unit + 1e-9).astype(np.int64)
+        total = np.where(left >= 0, fixed_value + table[np.clip(left, 0, bins)], -np.inf)
+        fi, hi = np.unravel_index(int(np.argmax(total)), total.shape)
+        if not np.isfinite(total[fi, hi]):
+            return None
+        r = int(left[fi, hi])
+        chosen = []
+        for group, pick in zip(reversed(groups), reversed(picks)):
+            i = int(pick[r])
+            if i >= 0:
+                chosen.append(int(group.options[i]))
+                r -= int(group.steps[i])
+        chosen.reverse()
+        n = len(self.days)
+        events, dining = chosen[:len(chosen) - n], chosen[len(chosen) - n:]
+        return self._plan(int(fi), int(hi), sorted(events), dining, float(total[fi, hi]))
+
+    def cheapest(self) -> Dict[str, Any]:
+        """The least expensive complete plan, ignoring preferences."""
+        fi, hi = np.unravel_index(int(np.argmin(self.fixed_cost)), self.fixed_cost.shape)
+        i = int(np.argmin(self.dining_cost))
+        return self._plan(int(fi), int(hi), [], [i] * len(self.days), None)
+
+    def _plan(self, fi: int, hi: int, events: List[int], dining: List[int], score: Optional[float]) -> Dict[str, Any]:
+        breakdown = {
+            "flights": float(self.flight_cost[fi]),
+            "hotel": float(self.hotel_cost[hi]),
+            "events": float(self.event_cost[events].sum()) if events else 0.0,
+            "dining": float(self.dining_cost[dining].sum()) if dining else 0.0,
+        }
+        seen: Dict[int, int] = {}
+        days = []
+        for day, i in zip(self.days, dining):
+            level = self.dining_levels[i]
+            options = self.restaurants.get(level) or []
+            # rotate through the level's restaurants across days
+            n = seen[level] = seen.get(level, -1) + 1
+            days.append({
+                "date": day,
+                "price_level": "$" * level,
+                "cost": round(float(self.dining_cost[i]), 2),
+                "restaurant": options[n % len(options)].get("name") if options else None,
+            })
+        return {
+            "total_cost": round(sum(breakdown.values()), 2),
+            "score": None if score is None else round(score, 3),
+            "flight": self.flights[fi][0] if self.flights else None,
+            "hotel": self.hotels[hi] if self.hotels else None,
+            "events": [
+                {**self.events[e], "estimated_price": round(float(self.event_cost[e]), 2)} for e in events
+            ],
+            "dining": days,
+            "breakdown": {k: round(v, 2) for k, v in breakdown.items()},
+        }
+
+
+def _same(a: Optional[Dict[str, Any]], b: Optional[Dict[str, Any]]) -> bool:
+    keys = ("flight", "hotel", "events", "dining")
+    return a is not None and b is not None and all(a[k] == b[k] for k in keys)
+
+
+def optimize_budget(
+    external: Dict[str, Any],
+    days: List[str],
+    budget: Optional[float] = None,
+    trip_style: Optional[str] = None,
+    adults: int = 1,
+    children: int = 0,
+    senior_citizens: int = 0,
+    preferred_airlines: Optional[List[str]] = None,
+    activities: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Best plan within `budget` (unconstrained when None) from gather_external_data
+    results, plus a cheaper and a premium alternative (None when there is no
+    distinct one). When nothing fits, `plan` is the cheapest possible plan
+    and `within_budget` is False.
+    """
+    weights = STYLE_WEIGHTS.get((trip_style or "").strip().lower(), STYLE_WEIGHTS["balanced"])
+    party = party_size(adults, children, senior_citizens)
+    family = bool(children) or (trip_style or "").strip().lower() == "family-friendly"
+    nights = max(0, len(days) - 1)
+    budget = _number(budget)
+    if budget is not None and budget <= 0:
+        budget = None
+
+    problem = _Problem(external, days, nights, party, weights, preferred_airlines, activities, family)
+    # the table must cover the premium alternative; without a budget, everything at once
+    cap = budget * PREMIUM_FACTOR if budget is not None else problem.most_expensive()
+    problem.discretize(cap)
+
+    # Money left over is worth something too: spending the whole budget
+    # (or the reference spend) costs one point per trip day
+    scale = budget or BUDGET_REFERENCE_DAILY * party.tickets * max(1, len(days))
+    savings = weights["savings"] * max(1, len(days)) / scale
+    limit = budget if budget is not None else cap
+
+    plan = problem.solve(limit, savings)
+    within = plan is not None
+    if plan is None:
+        plan = problem.cheapest()
+    cheaper = problem.solve(plan["total_cost"] * CHEAPER_FACTOR, savings) if within else None
+    premium = problem.solve(cap, savings * PREMIUM_SAVINGS_WEIGHT)
+    return {
+        "budget": budget,
+        "trip_style": trip_style if (trip_style or "").strip().lower() in STYLE_WEIGHTS else "balanced",
+        "within_budget": within,
+        "plan": plan,
+        "alternatives": {
+            "cheaper": cheaper,
+            "premium": None if _same(premium, plan) else premium,
+        },
+    }
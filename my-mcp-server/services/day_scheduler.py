@@ -0,0 +1,261 @@
+# services/day_scheduler.py
+"""
+Timed day plans from ranked, enriched places.
+
+Travel times come from one vectorized haversine matrix over the day base
+(the hotel) and every place, scaled by the traveller's transportation_mode.
+Each day is built greedily, always adding the open place with the best
+value per minute spent (travel + waiting + visit), then improved by local
+search: 2-opt reversals that shorten the route and insertions of unvisited
+places into the time that frees up. Every visit starts and ends inside one
+of the place's opening intervals for that weekday (weekly_intervals from
+places_api; unknown hours count as always open) and within the day window.
+Bad-weather days only get indoor places.
+"""
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from services.places_api import weekly_intervals
+
+DAY_START = int(os.getenv("SCHEDULE_DAY_START_MINUTES", str(9 * 60)))
+DAY_END = int(os.getenv("SCHEDULE_DAY_END_MINUTES", str(19 * 60)))
+MAX_VISITS_PER_DAY = int(os.getenv("SCHEDULE_MAX_VISITS_PER_DAY", "6"))
+# Unvisited places tried per day when filling gaps after 2-opt
+INSERT_CANDIDATES = 12
+
+# mode -> (average speed km/h, fixed minutes per trip for waiting or parking)
+TRAVEL_MODES = {"walking": (4.5, 0), "public": (20.0, 8), "car": (30.0, 10)}
+_MODE_ALIASES = {
+    "walk": "walking", "foot": "walking",
+    "public transport": "public", "transit": "public", "bus": "public", "metro": "public", "train": "public",
+    "rental car": "car", "rental_car": "car", "driving": "car", "taxi": "car",
+}
+# Streets aren't straight lines
+DETOUR_FACTOR = 1.3
+# Hops shorter than this are walked whatever the mode
+WALK_KM = 0.8
+# Assumed when either end has no coordinates
+UNKNOWN_TRAVEL_MINUTES = 20
+
+# Typical visit length (minutes) by Google place type; the longest matching type wins
+VISIT_MINUTES = {
+    "amusement_park": 240, "zoo": 180, "aquarium": 120, "museum": 120, "art_gallery": 90,
+    "shopping_mall": 90, "park": 75, "natural_feature": 90, "tourist_attraction": 60,
+    "church": 40, "place_of_worship": 40, "hindu_temple": 40, "mosque": 40, "synagogue": 40,
+    "point_of_interest": 60,
+}
+DEFAULT_VISIT_MINUTES = 75
+INDOOR_TYPES = {
+    "museum", "art_gallery", "aquarium", "shopping_mall", "church", "place_of_worship", "hindu_temple",
+    "mosque", "synagogue", "library", "movie_theater", "bowling_alley", "spa", "casino", "department_store",
+    "cafe", "restaurant", "bar", "night_club", "stadium",
+}
+
+
+def travel_mode(mode: Optional[str]) -> str:
+    key = (mode or "public").strip().lower()
+    key = _MODE_ALIASES.get(key, key)
+    return key if key in TRAVEL_MODES else "public"
+
+
+def travel_minutes_matrix(lats: np.ndarray, lons: np.ndarray, mode: Optional[str] = None) -> np.ndarray:
+    """
+    Pairwise travel minutes (ints) between points in degrees; NaN
+    coordinates get UNKNOWN_TRAVEL_MINUTES to and from everything.
+    """
+    speed, overhead = TRAVEL_MODES[travel_mode(mode)]
+    phi, lam = np.radians(lats), np.radians(lons)
+    a = (np.sin((phi[:, None] - phi[None, :]) * 0.5) ** 2
+         + np.cos(phi)[:, None] * np.cos(phi)[None, :] * np.sin((lam[:, None] - lam[None, :]) * 0.5) ** 2)
+    km = 12742.0 * np.arcsin(np.sqrt(np.minimum(a, 1.0))) * DETOUR_FACTOR
+    walk_speed = TRAVEL_MODES["walking"][0]
+    minutes = np.where(km < WALK_KM, km / walk_speed * 60, km / speed * 60 + overhead)
+    minutes = np.where(np.isnan(minutes), UNKNOWN_TRAVEL_MINUTES, np.ceil(minutes))
+    np.fill_diagonal(minutes, 0)
+    return minutes.astype(np.int64)
+
+
+def visit_minutes(place: Dict[str, Any]) -> int:
+    explicit = place.get("visit_minutes")
+    if isinstance(explicit, (int, float)) and explicit > 0:
+        return int(explicit)
+    known = [VISIT_MINUTES[t] for t in place.get("types") or [] if t in VISIT_MINUTES]
+    return max(known) if known else DEFAULT_VISIT_MINUTES
+
+
+def _coordinate(value: Any) -> float:
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else math.nan
+
+
+def _hhmm(minutes: int) -> str:
+    return f"{minutes // 60 % 24:02d}:{minutes % 60:02d}"
+
+
+class DayScheduler:
+    def __init__(
+        self,
+        places: Sequence[Dict[str, Any]],
+        base: Optional[Dict[str, Any]] = None,
+        mode: Optional[str] = None,
+    ):
+        """places in ranking order (earlier is better); base is where each day starts (the hotel)."""
+        self.places = [p for p in places if p.get("name")]
+        n = len(self.places)
+        lats = np.array([_coordinate(p.get("lat")) for p in self.places])
+        lons = np.array([_coordinate(p.get("lon")) for p in self.places])
+        base_lat, base_lon = (_coordinate(base.get("lat")), _coordinate(base.get("lon"))) if base else (math.nan, math.nan)
+        if math.isnan(base_lat) or math.isnan(base_lon):
+            # no hotel position: start from the middle of the places
+            known = ~np.isnan(lats) & ~np.isnan(lons)
+            base_lat, base_lon = (float(lats[known].mean()), float(lons[known].mean())) if known.any() else (math.nan, math.nan)
+        # node 0 is the base, node i + 1 is place i
+        self.travel = travel_minutes_matrix(np.r_[base_lat, lats], np.r_[base_lon, lons], mode)
+        self._travel_rows = self.travel.tolist()
+        self.visit = np.array([visit_minutes(p) for p in self.places], dtype=np.int64)
+        ratings = np.array([_coordinate(p.get("rating")) for p in self.places])
+        ratings = np.where(np.isnan(ratings), 4.0, ratings)
+        # ranking order matters most; rating breaks near-ties
+        self.prize = 1.0 + (n - np.arange(n)) / max(n, 1) + ratings / 10
+        self.indoor = np.array([bool(INDOOR_TYPES.intersection(p.get("types") or ())) for p in self.places], dtype=bool)
+        self._weeks = [weekly_intervals(p.get("opening_hours")) for p in self.places]
+        self._windows: Dict[int, Tuple[List[List[Tuple[int, int]]], np.ndarray, np.ndarray]] = {}
+
+    def _weekday_windows(self, weekday: int):
+        """Per place interval lists, plus (n, K) open/close arrays padded with empty intervals."""
+        cached = self._windows.get(weekday)
+        if cached is None:
+            lists = [[(0, 1440)] if week is None else week[weekday] for week in self._weeks]
+            k = max((len(x) for x in lists), default=1) or 1
+            opens = np.full((len(lists), k), 10 ** 9, dtype=np.int64)
+            closes = np.zeros((len(lists), k), dtype=np.int64)
+            for i, intervals in enumerate(lists):
+                for j, (o, c) in enumerate(intervals):
+                    opens[i, j], closes[i, j] = o, c
+            cached = self._windows[weekday] = (lists, opens, closes)
+        return cached
+
+    def _start(self, intervals: List[Tuple[int, int]], arrival: int, length: int) -> Optional[int]:
+        for o, c in intervals:
+            s = max(arrival, o)
+            if s + length <= min(c, DAY_END):
+                return s
+        return None
+
+    def _simulate(self, route: List[int], lists) -> Optional[List[Tuple[int, int, int]]]:
+        """(start, end, travel) per stop, or None when a stop can't fit its hours."""
+        t, node, out = DAY_START, 0, []
+        for i in route:
+            travel = self._travel_rows[node][i + 1]
+            length = int(self.visit[i])
+            s = self._start(lists[i], t + travel, length)
+            if s is None:
+                return None
+            out.append((s, s + length, travel))
+            t, node = s + length, i + 1
+        return out
+
+    def _greedy(self, allowed: np.ndarray, weekday: int) -> List[int]:
+        _, opens, closes = self._weekday_windows(weekday)
+        route: List[int] = []
+        t, node = DAY_START, 0
+        cand = np.flatnonzero(allowed)
+        while len(route) < MAX_VISITS_PER_DAY and len(cand):
+            length = self.visit[cand]
+            arrival = t + self.travel[node, cand + 1]
+            start = np.maximum(arrival[:, None], opens[cand])
+            fits = start + length[:, None] <= np.minimum(closes[cand], DAY_END)
+            start = np.where(fits, start, 10 ** 9).min(axis=1)
+            ok = fits.any(axis=1)
+            if not ok.any():
+                break
+            spent = start + length - t
+            value = np.where(ok, self.prize[cand] / np.maximum(spent, 1), -1.0)
+            best = int(np.argmax(value))
+            pick = int(cand[best])
+            route.append(pick)
+            t, node = int(start[best] + length[best]), pick + 1
+            cand = np.delete(cand, best)
+        return route
+
+    def _two_opt(self, route: List[int], lists) -> List[int]:
+        """Reverse segments while that makes the day end earlier and stays feasible."""
+        best = self._simulate(route, lists)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(route) - 1):
+                for j in range(i + 1, len(route)):
+                    trial = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+                    plan = self._simulate(trial, lists)
+                    if plan is not None and plan[-1][1] < best[-1][1]:
+                        route, best, improved = trial, plan, True
+        return route
+
+    def _insert(self, route: List[int], allowed: np.ndarray, lists) -> List[int]:
+        """Add the best-prized unvisited places that fit anywhere in the day."""
+        pool = np.flatnonzero(allowed)
+        pool = pool[np.argsort(-self.prize[pool], kind="stable")][:INSERT_CANDIDATES].tolist()
+        for cand in pool:
+            if len(route) >= MAX_VISITS_PER_DAY:
+                break
+            best_route, best_end = None, None
+            for pos in range(len(route) + 1):
+                trial = route[:pos] + [cand] + route[pos:]
+                plan = self._simulate(trial, lists)
+                if plan is not None and (best_end is None or plan[-1][1] < best_end):
+                    best_route, best_end = trial, plan[-1][1]
+            if best_route is not None:
+                route = best_route
+        return route
+
+    def schedule(self, days: Iterable[str], bad_weather_days: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        bad = set(bad_weather_days)
+        available = np.ones(len(self.places), dtype=bool)
+        itinerary: List[Dict[str, Any]] = []
+        for day in days:
+            try:
+                weekday = datetime.fromisoformat(day).weekday()
+            except (TypeError, ValueError):
+                weekday = 0
+            lists = self._weekday_windows(weekday)[0]
+            allowed = available & self.indoor if day in bad else available.copy()
+            route = self._greedy(allowed, weekday)
+            if len(route) > 1:
+                route = self._two_opt(route, lists)
+            allowed[route] = False
+            route = self._insert(route, allowed, lists)
+            available[route] = False
+            stops = self._simulate(route, lists) or []
+            schedule = [
+                {
+                    "time": _hhmm(start),
+                    "end": _hhmm(end),
+                    "name": self.places[i]["name"],
+                    "place_id": self.places[i].get("place_id"),
+                    "travel_minutes": travel,
+                }
+                for i, (start, end, travel) in zip(route, stops)
+            ]
+            entry = {
+                "date": day,
+                "activities": [f"Visit {s['name']}" for s in schedule],
+                "schedule": schedule,
+            }
+            if day in bad:
+                entry["weather"] = "bad"
+            itinerary.append(entry)
+        return itinerary
+
+
+def schedule_days(
+    days: Iterable[str],
+    places: Sequence[Dict[str, Any]],
+    bad_weather_days: Iterable[str] = (),
+    base: Optional[Dict[str, Any]] = None,
+    mode: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    return DayScheduler(places, base=base, mode=mode).schedule(days, bad_weather_days)
@@ -0,0 +1,187 @@
+# services/destinations.py
+"""
+Local destination resolver.
+
+User input arrives as "Tokyo", "tokyo ", "Tokyo, Japan" or "HND". Resolving
+it against the bundled city/airport dataset (data/cities.csv,
+data/airports.csv) gives one canonical Destination with coordinates, country
+code and IATA codes, so every service builds the same provider parameters and
+cache keys for equivalent requests and OpenWeather/Google don't have to
+geocode the same city over and over.
+
+The index is a plain dict from normalized name to city, built once on first
+use; resolve() results are memoized, so repeated lookups cost a dict hit.
+"""
+import csv
+import math
+import os
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+DESTINATION_DATA_DIR = os.getenv(
+    "DESTINATION_DATA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"),
+)
+
+_DROP = re.compile(r"[.'’]")
+_SEPARATORS = re.compile(r"[\W_]+")
+_IATA = re.compile(r"^[A-Z]{3}$")
+
+# Google Places "region" takes a ccTLD, which differs from ISO 3166 for a few countries
+_CCTLD_OVERRIDES = {"GB": "uk"}
+
+
+class Airport(NamedTuple):
+    iata: str
+    name: str
+    city_id: str
+    lat: float
+    lon: float
+    passengers_m: float
+
+
+class Destination(NamedTuple):
+    id: str
+    name: str
+    country_code: str
+    country: str
+    lat: float
+    lon: float
+    population: int
+    iata: Tuple[str, ...]  # busiest airport first
+
+    @property
+    def coords(self) -> Tuple[float, float]:
+        return (self.lat, self.lon)
+
+    @property
+    def label(self) -> str:
+        return f"{self.name}, {self.country}"
+
+    @property
+    def region(self) -> str:
+        """ccTLD-style region code for Google Places."""
+        return _CCTLD_OVERRIDES.get(self.country_code, self.country_code.lower())
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in kilometres."""
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 12742.0 * math.asin(math.sqrt(a))
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and punctuation, collapse whitespace."""
+    text = unicodedata.normalize("NFKD", str(text or ""))
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = _DROP.sub("", text.casefold())
+    return " ".join(_SEPARATORS.sub(" ", text).split())
+
+
+class DestinationIndex:
+    def __init__(
+        self,
+        cities: List[Destination],
+        airports: List[Airport],
+        aliases: Optional[Dict[str, Tuple[str, ...]]] = None,
+    ):
+        aliases = aliases or {}
+        self.aliases: Dict[str, Tuple[str, ...]] = aliases
+        self.cities: Tuple[Destination, ...] = tuple(cities)
+        self.by_id: Dict[str, Destination] = {c.id: c for c in cities}
+        self.airports: Dict[str, Airport] = {a.iata: a for a in airports}
+        self._countries = {normalize(c.country): c.country_code for c in cities}
+        self._countries.update({normalize(c.country_code): c.country_code for c in cities})
+
+        self._keys: Dict[str, Destination] = {}
+        # larger cities claim shared names first ("santiago", "dc", ...)
+        for city in sorted(cities, key=lambda c: -c.population):
+            for name in (city.name, city.id, *aliases.get(city.id, ())):
+                key = normalize(name)
+                if not key:
+                    continue
+                self._keys.setdefault(key, city)
+                self._keys.setdefault(f"{key} {normalize(city.country)}", city)
+                self._keys.setdefault(f"{key} {normalize(city.country_code)}", city)
+        for airport in airports:
+            city = self.by_id.get(airport.city_id)
+            if city is not None:
+                self._keys.setdefault(normalize(airport.name), city)
+
+    @classmethod
+    def load(cls, data_dir: str = DESTINATION_DATA_DIR) -> "DestinationIndex":
+        airports: List[Airport] = []
+        with open(os.path.join(data_dir, "airports.csv"), encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                airports.append(Airport(
+                    row["iata"], row["name"], row["city_id"],
+                    float(row["lat"]), float(row["lon"]), float(row["passengers_m"] or 0),
+                ))
+        cities: List[Destination] = []
+        aliases: Dict[str, Tuple[str, ...]] = {}
+        with open(os.path.join(data_dir, "cities.csv"), encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                cities.append(Destination(
+                    row["id"], row["name"], row["country_code"], row["country"],
+                    float(row["lat"]), float(row["lon"]), int(row["population"] or 0),
+                    tuple(code for code in row["iata"].split("|") if code),
+                ))
+                aliases[row["id"]] = tuple(a for a in row["aliases"].split("|") if a)
+        return cls(cities, airports, aliases)
+
+    def resolve(self, text: str) -> Optional[Destination]:
+        raw = str(text or "").strip()
+        if _IATA.match(raw) and raw in self.airports:
+            return self.by_id.get(self.airports[raw].city_id)
+        hit = self._keys.get(normalize(raw))
+        if hit is not None or "," not in raw:
+            return hit
+        # "Tokyo, Kanto, Japan": match the leading part when the trailing part
+        # names the same country; anything else ("Paris, Texas") stays unresolved
+        head, *rest = [part for part in raw.split(",") if part.strip()] or [""]
+        hit = self._keys.get(normalize(head))
+        if hit is None or (rest and self._countries.get(normalize(rest[-1])) != hit.country_code):
+            return None
+        return hit
+
+    def country(self, text: str) -> Optional[str]:
+        """ISO code for a country name or code."""
+        return self._countries.get(normalize(text))
+
+
+@lru_cache(maxsize=1)
+def get_index() -> DestinationIndex:
+    return DestinationIndex.load()
+
+
+@lru_cache(maxsize=8192)
+def resolve(text: str) -> Optional[Destination]:
+    """Canonical destination for a city/airport string, or None if unknown."""
+    return get_index().resolve(text)
+
+
+def canonical_name(text: str) -> str:
+    """Canonical city name, or the whitespace-normalized input if unknown."""
+    dest = resolve(text)
+    return dest.name if dest is not None else " ".join(str(text or "").split())
+
+
+def airport_code(text: str) -> str:
+    """IATA code for an airport code or city (its busiest airport); input unchanged if unknown."""
+    raw = str(text or "").strip()
+    if _IATA.match(raw.upper()) and raw.upper() in get_index().airports:
+        return raw.upper()
+    dest = resolve(raw)
+    return dest.iata[0] if dest is not None and dest.iata else raw
+
+
+def country_code(text: str) -> Optional[str]:
+    """ISO country code for a city, airport or country name."""
+    dest = resolve(text)
+    if dest is not None:
+        return dest.country_code
+    return get_index().country(text)
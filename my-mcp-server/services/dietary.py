@@ -0,0 +1,178 @@
+# services/dietary.py
+"""
+Dietary-restriction matching for restaurant listings.
+
+Each diet has positive keywords (evidence a place caters for it) and
+conflict keywords (evidence it doesn't). All keywords of a restriction set
+are compiled into one regex shaped like a trie, so scanning a listing is a
+single left-to-right pass whose cost depends on the text length and the
+keyword depth, not on how many keywords there are. Matchers are cached per
+restriction set.
+"""
+import re
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Tuple
+
+from services.destinations import normalize
+
+# diet -> (positive keywords, conflict keywords); matched against normalized text
+DIET_KEYWORDS: Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]] = {
+    "vegetarian": (
+        ("vegetarian", "vegan", "veggie", "plant based", "salad", "falafel", "indian", "mediterranean",
+         "south indian", "thali", "meze", "hummus"),
+        ("steakhouse", "steak house", "churrascaria", "bbq", "barbecue", "smokehouse", "butcher",
+         "rotisserie", "hot dog", "wings"),
+    ),
+    "vegan": (
+        ("vegan", "plant based", "raw food", "vegetarian", "falafel", "tofu"),
+        ("steakhouse", "steak house", "churrascaria", "bbq", "barbecue", "smokehouse", "butcher",
+         "seafood", "fish", "cheese", "creamery", "ice cream", "gelato", "fondue", "burger", "wings"),
+    ),
+    "pescatarian": (
+        ("seafood", "fish", "sushi", "oyster", "vegetarian", "vegan", "poke"),
+        ("steakhouse", "steak house", "churrascaria", "bbq", "barbecue", "smokehouse", "butcher"),
+    ),
+    "gluten-free": (
+        ("gluten free", "gf", "celiac", "coeliac", "wheat free"),
+        ("bakery", "pizza", "pizzeria", "pasta", "ramen", "udon", "noodle", "noodles", "dumpling",
+         "dumplings", "brewery", "beer hall", "bagel", "donut", "doughnut"),
+    ),
+    "dairy-free": (
+        ("dairy free", "vegan", "lactose free", "plant based"),
+        ("creamery", "ice cream", "gelato", "cheese", "fondue", "dairy bar"),
+    ),
+    "halal": (
+        ("halal", "middle eastern", "turkish", "lebanese", "persian", "pakistani", "afghan", "kebab",
+         "shawarma", "malaysian"),
+        ("pork", "bacon", "ham", "brewery", "gastropub", "wine bar", "beer hall", "pub"),
+    ),
+    "kosher": (
+        ("kosher", "jewish", "israeli"),
+        ("pork", "bacon", "ham", "shellfish", "oyster", "lobster", "crab"),
+    ),
+}
+
+# spellings people use for the same diet
+DIET_ALIASES = {
+    "veg": "vegetarian",
+    "veggie": "vegetarian",
+    "plant based": "vegan",
+    "gluten free": "gluten-free",
+    "celiac": "gluten-free",
+    "coeliac": "gluten-free",
+    "dairy free": "dairy-free",
+    "lactose free": "dairy-free",
+    "pescetarian": "pescatarian",
+}
+
+POSITIVE, CONFLICT = 1, -1
+
+
+def canonical_diet(restriction: str) -> str:
+    key = normalize(restriction)
+    if key in DIET_ALIASES:
+        return DIET_ALIASES[key]
+    dashed = key.replace(" ", "-")
+    return dashed if dashed in DIET_KEYWORDS else key
+
+
+def trie_regex(words: Iterable[str]) -> str:
+    """
+    Regex alternation factored by common prefixes ("pizza|pizzeria" ->
+    "pizz(?:a|eria)"), so the engine follows one branch per character
+    instead of trying every keyword at each position.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node: Dict[str, Any]) -> str:
+        end = node.get("") is True
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if end:
+            body = "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class DietaryMatcher:
+    def __init__(self, keywords: Dict[str, Tuple[Iterable[str], Iterable[str]]]):
+        self.diets = tuple(keywords)
+        # normalized keyword -> [(diet, POSITIVE | CONFLICT)]
+        self._lookup: Dict[str, List[Tuple[str, int]]] = {}
+        for diet, (positive, conflicts) in keywords.items():
+            for words, polarity in ((positive, POSITIVE), (conflicts, CONFLICT)):
+                for word in words:
+                    key = normalize(word)
+                    if key:
+                        self._lookup.setdefault(key, []).append((diet, polarity))
+        pattern = trie_regex(self._lookup) if self._lookup else r"(?!)"
+        self._regex = re.compile(r"\b(?:" + pattern + r")\b")
+
+    def match(self, text: str) -> Dict[str, Dict[str, List[str]]]:
+        """diet -> {"matched": [...], "conflicts": [...]} for one normalized pass over text."""
+        found: Dict[str, Dict[str, List[str]]] = {d: {"matched": [], "conflicts": []} for d in self.diets}
+        for m in self._regex.finditer(normalize(text)):
+            word = m.group(0)
+            for diet, polarity in self._lookup.get(word, ()):
+                bucket = found[diet]["matched" if polarity == POSITIVE else "conflicts"]
+                if word not in bucket:
+                    bucket.append(word)
+        return found
+
+    def score(self, restaurant: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Evidence across name, cuisine and categories/types. Score is the
+        number of diets with positive evidence minus two per conflicting diet.
+        """
+        parts = [restaurant.get("name"), restaurant.get("cuisine")]
+        parts += [c for c in (restaurant.get("categories") or restaurant.get("types") or []) if isinstance(c, str)]
+        found = self.match(" | ".join(str(p) for p in parts if p))
+        matched = sorted(d for d, f in found.items() if f["matched"] and not f["conflicts"])
+        conflicts = sorted(d for d, f in found.items() if f["conflicts"])
+        return {
+            "score": len(matched) - 2 * len(conflicts),
+            "suits": matched,
+            "conflicts": conflicts,
+            "keywords": sorted({w for f in found.values() for w in f["matched"] + f["conflicts"]}),
+        }
+
+
+@lru_cache(maxsize=256)
+def _matcher_for(diets: FrozenSet[str]) -> DietaryMatcher:
+    # unknown restrictions ("paleo") match their own name as positive evidence
+    return DietaryMatcher({d: DIET_KEYWORDS.get(d, ((d.replace("-", " "),), ())) for d in sorted(diets)})
+
+
+def get_matcher(restrictions: Iterable[str]) -> DietaryMatcher:
+    return _matcher_for(frozenset(canonical_diet(r) for r in restrictions if r and r.strip()))
+
+
+def rank_by_diet(
+    restaurants: List[Dict[str, Any]],
+    restrictions: Iterable[str],
+    strict: bool = False,
+) -> List[Dict[str, Any]]:
+    """
+    Annotate each restaurant with a "dietary" block and order by score
+    (stable, so provider order breaks ties). strict drops restaurants with
+    conflicting evidence for any requested diet. Inputs are not mutated.
+    """
+    matcher = get_matcher(restrictions)
+    if not matcher.diets:
+        return list(restaurants)
+    ranked = []
+    for r in restaurants:
+        dietary = matcher.score(r)
+        if strict and dietary["conflicts"]:
+            continue
+        ranked.append({**r, "dietary": dietary})
+    ranked.sort(key=lambda r: -r["dietary"]["score"])
+    return ranked
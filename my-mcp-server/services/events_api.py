@@ -1,92 +1,289 @@
 # services/events_api.py
+"""
+Event search across Eventbrite and Ticketmaster.
+
+Both sources are queried concurrently under one deadline, each reading up to
+EVENT_MAX_PAGES date-sorted pages. The per-source streams are combined with
+a k-way heap merge on start time, and the same event listed by both sources
+is kept once. Merged events are cached per city and day, so trips with
+overlapping dates reuse each other's results and only fetch the missing days.
+"""
 import os
-from typing import List, Dict, Any
+import asyncio
+import heapq
+from datetime import date, timedelta
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from core.cache import LRUCache
 from core.http_client import get_json
+from core.tracing import annotate
+from services.destinations import canonical_name, normalize, resolve
 
 EVENTBRITE_KEY = os.getenv("EVENTBRITE_API_KEY")
 TICKETMASTER_KEY = os.getenv("TICKETMASTER_API_KEY")
 
+# Pages read per source, page size, and one deadline (seconds) for all of them
+EVENT_MAX_PAGES = int(os.getenv("EVENT_MAX_PAGES", "3"))
+EVENT_PAGE_SIZE = int(os.getenv("EVENT_PAGE_SIZE", "50"))
+EVENT_DEADLINE = float(os.getenv("EVENT_DEADLINE", "6"))
+EVENT_MAX_RESULTS = int(os.getenv("EVENT_MAX_RESULTS", "30"))
+EVENT_CACHE_TTL = float(os.getenv("EVENT_CACHE_TTL", "900"))
+# (city, day) -> merged events starting that day
+_cache = LRUCache(maxsize=int(os.getenv("EVENT_CACHE_SIZE", "4096")), ttl=EVENT_CACHE_TTL)
+
+# One page: (events, total page count)
+PageFetcher = Callable[[int], Awaitable[Tuple[List[Dict[str, Any]], int]]]
+
+
 async def search_events(
-    city: str, 
-    start_date: str, 
+    city: str,
+    start_date: str,
     end_date: str,
-    categories: List[str] = None
+    categories: List[str] = None,
+    days: Optional[Iterable[str]] = None,
+    per_day: Optional[int] = None,
+    max_results: int = EVENT_MAX_RESULTS,
 ) -> List[Dict[str, Any]]:
     """
-    Search for events during travel dates.
-    Combines multiple event sources.
+    Search for events during travel dates, ordered by start time.
+    Combines multiple event sources; see the module docstring. `days`
+    restricts the result to those dates (YYYY-MM-DD) and `per_day` caps the
+    events kept for any one date.
     """
-    events = []
-    
-    # Try Eventbrite first
-    if EVENTBRITE_KEY:
-        try:
-            events.extend(await _search_eventbrite(city, start_date, end_date, categories))
-        except Exception:
-            pass
-    
-    # Try Ticketmaster
-    if TICKETMASTER_KEY:
-        try:
-            events.extend(await _search_ticketmaster(city, start_date, end_date, categories))
-        except Exception:
-            pass
-    
+    dest = resolve(city)
+    city = canonical_name(city)
+    country_code = dest.country_code if dest else None
+
+    window = _window(start_date, end_date)
+    if window:
+        found = {d: _cache.get((normalize(city), d)) for d in window}
+        missing = [d for d, cached in found.items() if cached is None]
+        annotate("cached_days", len(window) - len(missing))
+        if missing:
+            fetched, complete_before, ok = await _search_all_sources(
+                city, missing[0], missing[-1], categories, country_code
+            )
+            by_day: Dict[str, List[Dict[str, Any]]] = {}
+            for event in fetched:
+                by_day.setdefault(event.get("date") or "", []).append(event)
+            for d in missing:
+                found[d] = by_day.get(d, [])
+                # a truncated source may still have events for its last day and later
+                if ok and (complete_before is None or d < complete_before):
+                    _cache.set((normalize(city), d), found[d])
+        events = [e for d in window for e in found[d]]
+    else:
+        # unparseable dates: pass them through and skip the per-day cache
+        events, _, _ = await _search_all_sources(city, start_date, end_date, categories, country_code)
+
+    events = filter_events_by_days(events, days, per_day=per_day)
+
     # Fallback: basic event suggestions
     if not events:
         events = _generate_basic_events(city, categories or [])
-    
-    return events[:10]  # Limit results
 
-async def _search_eventbrite(city: str, start_date: str, end_date: str, categories: List[str]) -> List[Dict[str, Any]]:
+    return events[:max_results]
+
+
+def filter_events_by_days(
+    events: Iterable[Dict[str, Any]],
+    days: Optional[Iterable[str]] = None,
+    per_day: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Keep events on the given dates (all dates if None), at most per_day each;
+    undated suggestions always pass. Order is preserved.
+    """
+    wanted = set(days) if days is not None else None
+    counts: Dict[str, int] = {}
+    kept = []
+    for event in events:
+        d = event.get("date") or ""
+        if wanted is not None and d and d not in wanted:
+            continue
+        if per_day is not None:
+            if counts.get(d, 0) >= per_day:
+                continue
+            counts[d] = counts.get(d, 0) + 1
+        kept.append(event)
+    return kept
+
+
+def _window(start_date: str, end_date: str) -> List[str]:
+    try:
+        start, end = date.fromisoformat(str(start_date)[:10]), date.fromisoformat(str(end_date)[:10])
+    except ValueError:
+        return []
+    return [(start + timedelta(days=n)).isoformat() for n in range((end - start).days + 1)]
+
+
+async def _search_all_sources(
+    city: str,
+    start_date: str,
+    end_date: str,
+    categories: List[str],
+    country_code: Optional[str],
+) -> Tuple[List[Dict[str, Any]], Optional[str], bool]:
+    """
+    (merged events, first date that may be incomplete or None, whether any
+    source answered). A source that failed or missed EVENT_DEADLINE
+    contributes nothing.
+    """
+    searches = []
+    if EVENTBRITE_KEY:
+        searches.append(_search_eventbrite(city, start_date, end_date, categories))
+    if TICKETMASTER_KEY:
+        searches.append(_search_ticketmaster(city, start_date, end_date, categories, country_code=country_code))
+    if not searches:
+        return [], None, False
+
+    tasks = [asyncio.ensure_future(s) for s in searches]
+    try:
+        await asyncio.wait(tasks, timeout=EVENT_DEADLINE)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    results = [t.result() for t in tasks if not t.cancelled() and t.exception() is None]
+    if len(results) < len(tasks):
+        # missing sources make every fetched day incomplete
+        complete_before: Optional[str] = ""
+    else:
+        cutoffs = [events[-1].get("date") or "" for events, complete in results if not complete and events]
+        complete_before = min(cutoffs) if cutoffs else None
+    return merge_events([events for events, _ in results]), complete_before, bool(results)
+
+
+def _start_key(event: Dict[str, Any]) -> str:
+    # undated events sort after everything else
+    return event.get("start_time") or "~"
+
+
+def merge_events(sources: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    k-way merge of per-source event lists into one list ordered by start
+    time. Events with the same normalized name on the same date are folded
+    into the first one seen; `sources` lists every provider that had it.
+    """
+    # providers return date-sorted pages; sorting an already sorted list is linear
+    streams = [sorted(events, key=_start_key) for events in sources]
+    merged: List[Dict[str, Any]] = []
+    seen: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for event in heapq.merge(*streams, key=_start_key):
+        key = (event.get("date") or "", normalize(event.get("name", "")))
+        first = seen.get(key)
+        if first is not None:
+            if event.get("source") not in first["sources"]:
+                first["sources"].append(event.get("source"))
+            for field, value in event.items():
+                if value and not first.get(field):
+                    first[field] = value
+            continue
+        event = {**event, "sources": [event.get("source")]}
+        seen[key] = event
+        merged.append(event)
+    return merged
+
+
+async def _fetch_pages(fetch_page: PageFetcher) -> Tuple[List[Dict[str, Any]], bool]:
+    """
+    First page (for the page count), then the rest of the budget concurrently.
+    Returns the events in page order and whether every page was read.
+    """
+    events, total = await fetch_page(0)
+    wanted = min(total, max(1, EVENT_MAX_PAGES))
+    rest = await asyncio.gather(*(fetch_page(n) for n in range(1, wanted)), return_exceptions=True)
+    complete = total <= wanted
+    for page in rest:
+        if isinstance(page, BaseException):
+            # pages are date-ordered: anything after a gap would leave a hole
+            complete = False
+            break
+        events.extend(page[0])
+    return events, complete
+
+
+def _eventbrite_price(event: Dict[str, Any]) -> Optional[float]:
+    if event.get("is_free"):
+        return 0.0
+    minimum = (event.get("ticket_availability") or {}).get("minimum_ticket_price") or {}
+    try:
+        return float(minimum["major_value"])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+async def _search_eventbrite(
+    city: str, start_date: str, end_date: str, categories: List[str]
+) -> Tuple[List[Dict[str, Any]], bool]:
     """Search Eventbrite API for events"""
     url = "https://www.eventbriteapi.com/v3/events/search/"
     params = {
         "location.address": city,
         "start_date.range_start": f"{start_date}T00:00:00",
         "start_date.range_end": f"{end_date}T23:59:59",
+        "sort_by": "date",
+        "expand": "ticket_availability",
         "token": EVENTBRITE_KEY
     }
-    
-    data = await get_json(url, params=params)
-    events = []
-    
-    for event in data.get("events", []):
-        events.append({
-            "name": event.get("name", {}).get("text", ""),
-            "description": event.get("description", {}).get("text", "")[:200],
-            "start_time": event.get("start", {}).get("local", ""),
-            "venue": event.get("venue_id", ""),
-            "url": event.get("url", ""),
-            "source": "eventbrite"
-        })
-    
-    return events
-
-async def _search_ticketmaster(city: str, start_date: str, end_date: str, categories: List[str]) -> List[Dict[str, Any]]:
+
+    async def fetch_page(n: int) -> Tuple[List[Dict[str, Any]], int]:
+        data = await get_json(url, params={**params, "page": str(n + 1)})
+        events = []
+        for event in data.get("events", []):
+            start = event.get("start", {}).get("local", "")
+            events.append({
+                "name": event.get("name", {}).get("text", ""),
+                "description": (event.get("description", {}).get("text") or "")[:200],
+                "start_time": start,
+                "date": start[:10],
+                "venue": event.get("venue_id", ""),
+                "url": event.get("url", ""),
+                "price": _eventbrite_price(event),
+                "source": "eventbrite"
+            })
+        return events, int(data.get("pagination", {}).get("page_count") or 1)
+
+    return await _fetch_pages(fetch_page)
+
+def _ticketmaster_price(event: Dict[str, Any]) -> Optional[float]:
+    """Lowest listed ticket price, or None when the event has no price ranges."""
+    prices = [r.get("min") for r in event.get("priceRanges") or [] if isinstance(r.get("min"), (int, float))]
+    return float(min(prices)) if prices else None
+
+async def _search_ticketmaster(
+    city: str, start_date: str, end_date: str, categories: List[str], country_code: str = None
+) -> Tuple[List[Dict[str, Any]], bool]:
     """Search Ticketmaster API for events"""
     url = "https://app.ticketmaster.com/discovery/v2/events.json"
     params = {
         "city": city,
         "startDateTime": f"{start_date}T00:00:00Z",
         "endDateTime": f"{end_date}T23:59:59Z",
+        "sort": "date,asc",
+        "size": str(EVENT_PAGE_SIZE),
         "apikey": TICKETMASTER_KEY
     }
-    
-    data = await get_json(url, params=params)
-    events = []
-    
-    for event in data.get("_embedded", {}).get("events", []):
-        events.append({
-            "name": event.get("name", ""),
-            "description": event.get("info", "")[:200] if event.get("info") else "",
-            "start_time": event.get("dates", {}).get("start", {}).get("localDate", ""),
-            "venue": event.get("_embedded", {}).get("venues", [{}])[0].get("name", ""),
-            "url": event.get("url", ""),
-            "source": "ticketmaster"
-        })
-    
-    return events
+    if country_code:
+        params["countryCode"] = country_code
+
+    async def fetch_page(n: int) -> Tuple[List[Dict[str, Any]], int]:
+        data = await get_json(url, params={**params, "page": str(n)})
+        events = []
+        for event in data.get("_embedded", {}).get("events", []):
+            start = event.get("dates", {}).get("start", {})
+            day = start.get("localDate", "")
+            events.append({
+                "name": event.get("name", ""),
+                "description": event.get("info", "")[:200] if event.get("info") else "",
+                "start_time": f"{day}T{start['localTime']}" if day and start.get("localTime") else day,
+                "date": day,
+                "venue": event.get("_embedded", {}).get("venues", [{}])[0].get("name", ""),
+                "url": event.get("url", ""),
+                "price": _ticketmaster_price(event),
+                "source": "ticketmaster"
+            })
+        return events, int(data.get("page", {}).get("totalPages") or 1)
+
+    return await _fetch_pages(fetch_page)
 
 def _generate_basic_events(city: str, categories: List[str]) -> List[Dict[str, Any]]:
     """Generate basic event suggestions when APIs fail"""
@@ -95,11 +292,11 @@ def _generate_basic_events(city: str, categories: List[str]) -> List[Dict[str, A
         {"name": f"Food Market Visit in {city}", "description": "Experience local cuisine", "source": "suggestion"},
         {"name": f"Museum Day in {city}", "description": "Visit top museums and galleries", "source": "suggestion"}
     ]
-    
+
     if "nightlife" in categories:
         basic_events.append({"name": f"Evening Entertainment in {city}", "description": "Local nightlife scene", "source": "suggestion"})
-    
+
     if "music" in categories:
         basic_events.append({"name": f"Live Music Venues in {city}", "description": "Local music scene", "source": "suggestion"})
-        
+
     return basic_events
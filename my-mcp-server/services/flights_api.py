@@ -2,14 +2,23 @@
 import os
 import asyncio
 import httpx
+import numpy as np
+from datetime import datetime
 from core.http_client import get_json, post_json
-from typing import List, Dict, Any, Optional
+from core.tasks import gather_cancelling
+from services.destinations import airport_code
+from typing import List, Dict, Any, Optional, Sequence
 
 SKYSCANNER_KEY = os.getenv("SKYSCANNER_API_KEY")
 SKYSCANNER_HOST = os.getenv("SKYSCANNER_HOST", "skyscanner44.p.rapidapi.com")  # set if needed
 
 BASE_SKY_URL = f"https://{SKYSCANNER_HOST}"
 
+# Shortest gap between arriving on one leg and departing on the next
+FLIGHT_MIN_CONNECTION_MINUTES = int(os.getenv("FLIGHT_MIN_CONNECTION_MINUTES", "60"))
+# Cheapest (partial) itineraries kept after each leg join
+FLIGHT_JOIN_BEAM = int(os.getenv("FLIGHT_JOIN_BEAM", "2000"))
+
 async def _get_json(url: str, params: dict, headers: dict, timeout: int = 10, attempts: int = 2) -> dict:
     return await get_json(url, params=params, headers=headers)
 
@@ -36,8 +45,8 @@ async def search_flights(
     }
     params = {
         "adults": str(adults),
-        "origin": origin,
-        "destination": destination,
+        "origin": airport_code(origin),
+        "destination": airport_code(destination),
         "departureDate": date,
         "currency": currency,
         "cabinClass": cabin_class,
@@ -79,3 +88,183 @@ async def get_flight_details(flight_id: str) -> dict:
         "Content-Type": "application/json",
     }
     return await post_json(url, headers=headers, json={"flightId": flight_id})
+
+
+def _epoch_seconds(values: Sequence[Any]) -> np.ndarray:
+    """ISO timestamps to epoch seconds; NaN where missing or unparseable."""
+    out = np.full(len(values), np.nan)
+    for i, v in enumerate(values):
+        if not v:
+            continue
+        try:
+            out[i] = datetime.fromisoformat(str(v).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            continue
+    return out
+
+
+def _leg_arrays(options: List[Dict[str, Any]]):
+    # unpriced options (price 0) can't be compared, so they never join an itinerary
+    price = np.array([float(f.get("price") or 0) for f in options])
+    price[price <= 0] = np.inf
+    return (
+        price,
+        _epoch_seconds([f.get("departure_time") for f in options]),
+        _epoch_seconds([f.get("arrival_time") for f in options]),
+    )
+
+
+class ItineraryIndex:
+    """
+    Joined itineraries sorted by total price. Row i of `combos` holds the
+    option index chosen on each leg for the i-th cheapest itinerary, so
+    budget lookups are a binary search over `prices`.
+    """
+
+    def __init__(self, legs: List[List[Dict[str, Any]]], combos: np.ndarray, prices: np.ndarray,
+                 leg_info: Optional[List[Dict[str, Any]]] = None, feasible: Optional[int] = None):
+        self.legs = legs
+        self.combos = combos
+        self.prices = prices
+        self.leg_info = leg_info or [{} for _ in legs]
+        # feasible combinations before the beam cut (len(self) is what was kept)
+        self.feasible = len(prices) if feasible is None else feasible
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def _itinerary(self, row: int) -> Dict[str, Any]:
+        legs = [
+            {**self.leg_info[k], **self.legs[k][int(j)]}
+            for k, j in enumerate(self.combos[row])
+        ]
+        arrivals = _epoch_seconds([leg.get("arrival_time") for leg in legs[:-1]])
+        departures = _epoch_seconds([leg.get("departure_time") for leg in legs[1:]])
+        gaps = (departures - arrivals) / 60
+        return {
+            "total_price": round(float(self.prices[row]), 2),
+            "legs": legs,
+            "connections_minutes": [None if np.isnan(g) else int(g) for g in gaps],
+        }
+
+    def cheapest(self, n: int = 10) -> List[Dict[str, Any]]:
+        return [self._itinerary(i) for i in range(min(n, len(self)))]
+
+    def within(self, max_price: float, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Itineraries priced at or below max_price, cheapest first."""
+        end = int(np.searchsorted(self.prices, max_price, side="right"))
+        if limit is not None:
+            end = min(end, limit)
+        return [self._itinerary(i) for i in range(end)]
+
+
+def join_legs(
+    legs: List[List[Dict[str, Any]]],
+    min_connection_minutes: int = FLIGHT_MIN_CONNECTION_MINUTES,
+    max_connection_minutes: Optional[int] = None,
+    beam: int = FLIGHT_JOIN_BEAM,
+    leg_info: Optional[List[Dict[str, Any]]] = None,
+) -> ItineraryIndex:
+    """
+    Combine per-leg options into priced itineraries with NumPy. Each join
+    builds the (partials x options) price and connection-gap matrices in one
+    shot and keeps the feasible cells; a combination is feasible when the
+    next leg departs between min and max connection time after the previous
+    arrival (options without parseable times are assumed to connect). After
+    each join only the `beam` cheapest (partial) itineraries are kept, so
+    the final sort is over at most `beam` rows.
+    """
+    empty = ItineraryIndex(legs, np.empty((0, len(legs)), dtype=np.int64), np.empty(0), leg_info)
+    if not legs or any(not options for options in legs):
+        return empty
+
+    price, _, arrival = _leg_arrays(legs[0])
+    keep = np.flatnonzero(np.isfinite(price))
+    combos = keep[:, None]
+    totals = price[keep]
+    last_arrival = arrival[keep]
+    min_gap = min_connection_minutes * 60
+    max_gap = max_connection_minutes * 60 if max_connection_minutes is not None else None
+
+    feasible = len(totals)
+    for options in legs[1:]:
+        price, departure, arrival = _leg_arrays(options)
+        total = totals[:, None] + price[None, :]
+        gap = departure[None, :] - last_arrival[:, None]
+        unknown = np.isnan(gap)
+        ok = np.isfinite(total) & (unknown | (gap >= min_gap))
+        if max_gap is not None:
+            ok &= unknown | (gap <= max_gap)
+        rows, cols = np.nonzero(ok)
+        cand = total[rows, cols]
+        feasible = len(cand)
+        if len(cand) > beam:
+            best = np.argpartition(cand, beam)[:beam]
+            rows, cols, cand = rows[best], cols[best], cand[best]
+        combos = np.column_stack([combos[rows], cols])
+        totals = cand
+        last_arrival = arrival[cols]
+        if not len(totals):
+            return empty
+
+    order = np.argsort(totals, kind="stable")
+    return ItineraryIndex(legs, combos[order], totals[order], leg_info, feasible=feasible)
+
+
+async def search_multi_city(
+    legs: List[Dict[str, str]],
+    adults: int = 1,
+    currency: str = "USD",
+    cabin_class: str = "economy",
+    preferred_airlines: Optional[List[str]] = None,
+    min_connection_minutes: int = FLIGHT_MIN_CONNECTION_MINUTES,
+    max_connection_minutes: Optional[int] = None,
+    top_n: int = 10,
+) -> Dict[str, Any]:
+    """
+    Search every leg ({"origin", "destination", "date"}) concurrently and
+    join the options into the top_n cheapest feasible itineraries.
+    """
+    options = await gather_cancelling(*(
+        search_flights(
+            leg["origin"], leg["destination"], leg["date"],
+            adults=adults, currency=currency, cabin_class=cabin_class,
+            preferred_airlines=preferred_airlines,
+        )
+        for leg in legs
+    ))
+    leg_info = [{"leg": i, "origin": leg["origin"], "destination": leg["destination"], "date": leg["date"]}
+                for i, leg in enumerate(legs)]
+    index = join_legs(
+        list(options), min_connection_minutes, max_connection_minutes, leg_info=leg_info,
+    )
+    return {
+        "legs": list(options),
+        "itineraries": index.cheapest(top_n),
+        "itinerary_count": index.feasible,
+    }
+
+
+async def search_round_trip(
+    origin: str,
+    destination: str,
+    depart_date: str,
+    return_date: str,
+    adults: int = 1,
+    currency: str = "USD",
+    cabin_class: str = "economy",
+    preferred_airlines: Optional[List[str]] = None,
+    min_stay_minutes: int = FLIGHT_MIN_CONNECTION_MINUTES,
+    top_n: int = 10,
+) -> Dict[str, Any]:
+    """Outbound and return legs fetched concurrently and joined into priced itineraries."""
+    result = await search_multi_city(
+        [
+            {"origin": origin, "destination": destination, "date": depart_date},
+            {"origin": destination, "destination": origin, "date": return_date},
+        ],
+        adults=adults, currency=currency, cabin_class=cabin_class,
+        preferred_airlines=preferred_airlines, min_connection_minutes=min_stay_minutes, top_n=top_n,
+    )
+    outbound, inbound = result.pop("legs")
+    return {"outbound": outbound, "return": inbound, **result}
@@ -0,0 +1,264 @@
+# services/geo_index.py
+"""
+Proximity queries over a destination's places, hotels and restaurants.
+
+Points live in NumPy arrays sorted by grid cell (GEO_CELL_DEG degrees, ~1 km
+at the default); each grid row's cells are one contiguous run, so the cells
+overlapping a bounding box are one slice per row. A radius query computes
+haversine distances for just those points in one vectorized pass; k-nearest
+counts points in a growing square of cells until it holds k, then uses the
+k-th distance among them as the radius of one exact pass. Kind filters use a
+per-kind sub-index built on first use.
+
+One index per destination is kept in an LRU cache. Each plan merges its
+fresh results into the city's index, so later plans and the /nearby
+endpoint reuse what earlier plans found without calling the providers.
+"""
+import math
+import os
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.cache import LRUCache
+from services.destinations import normalize
+
+GEO_CELL_DEG = float(os.getenv("GEO_CELL_DEG", "0.01"))
+GEO_INDEX_TTL = float(os.getenv("GEO_INDEX_TTL", "21600"))
+# Per destination, so a long-lived city index can't grow without bound
+GEO_INDEX_MAX_POINTS = int(os.getenv("GEO_INDEX_MAX_POINTS", "5000"))
+_indexes = LRUCache(maxsize=int(os.getenv("GEO_INDEX_CACHE_SIZE", "256")), ttl=GEO_INDEX_TTL)
+
+KINDS = ("place", "hotel", "restaurant")
+_KM_PER_DEG = 111.195  # 12742 / 2 * pi / 180
+
+
+def haversine_km_many(lat: float, lon: float, lats: np.ndarray, lons: np.ndarray) -> np.ndarray:
+    """Great-circle distances (km) from one point to arrays of points, in degrees."""
+    p1, p2 = math.radians(lat), np.radians(lats)
+    dp, dl = p2 - p1, np.radians(lons - lon)
+    a = np.sin(dp / 2) ** 2 + math.cos(p1) * np.cos(p2) * np.sin(dl / 2) ** 2
+    return 12742.0 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _point_key(kind: str, item: Dict[str, Any]) -> Tuple[str, str]:
+    ident = item.get("place_id") or item.get("property_id") or item.get("id")
+    return (kind, str(ident) if ident else normalize(item.get("name") or ""))
+
+
+class GeoIndex:
+    def __init__(self, points: Iterable[Tuple[str, Dict[str, Any]]], cell_deg: float = GEO_CELL_DEG):
+        """points: (kind, item) pairs; items without numeric lat/lon are skipped."""
+        self.cell_deg = cell_deg
+        kept: List[Tuple[str, Dict[str, Any]]] = []
+        for kind, item in points:
+            lat, lon = item.get("lat"), item.get("lon")
+            if isinstance(lat, (int, float)) and isinstance(lon, (int, float)) and -90 <= lat <= 90:
+                kept.append((kind, item))
+        lats = np.array([item["lat"] for _, item in kept], dtype=float)
+        lons = np.array([item["lon"] for _, item in kept], dtype=float)
+        ci = np.floor(lats / cell_deg).astype(np.int64)
+        cj = np.floor(lons / cell_deg).astype(np.int64)
+        order = np.lexsort((cj, ci))
+
+        self._points = kept  # insertion order, for merging
+        self.lats, self.lons = lats[order], lons[order]
+        # per-point trig reused by every query's distance pass
+        self._phi, self._lam = np.radians(self.lats), np.radians(self.lons)
+        self._cos_phi = np.cos(self._phi)
+        self.kinds: List[str] = [kept[i][0] for i in order]
+        self.items: List[Dict[str, Any]] = [kept[i][1] for i in order]
+        self._by_kind: Dict[Tuple[str, ...], "GeoIndex"] = {}
+        # grid row -> (sorted populated columns, offsets where n columns end);
+        # a row's cells are contiguous in the sorted arrays, so any column
+        # range within a row is one slice
+        self._rows: Dict[int, Tuple[List[int], List[int]]] = {}
+        self._ncells = 0
+        ci, cj = ci[order], cj[order]
+        if len(order):
+            # boundaries where the (ci, cj) cell changes
+            starts = np.flatnonzero(np.r_[True, (ci[1:] != ci[:-1]) | (cj[1:] != cj[:-1])])
+            self._ncells = len(starts)
+            ends = np.r_[starts[1:], len(order)].tolist()
+            for s, e, i, j in zip(starts.tolist(), ends, ci[starts].tolist(), cj[starts].tolist()):
+                cols, offsets = self._rows.setdefault(i, ([], [s]))
+                cols.append(j)
+                offsets.append(e)
+            self._bounds = (int(ci[0]), int(ci[-1]), int(cj.min()), int(cj.max()))
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def points(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """(kind, item) pairs in the order they were added."""
+        return list(self._points)
+
+    def find(self, ref: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """The (kind, item) whose place_id/property_id/id or name matches ref."""
+        name = normalize(ref)
+        for kind, item in self._points:
+            ident = item.get("place_id") or item.get("property_id") or item.get("id")
+            if (ident is not None and str(ident) == ref) or normalize(item.get("name") or "") == name:
+                return kind, item
+        return None
+
+    def _subset(self, kinds: Sequence[str]) -> "GeoIndex":
+        """Index over just these kinds, built on first use."""
+        key = tuple(sorted(set(kinds)))
+        if set(key) >= set(self.kinds):
+            return self
+        sub = self._by_kind.get(key)
+        if sub is None:
+            sub = self._by_kind[key] = GeoIndex((p for p in self._points if p[0] in key), self.cell_deg)
+        return sub
+
+    def _box(self, lat: float, lon: float, di: int, dj: int) -> Tuple[List[Tuple[int, int]], int]:
+        """Point slices for cells within di rows / dj columns of the query cell, and their total size."""
+        i0, j0 = math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+        slices = []
+        total = 0
+        rows = self._rows
+        for i in range(i0 - di, i0 + di + 1):
+            row = rows.get(i)
+            if row is None:
+                continue
+            cols, offsets = row
+            a, b = bisect_left(cols, j0 - dj), bisect_right(cols, j0 + dj)
+            if a < b:
+                s, e = offsets[a], offsets[b]
+                slices.append((s, e))
+                total += e - s
+        return slices, total
+
+    def _gather(self, slices: List[Tuple[int, int]]) -> np.ndarray:
+        if len(slices) == 1:
+            return np.arange(*slices[0])
+        return np.concatenate([np.arange(s, e) for s, e in slices]) if slices else np.empty(0, dtype=np.int64)
+
+    def _candidates(self, lat: float, lon: float, km: float) -> np.ndarray:
+        """Indexes of the points in cells overlapping the box of half-width km around the query."""
+        di = math.ceil(km / (_KM_PER_DEG * self.cell_deg))
+        dj = self._lon_cells(lat, km)
+        if (2 * di + 1) * (2 * dj + 1) > 2 * self._ncells:
+            # a box wider than the populated area: one pass over everything is cheaper
+            return np.arange(len(self))
+        return self._gather(self._box(lat, lon, di, dj)[0])
+
+    def _distances(self, lat: float, lon: float, idx: Optional[np.ndarray]) -> np.ndarray:
+        """haversine_km_many over the indexed points (all of them when idx is None)."""
+        phi, lam, cos_phi = (self._phi, self._lam, self._cos_phi) if idx is None else (
+            self._phi[idx], self._lam[idx], self._cos_phi[idx])
+        p1 = math.radians(lat)
+        a = np.sin((phi - p1) * 0.5) ** 2 + math.cos(p1) * cos_phi * np.sin((lam - math.radians(lon)) * 0.5) ** 2
+        return 12742.0 * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+    def _lon_cells(self, lat: float, km: float) -> int:
+        cos = max(math.cos(math.radians(min(abs(lat) + km / _KM_PER_DEG, 89.0))), 1e-6)
+        return math.ceil(km / (_KM_PER_DEG * cos * self.cell_deg))
+
+    def _results(self, idx: np.ndarray, dist: np.ndarray) -> List[Dict[str, Any]]:
+        return [
+            {"type": self.kinds[i], "distance_km": round(d, 3), **self.items[i]}
+            for i, d in zip(idx.tolist(), dist.tolist())
+        ]
+
+    def radius(
+        self,
+        lat: float,
+        lon: float,
+        radius_km: float,
+        kinds: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Points within radius_km, nearest first."""
+        if kinds:
+            return self._subset(kinds).radius(lat, lon, radius_km, limit=limit)
+        if not len(self):
+            return []
+        idx = self._candidates(lat, lon, radius_km)
+        dist = self._distances(lat, lon, idx)
+        inside = dist <= radius_km
+        idx, dist = idx[inside], dist[inside]
+        order = np.argsort(dist, kind="stable")[:limit]
+        return self._results(idx[order], dist[order])
+
+    def nearest(
+        self,
+        lat: float,
+        lon: float,
+        k: int = 10,
+        kinds: Optional[Sequence[str]] = None,
+        max_km: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """The k nearest points (optionally within max_km), nearest first."""
+        if kinds:
+            return self._subset(kinds).nearest(lat, lon, k, max_km=max_km)
+        if not len(self) or k <= 0:
+            return []
+        if k >= len(self):
+            idx = np.arange(len(self))
+        else:
+            # Grow a square of cells (by counting, no distances yet) until it
+            # holds k points; the k-th nearest of those bounds the answer, so
+            # one more box that wide is guaranteed to contain the true k nearest.
+            i0, j0 = math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg)
+            imin, imax, jmin, jmax = self._bounds
+            max_ring = max(abs(imin - i0), abs(imax - i0), abs(jmin - j0), abs(jmax - j0))
+            ring, (slices, total) = 0, self._box(lat, lon, 0, 0)
+            while total < k and ring < max_ring and (2 * ring + 3) ** 2 <= 2 * self._ncells:
+                ring += 1
+                slices, total = self._box(lat, lon, ring, ring)
+            if total < k:
+                idx = np.arange(len(self))
+            else:
+                idx = self._gather(slices)
+                dist = self._distances(lat, lon, idx)
+                bound = float(np.partition(dist, k - 1)[k - 1])
+                if max_km is not None:
+                    bound = min(bound, max_km)
+                idx = self._candidates(lat, lon, bound)
+        dist = self._distances(lat, lon, idx)
+        if max_km is not None:
+            inside = dist <= max_km
+            idx, dist = idx[inside], dist[inside]
+        if len(idx) > k:
+            top = np.argpartition(dist, k - 1)[:k]
+            idx, dist = idx[top], dist[top]
+        order = np.argsort(dist, kind="stable")
+        return self._results(idx[order], dist[order])
+
+
+def _destination_key(destination: str) -> str:
+    return normalize(destination)
+
+
+def get_destination_index(destination: str) -> Optional[GeoIndex]:
+    return _indexes.get(_destination_key(destination))
+
+
+def update_destination_index(
+    destination: str,
+    places: Iterable[Dict[str, Any]] = (),
+    hotels: Iterable[Dict[str, Any]] = (),
+    restaurants: Iterable[Dict[str, Any]] = (),
+) -> GeoIndex:
+    """
+    Merge fresh results into the destination's cached index and return it.
+    Newer copies of a point (same kind and id, or name) replace older ones;
+    the oldest points are dropped beyond GEO_INDEX_MAX_POINTS.
+    """
+    merged: Dict[Tuple[str, str], Tuple[str, Dict[str, Any]]] = {}
+    existing = get_destination_index(destination)
+    if existing is not None:
+        for kind, item in existing.points():
+            merged[_point_key(kind, item)] = (kind, item)
+    for kind, items in (("place", places), ("hotel", hotels), ("restaurant", restaurants)):
+        for item in items or ():
+            key = _point_key(kind, item)
+            merged.pop(key, None)  # re-insert so it counts as newest
+            merged[key] = (kind, item)
+    points = list(merged.values())[-GEO_INDEX_MAX_POINTS:]
+    index = GeoIndex(points)
+    _indexes.set(_destination_key(destination), index)
+    return index
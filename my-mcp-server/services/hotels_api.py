@@ -1,59 +1,287 @@
 # app/services/hotels_api.py
 import os
 import asyncio
+import heapq
+import itertools
 import httpx
 from core.http_client import get_json
-from typing import List, Dict, Any, Optional
+from services.destinations import canonical_name
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional, Tuple
 
 BOOKING_KEY = os.getenv("BOOKING_API_KEY")
 BOOKING_HOST = os.getenv("BOOKING_HOST", "hotels4.p.rapidapi.com")
 BASE_BOOKING_URL = f"https://{BOOKING_HOST}"
 
-async def search_hotels(
+# Paginated mode: pages fetched at once, default page count and wall-clock budget (seconds)
+HOTEL_PAGE_CONCURRENCY = int(os.getenv("HOTEL_PAGE_CONCURRENCY", "4"))
+HOTEL_MAX_PAGES = int(os.getenv("HOTEL_MAX_PAGES", "3"))
+HOTEL_TIME_BUDGET = float(os.getenv("HOTEL_TIME_BUDGET", "8"))
+
+# Provider property types that count as each requested accommodation type (substring match)
+ACCOMMODATION_SYNONYMS: Dict[str, Tuple[str, ...]] = {
+    "hotel": ("hotel", "resort", "inn", "motel", "lodge", "boutique", "ryokan"),
+    "apartment": ("apartment", "aparthotel", "condo", "flat", "residence", "villa", "vacation", "holiday home"),
+    "hostel": ("hostel", "dorm", "backpacker"),
+}
+
+
+def _value(h: Dict[str, Any]) -> float:
+    return h["rating"] / h["price_per_night"] if h["price_per_night"] > 0 else 0.0
+
+
+def _cheapest(h: Dict[str, Any]) -> float:
+    # price 0 means the provider didn't quote one; rank those last
+    return -h["price_per_night"] if h["price_per_night"] > 0 else float("-inf")
+
+
+# higher is better
+SORT_KEYS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "value": _value,
+    "rating": lambda h: (h["rating"], _cheapest(h)),
+    "price": _cheapest,
+}
+
+
+def _coordinates(h: Dict[str, Any]) -> Tuple[Optional[float], Optional[float]]:
+    coord = h.get("coordinate") if isinstance(h.get("coordinate"), dict) else {}
+    marker = h.get("mapMarker") if isinstance(h.get("mapMarker"), dict) else {}
+    lat_lon = marker.get("latLong") if isinstance(marker.get("latLong"), dict) else {}
+    for lat, lon in (
+        (coord.get("lat"), coord.get("lon")),
+        (lat_lon.get("latitude"), lat_lon.get("longitude")),
+        (h.get("latitude"), h.get("longitude")),
+    ):
+        if lat is not None and lon is not None:
+            try:
+                return float(lat), float(lon)
+            except (TypeError, ValueError):
+                continue
+    return None, None
+
+
+def _normalize_hotel(h: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    try:
+        lat, lon = _coordinates(h)
+        property_id = h.get("id") or h.get("hotelId") or h.get("propertyId")
+        return {
+            "property_id": str(property_id) if property_id is not None else None,
+            "name": h.get("name") or h.get("hotelName"),
+            "price_per_night": float(h.get("price", {}).get("current") or h.get("minPrice") or 0),
+            "rating": float(h.get("rating") or h.get("starRating") or 0),
+            "address": h.get("address", {}).get("streetAddress") if isinstance(h.get("address"), dict) else h.get("address"),
+            "amenities": h.get("amenities") or [],
+            "accommodation_type": h.get("accommodationType") or h.get("propertyType"),
+            "lat": lat,
+            "lon": lon,
+        }
+    except Exception:
+        return None
+
+
+def _matches(hotel: Dict[str, Any], accommodation_type: Optional[str], min_rating: Optional[float]) -> bool:
+    """Client-side filters; the provider treats them as hints and may return anything."""
+    if isinstance(min_rating, (int, float)) and hotel["rating"] < min_rating:
+        return False
+    kind = hotel.get("accommodation_type")
+    if accommodation_type and kind:
+        wanted = accommodation_type.strip().lower()
+        kind = str(kind).lower()
+        # "Boutique hotel", "Resort" and "Aparthotel" are all hotels
+        if not any(term in kind for term in ACCOMMODATION_SYNONYMS.get(wanted, (wanted,))):
+            return False
+    return True
+
+
+def _dedupe_key(hotel: Dict[str, Any]) -> Any:
+    return hotel["property_id"] or ((hotel["name"] or "").lower(), str(hotel["address"] or "").lower())
+
+
+async def _fetch_page(
     location: str,
     check_in: str,
     check_out: str,
-    adults: int = 1,
-    page_size: int = 10,
-    accommodation_type: Optional[str] = None,
-    min_rating: Optional[float] = None,
+    adults: int,
+    page_size: int,
+    accommodation_type: Optional[str],
+    min_rating: Optional[float],
+    page_number: Optional[int] = None,
 ) -> List[Dict[str, Any]]:
-    """
-    Query hotels API and return list of normalized hotels.
-    location can be city name or destinationId depending on the API used.
-    """
-    if not BOOKING_KEY:
-        raise RuntimeError("Missing BOOKING_API_KEY in env")
-
     url = f"{BASE_BOOKING_URL}/properties/list"
     headers = {
         "X-RapidAPI-Key": BOOKING_KEY,
         "X-RapidAPI-Host": BOOKING_HOST
     }
     params = {
-        "destination": location,
+        "destination": canonical_name(location),
         "checkIn": check_in,
         "checkOut": check_out,
         "adults1": str(adults),
         "pageSize": str(page_size)
     }
+    if page_number is not None:
+        params["pageNumber"] = str(page_number)
     if accommodation_type:
         params["accommodationType"] = accommodation_type
     if isinstance(min_rating, (int, float)):
         params["minStarRating"] = str(min_rating)
     raw = await get_json(url, headers=headers, params=params)
+    return raw.get("results") or raw.get("data") or raw.get("searchResults", {}).get("results", []) or []
+
+
+async def iter_hotel_pages(
+    location: str,
+    check_in: str,
+    check_out: str,
+    adults: int = 1,
+    page_size: int = 10,
+    accommodation_type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    pages: int = HOTEL_MAX_PAGES,
+    time_budget: float = HOTEL_TIME_BUDGET,
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    Fetch up to `pages` result pages concurrently and yield each page's new,
+    matching hotels as soon as it arrives (in completion order, so the first
+    batch costs about one page fetch). Hotels are deduplicated by property id.
+    A short page marks the end of the results and cancels later pages; the
+    whole scan stops once `time_budget` seconds have passed. Failed pages are
+    skipped unless every page fails.
+    """
+    if not BOOKING_KEY:
+        raise RuntimeError("Missing BOOKING_API_KEY in env")
+
+    sem = asyncio.Semaphore(HOTEL_PAGE_CONCURRENCY)
+
+    async def fetch(page_number: int):
+        async with sem:
+            return page_number, await _fetch_page(
+                location, check_in, check_out, adults, page_size,
+                accommodation_type, min_rating, page_number=page_number,
+            )
+
+    tasks = {n: asyncio.create_task(fetch(n)) for n in range(1, max(1, pages) + 1)}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + time_budget
+    seen = set()
+    errors: List[BaseException] = []
+    succeeded = False
+    try:
+        pending = set(tasks.values())
+        while pending:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                    continue
+                succeeded = True
+                page_number, raw = task.result()
+                if len(raw) < page_size:
+                    # past the last page: later requests can only come back empty
+                    for n, later in tasks.items():
+                        if n > page_number:
+                            later.cancel()
+                batch = []
+                for h in raw:
+                    hotel = _normalize_hotel(h)
+                    if hotel is None or not _matches(hotel, accommodation_type, min_rating):
+                        continue
+                    key = _dedupe_key(hotel)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    batch.append(hotel)
+                if batch:
+                    yield batch
+        if not succeeded and errors:
+            raise errors[0]
+    finally:
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+
+
+async def search_hotels_top_k(
+    location: str,
+    check_in: str,
+    check_out: str,
+    adults: int = 1,
+    page_size: int = 10,
+    accommodation_type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    pages: int = HOTEL_MAX_PAGES,
+    top_k: int = 10,
+    sort_by: str = "value",
+    max_results: Optional[int] = None,
+    time_budget: float = HOTEL_TIME_BUDGET,
+) -> List[Dict[str, Any]]:
+    """
+    Best `top_k` hotels across several concurrently fetched pages, ranked by
+    `sort_by` ("value" = rating per price, "rating" or "price"). Only a heap
+    of top_k hotels is kept, so memory doesn't grow with the pages scanned.
+    Scanning stops after `max_results` matching hotels or `time_budget`.
+    """
+    score = SORT_KEYS.get(sort_by)
+    if score is None:
+        raise ValueError(f"Unknown sort_by: {sort_by}")
+    heap: List[Any] = []
+    order = itertools.count()  # tie-breaker: earlier results win, hotels are never compared
+    scanned = 0
+    pages_iter = iter_hotel_pages(
+        location, check_in, check_out, adults, page_size,
+        accommodation_type, min_rating, pages=pages, time_budget=time_budget,
+    )
+    try:
+        async for batch in pages_iter:
+            for hotel in batch:
+                item = (score(hotel), -next(order), hotel)
+                if len(heap) < top_k:
+                    heapq.heappush(heap, item)
+                elif item[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, item)
+            scanned += len(batch)
+            if max_results is not None and scanned >= max_results:
+                break
+    finally:
+        await pages_iter.aclose()
+    return [hotel for _, _, hotel in sorted(heap, key=lambda item: item[:2], reverse=True)]
+
+
+async def search_hotels(
+    location: str,
+    check_in: str,
+    check_out: str,
+    adults: int = 1,
+    page_size: int = 10,
+    accommodation_type: Optional[str] = None,
+    min_rating: Optional[float] = None,
+    pages: int = 1,
+    top_k: Optional[int] = None,
+    sort_by: str = "value",
+) -> List[Dict[str, Any]]:
+    """
+    Query hotels API and return list of normalized hotels.
+    location can be city name or destinationId depending on the API used.
+    With pages > 1, scans that many pages concurrently and returns the best
+    top_k (default page_size) by sort_by; see search_hotels_top_k.
+    """
+    if not BOOKING_KEY:
+        raise RuntimeError("Missing BOOKING_API_KEY in env")
+
+    if pages > 1:
+        return await search_hotels_top_k(
+            location, check_in, check_out, adults, page_size,
+            accommodation_type, min_rating, pages=pages, top_k=top_k or page_size, sort_by=sort_by,
+        )
 
-    candidates = raw.get("results") or raw.get("data") or raw.get("searchResults", {}).get("results", []) or []
+    candidates = await _fetch_page(location, check_in, check_out, adults, page_size, accommodation_type, min_rating)
     hotels = []
     for h in candidates:
-        try:
-            hotels.append({
-                "name": h.get("name") or h.get("hotelName"),
-                "price_per_night": float(h.get("price", {}).get("current") or h.get("minPrice") or 0),
-                "rating": float(h.get("rating") or h.get("starRating") or 0),
-                "address": h.get("address", {}).get("streetAddress") if isinstance(h.get("address"), dict) else h.get("address"),
-                "amenities": h.get("amenities") or []
-            })
-        except Exception:
-            continue
+        hotel = _normalize_hotel(h)
+        if hotel is not None:
+            hotels.append(hotel)
     return hotels
@@ -0,0 +1,225 @@
+# services/live_alerts.py
+"""
+Live trip-support alerts with per-city fan-out.
+
+Active trips are grouped by destination city. One poller fetches the
+forecasts of every watched city in a single batched call per
+ALERTS_POLL_INTERVAL, derives alerts, diffs them against each city's previous
+snapshot and pushes only the deltas to the trips subscribed over WebSocket or
+SSE. Upstream cost therefore scales with the number of cities, not travellers.
+A newly watched city wakes the poller so its first alerts don't wait a full
+interval; cities already polled are then served from the forecast cache.
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import date
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services.destinations import normalize, resolve
+from services.weather_rules import BAD_WEATHER_POP, is_bad_weather_day, is_severe_weather
+
+ALERTS_POLL_INTERVAL = float(os.getenv("ALERTS_POLL_INTERVAL", "900"))
+ALERTS_QUEUE_SIZE = int(os.getenv("ALERTS_QUEUE_SIZE", "32"))
+
+logger = logging.getLogger(__name__)
+
+
+def forecast_alerts(forecast: List[Dict[str, Any]]) -> Dict[Tuple[str, str], Dict[str, Any]]:
+    """Weather alerts keyed by (date, type) for the days the planner treats as bad."""
+    alerts: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    for entry in forecast or []:
+        day = entry.get("date")
+        if not day or not is_bad_weather_day(entry):
+            continue
+        severe = is_severe_weather(entry)
+        alerts[(day, "weather")] = {
+            "type": "weather",
+            "date": day,
+            "message": f"{_weather_reason(entry, severe)}, consider indoor activities",
+            "severity": "medium" if severe else "low"
+        }
+    return alerts
+
+
+def _weather_reason(entry: Dict[str, Any], severe: bool) -> str:
+    # say why the day was flagged; a high pop under a "clear sky" description is not "clear sky expected"
+    pop = entry.get("pop_max")
+    chance = f"{pop:.0%} chance of precipitation" if isinstance(pop, (int, float)) and pop >= BAD_WEATHER_POP else None
+    if severe:
+        storm = str(entry.get("description")).capitalize()
+        return f"{storm} expected ({chance})" if chance else f"{storm} expected"
+    return chance
+
+
+def _in_window(alert: Dict[str, Any], window: Tuple[str, str]) -> bool:
+    start, end = window
+    day = alert.get("date") or ""
+    return (not start or day >= start) and (not end or day <= end)
+
+
+def city_key(city: str) -> str:
+    """One watch per canonical city, however the trip spelled it."""
+    dest = resolve(city)
+    return dest.id if dest is not None else normalize(city)
+
+
+class _CityWatch:
+    __slots__ = ("city", "trips", "subscribers", "alerts", "updated_at")
+
+    def __init__(self, city: str):
+        self.city = city
+        self.trips: Dict[str, Tuple[str, str]] = {}  # trip_id -> (start_date, end_date)
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self.alerts: Optional[Dict[Tuple[str, str], Dict[str, Any]]] = None
+        self.updated_at: Optional[float] = None
+
+
+class LiveAlertHub:
+    def __init__(self, interval: float = ALERTS_POLL_INTERVAL):
+        self.interval = interval
+        self._cities: Dict[str, _CityWatch] = {}
+        self._trip_city: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    # --- registration ---
+
+    def register(self, trip_id: str, city: str, start_date: str, end_date: str) -> _CityWatch:
+        """Mark a trip active; a new city is polled right away."""
+        key = city_key(city)
+        watch = self._cities.get(key)
+        if watch is None:
+            watch = self._cities[key] = _CityWatch(city)
+            self._wake.set()
+        watch.trips[trip_id] = (start_date or "", end_date or "")
+        self._trip_city[trip_id] = key
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._poll())
+        return watch
+
+    def current_alerts(self, trip_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Latest alerts for the trip, or None before the city's first poll."""
+        watch = self._cities.get(self._trip_city.get(trip_id, ""))
+        if watch is None or watch.alerts is None:
+            return None
+        window = watch.trips.get(trip_id, ("", ""))
+        return [a for a in watch.alerts.values() if _in_window(a, window)]
+
+    def subscribe(self, trip_id: str) -> asyncio.Queue:
+        watch = self._cities[self._trip_city[trip_id]]
+        queue: asyncio.Queue = asyncio.Queue(maxsize=ALERTS_QUEUE_SIZE)
+        watch.subscribers.setdefault(trip_id, set()).add(queue)
+        alerts = self.current_alerts(trip_id)
+        if alerts is not None:
+            queue.put_nowait({"type": "snapshot", "alerts": alerts, "updated_at": watch.updated_at})
+        return queue
+
+    def unsubscribe(self, trip_id: str, queue: asyncio.Queue) -> None:
+        watch = self._cities.get(self._trip_city.get(trip_id, ""))
+        if watch is None:
+            return
+        queues = watch.subscribers.get(trip_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del watch.subscribers[trip_id]
+
+    # --- polling and fan-out ---
+
+    def _expire(self) -> None:
+        today = date.today().isoformat()
+        for key, watch in list(self._cities.items()):
+            for trip_id, (_, end) in list(watch.trips.items()):
+                if end and end < today and trip_id not in watch.subscribers:
+                    del watch.trips[trip_id]
+                    self._trip_city.pop(trip_id, None)
+            if not watch.trips:
+                del self._cities[key]
+
+    def _apply(self, watch: _CityWatch, alerts: Dict[Tuple[str, str], Dict[str, Any]]) -> None:
+        previous = watch.alerts
+        watch.alerts = alerts
+        watch.updated_at = time.time()
+        if previous is None:
+            added, removed = list(alerts.values()), []
+        else:
+            added = [a for k, a in alerts.items() if previous.get(k) != a]
+            removed = [a for k, a in previous.items() if k not in alerts]
+        if not added and not removed:
+            return
+
+        for trip_id, queues in watch.subscribers.items():
+            window = watch.trips.get(trip_id, ("", ""))
+            delta = {
+                "type": "delta",
+                "added": [a for a in added if _in_window(a, window)],
+                "removed": [a for a in removed if _in_window(a, window)],
+                "updated_at": watch.updated_at,
+            }
+            if not delta["added"] and not delta["removed"]:
+                continue
+            for queue in queues:
+                if queue.full():
+                    # slow consumer: replace its backlog with a full snapshot
+                    while not queue.empty():
+                        queue.get_nowait()
+                    queue.put_nowait({
+                        "type": "snapshot",
+                        "alerts": [a for a in alerts.values() if _in_window(a, window)],
+                        "updated_at": watch.updated_at,
+                    })
+                else:
+                    queue.put_nowait(delta)
+
+    async def _poll(self) -> None:
+        from services.weather_api import get_forecasts
+
+        while self._cities:
+            self._wake.clear()
+            watches = list(self._cities.values())
+            try:
+                forecasts = await get_forecasts([w.city for w in watches])
+            except Exception as e:
+                logger.warning(f"Alert poll failed: {e}")
+            else:
+                for watch in watches:
+                    forecast = forecasts.get(watch.city)
+                    if forecast is None:
+                        # keep the last alerts rather than clearing them on a failed fetch
+                        logger.warning(f"Alert poll failed for {watch.city}")
+                        continue
+                    self._apply(watch, forecast_alerts(forecast))
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._expire()
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self._cities.clear()
+        self._trip_city.clear()
+
+
+_hub: Optional[LiveAlertHub] = None
+
+
+def get_alert_hub() -> LiveAlertHub:
+    global _hub
+    if _hub is None:
+        _hub = LiveAlertHub()
+    return _hub
+
+
+async def close_alert_hub() -> None:
+    global _hub
+    if _hub is not None:
+        try:
+            await _hub.close()
+        finally:
+            _hub = None
@@ -4,13 +4,26 @@ import asyncio
 import httpx
 from typing import Dict, Any, Optional
 
+from core.tracing import current_request_id, current_span
+
 MCP_URL = os.getenv("MCP_SERVER_URL", "http://localhost:8001")  # example
 
+def _trace_headers() -> Dict[str, str]:
+    """Lets the MCP server join this request's log lines and trace."""
+    headers = {}
+    rid = current_request_id()
+    if rid:
+        headers["X-Request-ID"] = rid
+    active = current_span()
+    if active is not None:
+        headers["traceparent"] = active.traceparent()
+    return headers
+
 async def _request_with_retries(url: str, json: Dict[str, Any], timeout: int = 10, attempts: int = 3) -> Dict[str, Any]:
     for i in range(attempts):
         try:
             async with httpx.AsyncClient(http1=True, timeout=timeout) as client:
-                r = await client.post(url, json=json)
+                r = await client.post(url, json=json, headers=_trace_headers())
                 r.raise_for_status()
                 return r.json()
         except Exception as e:
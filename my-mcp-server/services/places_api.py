@@ -1,13 +1,25 @@
 # app/services/places_api.py
 import os
+import asyncio
 import httpx
+from core.cache import LRUCache
 from core.http_client import get_json
-from typing import List, Dict, Any
+from core.tracing import annotate
+from typing import List, Dict, Any, Optional, Tuple
 
 GOOGLE_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
 PLACES_TEXTSEARCH = "https://maps.googleapis.com/maps/api/place/textsearch/json"
 PLACE_DETAILS = "https://maps.googleapis.com/maps/api/place/details/json"
 
+# Enrichment: Details lookups in flight at once, deadline (seconds) for the
+# whole batch, and how long a place's opening hours are trusted
+PLACE_DETAILS_CONCURRENCY = int(os.getenv("PLACE_DETAILS_CONCURRENCY", "4"))
+PLACE_DETAILS_DEADLINE = float(os.getenv("PLACE_DETAILS_DEADLINE", "3"))
+PLACE_DETAILS_TTL = float(os.getenv("PLACE_DETAILS_TTL", "86400"))
+# Coordinates already come with text search, so enrichment only asks for hours
+ENRICH_FIELDS = "opening_hours"
+_details_cache = LRUCache(maxsize=int(os.getenv("PLACE_DETAILS_CACHE_SIZE", "4096")), ttl=PLACE_DETAILS_TTL)
+
 async def search_places(query: str, region: str = None, limit: int = 10) -> List[Dict[str, Any]]:
     """
     Query Google Places TextSearch for attractions.
@@ -25,17 +37,105 @@ async def search_places(query: str, region: str = None, limit: int = 10) -> List
     results = data.get("results", [])[:limit]
     normalized = []
     for p in results:
+        location = (p.get("geometry") or {}).get("location") or {}
         normalized.append({
             "name": p.get("name"),
             "rating": p.get("rating"),
             "address": p.get("formatted_address"),
             "types": p.get("types", []),
             "place_id": p.get("place_id"),
-            "photo_reference": (p.get("photos") or [{}])[0].get("photo_reference")
+            "photo_reference": (p.get("photos") or [{}])[0].get("photo_reference"),
+            "lat": location.get("lat"),
+            "lon": location.get("lng"),
         })
     return normalized
 
-async def get_place_details(place_id: str) -> Dict[str, Any]:
-    params = {"place_id": place_id, "key": GOOGLE_KEY, "fields": "name,rating,formatted_address,opening_hours,website,photos"}
+async def get_place_details(place_id: str, fields: str = None) -> Dict[str, Any]:
+    params = {
+        "place_id": place_id,
+        "key": GOOGLE_KEY,
+        "fields": fields or "name,rating,formatted_address,opening_hours,website,photos",
+    }
     data = await get_json(PLACE_DETAILS, params=params)
     return data.get("result", {})
+
+
+async def enrich_places(places: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Copies of `places` with "opening_hours" from Place Details. Each place_id
+    is looked up once per PLACE_DETAILS_TTL: cached ids cost nothing, misses
+    are fetched PLACE_DETAILS_CONCURRENCY at a time with ENRICH_FIELDS only,
+    and whatever hasn't answered by PLACE_DETAILS_DEADLINE is left without
+    hours (and retried next time).
+    """
+    if not GOOGLE_KEY:
+        return list(places)
+    ids = {p["place_id"] for p in places if p.get("place_id")}
+    details = {pid: _details_cache.get(pid) for pid in ids}
+    misses = [pid for pid, cached in details.items() if cached is None]
+    annotate("details_cache_hits", len(details) - len(misses))
+
+    if misses:
+        sem = asyncio.Semaphore(PLACE_DETAILS_CONCURRENCY)
+
+        async def fetch(pid: str) -> None:
+            async with sem:
+                result = await get_place_details(pid, fields=ENRICH_FIELDS)
+            hours = result.get("opening_hours")
+            # {} records "no published hours", so it isn't asked for again either
+            details[pid] = {"opening_hours": hours} if hours else {}
+            _details_cache.set(pid, details[pid])
+
+        tasks = [asyncio.ensure_future(fetch(pid)) for pid in misses]
+        try:
+            await asyncio.wait(tasks, timeout=PLACE_DETAILS_DEADLINE)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    return [{**p, **(details.get(p.get("place_id")) or {})} for p in places]
+
+
+def opening_intervals(opening_hours: Optional[Dict[str, Any]], weekday: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Minutes-after-midnight (open, close) intervals for a Python weekday
+    (Monday = 0), from Google's opening_hours.periods; None if unknown.
+    Periods past midnight extend beyond 1440 on their opening day and
+    also cover the early hours of the next day.
+    """
+    week = weekly_intervals(opening_hours)
+    return None if week is None else week[weekday]
+
+
+def weekly_intervals(opening_hours: Optional[Dict[str, Any]]) -> Optional[List[List[Tuple[int, int]]]]:
+    """opening_intervals for every weekday (Monday first) in one pass over the periods."""
+    periods = (opening_hours or {}).get("periods")
+    if not periods:
+        return None
+    week: List[List[Tuple[int, int]]] = [[] for _ in range(7)]
+    for period in periods:
+        start = period.get("open") or {}
+        end = period.get("close")
+        if end is None:
+            # a lone open period at 0000 means open around the clock
+            return [[(0, 1440)] for _ in range(7)]
+        open_day, close_day = start.get("day"), end.get("day")
+        open_min, close_min = _minutes(start.get("time")), _minutes(end.get("time"))
+        if open_day is None or close_day is None or open_min is None or close_min is None:
+            continue
+        span = (close_day - open_day) % 7 * 1440 + close_min
+        # Google counts from Sunday
+        week[(open_day - 1) % 7].append((open_min, span))
+        if span > 1440:
+            week[open_day % 7].append((0, span - 1440))
+    for day in week:
+        day.sort()
+    return week
+
+
+def _minutes(hhmm: Any) -> Optional[int]:
+    try:
+        return int(str(hhmm)[:2]) * 60 + int(str(hhmm)[2:4])
+    except (TypeError, ValueError):
+        return None
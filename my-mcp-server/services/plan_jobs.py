@@ -0,0 +1,355 @@
+# services/plan_jobs.py
+"""
+Asynchronous plan jobs.
+
+Long plans are submitted as jobs instead of holding a request open. Jobs run
+on a bounded pool of in-process workers; the queue is ordered by priority
+(0 = most urgent) and, within a priority, round-robins across clients so one
+chatty client can't starve the others. Every state change is written to a
+local SQLite queue, so queued or interrupted jobs are picked up again after a
+restart. Finished jobs are kept for JOB_RESULT_TTL seconds.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from core.serialization import dumps_bytes, loads
+
+JOB_STORE_PATH = os.getenv("JOB_STORE_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "1000"))
+JOB_MAX_PER_CLIENT = int(os.getenv("JOB_MAX_PER_CLIENT", "20"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_PRIORITIES = range(0, 10)
+DEFAULT_PRIORITY = 5
+
+TERMINAL_STATES = ("succeeded", "failed", "cancelled")
+
+# runner(payload, progress) -> JSON-serializable result
+Runner = Callable[[Dict[str, Any], Callable[[str], None]], Awaitable[Dict[str, Any]]]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS plan_jobs (
+    job_id TEXT PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    stage TEXT,
+    payload BLOB NOT NULL,
+    result BLOB,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    expires_at REAL
+)
+"""
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when the queue (or a client's share of it) is at capacity."""
+
+
+class PlanJobManager:
+    def __init__(
+        self,
+        path: str = JOB_STORE_PATH,
+        workers: int = JOB_WORKERS,
+        max_queued: int = JOB_QUEUE_MAX,
+        max_per_client: int = JOB_MAX_PER_CLIENT,
+        result_ttl: float = JOB_RESULT_TTL,
+    ):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.max_per_client = max_per_client
+        self.result_ttl = result_ttl
+        self._runner: Optional[Runner] = None
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(_SCHEMA)
+
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        # priority -> client_id -> queued job ids (OrderedDict gives the round-robin order)
+        self._levels: Dict[int, "OrderedDict[str, Deque[str]]"] = {p: OrderedDict() for p in JOB_PRIORITIES}
+        self._queued = 0
+        self._per_client: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
+
+    # --- persistence (runs in a worker thread) ---
+
+    def _write(self, job: Dict[str, Any]) -> None:
+        result = dumps_bytes(job["result"]) if job.get("result") is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plan_jobs (job_id, client_id, priority, status, stage, payload, result, "
+                "error, created_at, updated_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    job["job_id"], job["client_id"], job["priority"], job["status"], job.get("stage"),
+                    dumps_bytes(job["payload"]), result, job.get("error"),
+                    job["created_at"], job["updated_at"], job.get("expires_at"),
+                ),
+            )
+
+    def _read(self, where: str, args: tuple) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT job_id, client_id, priority, status, stage, payload, result, error, created_at, "
+                f"updated_at, expires_at FROM plan_jobs WHERE {where}",
+                args,
+            ).fetchall()
+        return [
+            {
+                "job_id": r[0], "client_id": r[1], "priority": r[2], "status": r[3], "stage": r[4],
+                "payload": loads(r[5]), "result": loads(r[6]) if r[6] else None, "error": r[7],
+                "created_at": r[8], "updated_at": r[9], "expires_at": r[10],
+            }
+            for r in rows
+        ]
+
+    def _purge(self, now: float) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM plan_jobs WHERE expires_at IS NOT NULL AND expires_at < ?", (now,))
+
+    async def _persist(self, job: Dict[str, Any]) -> None:
+        await asyncio.to_thread(self._write, dict(job))
+
+    # --- lifecycle ---
+
+    async def start(self, runner: Runner) -> None:
+        """Recover unfinished jobs from the local queue and start the workers."""
+        self._runner = runner
+        recovered = await asyncio.to_thread(self._read, "status IN ('queued', 'running')", ())
+        for job in sorted(recovered, key=lambda j: j["created_at"]):
+            job["status"] = "queued"
+            job["stage"] = "requeued"
+            self._jobs[job["job_id"]] = job
+            self._enqueue(job)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._janitor()))
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Running jobs stay "running" in the local queue and
+        are re-queued by the next start().
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        with self._lock:
+            self._conn.close()
+
+    # --- scheduling ---
+
+    def _enqueue(self, job: Dict[str, Any]) -> None:
+        clients = self._levels[job["priority"]]
+        clients.setdefault(job["client_id"], deque()).append(job["job_id"])
+        self._queued += 1
+        self._per_client[job["client_id"]] = self._per_client.get(job["client_id"], 0) + 1
+        self._wakeup.set()
+
+    def _dequeue(self) -> Optional[Dict[str, Any]]:
+        for priority in JOB_PRIORITIES:
+            clients = self._levels[priority]
+            while clients:
+                client_id, queue = next(iter(clients.items()))
+                job_id = queue.popleft()
+                # rotate the client to the back so the next pick is someone else
+                if queue:
+                    clients.move_to_end(client_id)
+                else:
+                    del clients[client_id]
+                self._release(client_id)
+                job = self._jobs.get(job_id)
+                if job is not None and job["status"] == "queued":
+                    return job
+        return None
+
+    def _release(self, client_id: str) -> None:
+        self._queued -= 1
+        self._per_client[client_id] -= 1
+        if not self._per_client[client_id]:
+            del self._per_client[client_id]
+
+    def _unqueue(self, job: Dict[str, Any]) -> None:
+        """Take a queued job out of its level so it stops counting against the limits."""
+        clients = self._levels[job["priority"]]
+        queue = clients.get(job["client_id"])
+        if queue is None or job["job_id"] not in queue:
+            return
+        queue.remove(job["job_id"])
+        if not queue:
+            del clients[job["client_id"]]
+        self._release(job["client_id"])
+
+    async def submit(self, payload: Dict[str, Any], client_id: str, priority: int = DEFAULT_PRIORITY) -> Dict[str, Any]:
+        if self._queued >= self.max_queued:
+            raise JobQueueFull("Plan job queue is full")
+        if self._per_client.get(client_id, 0) >= self.max_per_client:
+            raise JobQueueFull("Too many queued plan jobs for this client")
+        now = time.time()
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "client_id": client_id,
+            "priority": min(max(int(priority), JOB_PRIORITIES[0]), JOB_PRIORITIES[-1]),
+            "status": "queued",
+            "stage": None,
+            "payload": payload,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+            "expires_at": None,
+        }
+        self._jobs[job["job_id"]] = job
+        await self._persist(job)
+        self._enqueue(job)
+        return job
+
+    async def _worker(self) -> None:
+        while True:
+            job = self._dequeue()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            task = asyncio.create_task(self._run(job))
+            self._running[job["job_id"]] = task
+            try:
+                await asyncio.shield(task)
+            except asyncio.CancelledError:
+                if not task.done():
+                    # worker shutdown: leave the job "running" so it is recovered on restart
+                    task.cancel()
+                    await asyncio.gather(task, return_exceptions=True)
+                    raise
+            finally:
+                self._running.pop(job["job_id"], None)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        await self._update(job, status="running", stage="started")
+
+        def progress(stage: str) -> None:
+            job["stage"] = stage
+            job["updated_at"] = time.time()
+            self._publish(job)
+
+        try:
+            result = await self._runner(job["payload"], progress)
+        except asyncio.CancelledError:
+            if job["status"] == "cancelling":
+                await self._finish(job, "cancelled")
+            raise
+        except Exception as e:
+            await self._finish(job, "failed", error=str(e))
+        else:
+            await self._finish(job, "succeeded", result=result)
+
+    async def _update(self, job: Dict[str, Any], **fields: Any) -> None:
+        job.update(fields, updated_at=time.time())
+        self._publish(job)
+        await self._persist(job)
+
+    async def _finish(self, job: Dict[str, Any], status: str, result: Any = None, error: Optional[str] = None) -> None:
+        await self._update(
+            job, status=status, stage="done", result=result, error=error,
+            expires_at=time.time() + self.result_ttl,
+        )
+
+    async def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATES:
+            return job
+        task = self._running.get(job_id)
+        if task is not None:
+            job["status"] = "cancelling"
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        else:
+            # still queued: free its place before the (awaiting) write
+            self._unqueue(job)
+            await self._finish(job, "cancelled")
+        return job
+
+    async def _janitor(self, interval: float = 60.0) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            now = time.time()
+            for job_id, job in list(self._jobs.items()):
+                if job.get("expires_at") and job["expires_at"] < now:
+                    del self._jobs[job_id]
+            await asyncio.to_thread(self._purge, now)
+
+    # --- status / subscriptions ---
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        if job is None:
+            rows = await asyncio.to_thread(self._read, "job_id = ?", (job_id,))
+            job = rows[0] if rows else None
+        if job is not None and job.get("expires_at") and job["expires_at"] < time.time():
+            return None
+        return job
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._subscribers.setdefault(job_id, []).append(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        queues = self._subscribers.get(job_id, [])
+        if queue in queues:
+            queues.remove(queue)
+        if not queues:
+            self._subscribers.pop(job_id, None)
+
+    def _publish(self, job: Dict[str, Any]) -> None:
+        event = job_status(job)
+        for queue in self._subscribers.get(job["job_id"], []):
+            if queue.full():
+                # slow subscriber: drop the oldest update, the latest state matters most
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public view of a job (no payload)."""
+    return {
+        "job_id": job["job_id"],
+        "status": job["status"],
+        "stage": job.get("stage"),
+        "priority": job["priority"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+        "expires_at": job.get("expires_at"),
+        "result": job.get("result"),
+        "error": job.get("error"),
+    }
+
+
+_manager: Optional[PlanJobManager] = None
+
+
+def get_job_manager() -> PlanJobManager:
+    global _manager
+    if _manager is None:
+        _manager = PlanJobManager()
+    return _manager
+
+
+async def close_job_manager() -> None:
+    global _manager
+    if _manager is not None:
+        try:
+            await _manager.stop()
+        finally:
+            _manager = None
@@ -0,0 +1,141 @@
+# services/response_shaping.py
+"""
+Trim trip-plan responses to what a client renders.
+
+- Sparse fieldsets: `fields=trip_plan.itinerary,trip_plan.hotels.name`
+  keeps only those dotted paths (lists apply the rest of the path to each
+  element). `status` and `trip_id` are always kept.
+- Normalized view: every flight, itinerary, hotel, restaurant and event is
+  stored once under `entities[kind][id]` and referenced by id wherever the
+  plan mentions it (the result lists, the budget plan and its
+  alternatives, itinerary legs). A mention that adds fields to the stored
+  entity (e.g. a budget event's estimated_price) becomes
+  {"ref": id, ...those fields}.
+"""
+import hashlib
+from typing import Any, Dict, Optional
+
+from core.serialization import dumps_bytes
+
+# Fields the planner adds to an entity it mentions; not part of its identity
+_DECORATIONS = ("estimated_price",)
+_ID_FIELDS = {
+    "hotels": ("property_id",),
+    "restaurants": ("place_id", "id"),
+    "events": ("id",),
+}
+# top-level trip_plan lists -> entity kind
+_LISTS = {
+    "flights": "flights",
+    "return_flights": "flights",
+    "hotels": "hotels",
+    "restaurants": "restaurants",
+    "events": "events",
+}
+ALWAYS_KEPT = ("status", "trip_id")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[Dict[str, Any]]:
+    """'a.b,a.c,d' -> {"a": {"b": True, "c": True}, "d": True}; None when no fields are given."""
+    paths = [[part for part in p.strip().split(".") if part] for p in (fields or "").split(",")]
+    paths = [p for p in paths if p]
+    if not paths:
+        return None
+    tree: Dict[str, Any] = {}
+    for parts in paths:
+        node = tree
+        for part in parts[:-1]:
+            child = node.setdefault(part, {})
+            if child is True:
+                break  # a shorter path already keeps the whole subtree
+            node = child
+        else:
+            node[parts[-1]] = True
+    return tree
+
+
+def select_fields(data: Any, tree: Any) -> Any:
+    if tree is True or tree is None:
+        return data
+    if isinstance(data, list):
+        return [select_fields(item, tree) for item in data]
+    if isinstance(data, dict):
+        return {key: select_fields(data[key], sub) for key, sub in tree.items() if key in data}
+    return data
+
+
+class _Entities:
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+
+    def _id(self, kind: str, item: Dict[str, Any]) -> str:
+        for field in _ID_FIELDS.get(kind, ()):
+            if item.get(field):
+                return str(item[field])
+        # no provider id: a short digest of the entity's own fields
+        core = {k: v for k, v in item.items() if k not in _DECORATIONS}
+        return hashlib.blake2b(dumps_bytes(core, sort_keys=True), digest_size=6).hexdigest()
+
+    def ref(self, kind: str, item: Any) -> Any:
+        if not isinstance(item, dict):
+            return item
+        table = self.tables.setdefault(kind, {})
+        ident = self._id(kind, item)
+        stored = table.get(ident)
+        if stored is None:
+            table[ident] = {k: v for k, v in item.items() if k not in _DECORATIONS}
+            stored = table[ident]
+        extra = {k: v for k, v in item.items() if stored.get(k, object()) != v}
+        return {"ref": ident, **extra} if extra else ident
+
+    def refs(self, kind: str, items: Any) -> Any:
+        return [self.ref(kind, item) for item in items] if isinstance(items, list) else items
+
+    def itinerary(self, item: Any) -> Any:
+        if not isinstance(item, dict):
+            return item
+        return self.ref("itineraries", {**item, "legs": self.refs("flights", item.get("legs") or [])})
+
+
+def _budget_option(entities: _Entities, option: Any) -> Any:
+    if not isinstance(option, dict):
+        return option
+    shaped = dict(option)
+    flight = option.get("flight")
+    if isinstance(flight, dict):
+        shaped["flight"] = entities.itinerary(flight) if "legs" in flight else entities.ref("flights", flight)
+    shaped["hotel"] = entities.ref("hotels", option.get("hotel"))
+    shaped["events"] = entities.refs("events", option.get("events") or [])
+    return shaped
+
+
+def normalize_plan(trip_plan: Dict[str, Any]) -> Dict[str, Any]:
+    """trip_plan with entities replaced by ids; returns {"trip_plan": ..., "entities": {...}}."""
+    entities = _Entities()
+    plan = dict(trip_plan)
+    for key, kind in _LISTS.items():
+        if key in plan:
+            plan[key] = entities.refs(kind, plan[key])
+    if isinstance(plan.get("itineraries"), list):
+        plan["itineraries"] = [entities.itinerary(it) for it in plan["itineraries"]]
+    budget = plan.get("budget_plan")
+    if isinstance(budget, dict):
+        budget = dict(budget)
+        budget["plan"] = _budget_option(entities, budget.get("plan"))
+        alternatives = budget.get("alternatives")
+        if isinstance(alternatives, dict):
+            budget["alternatives"] = {name: _budget_option(entities, alt) for name, alt in alternatives.items()}
+        plan["budget_plan"] = budget
+    return {"trip_plan": plan, "entities": entities.tables}
+
+
+def shape_plan_response(body: Dict[str, Any], fields: Optional[str] = None, normalized: bool = False) -> Dict[str, Any]:
+    """Apply a sparse fieldset, then (optionally) normalize body["trip_plan"]."""
+    tree = parse_fields(fields)
+    if tree is not None:
+        for key in ALWAYS_KEPT:
+            tree[key] = True
+        body = select_fields(body, tree)
+    if normalized and isinstance(body.get("trip_plan"), dict):
+        body = {**body, **normalize_plan(body["trip_plan"])}
+    return body
@@ -1,51 +1,198 @@
 # services/restaurants_api.py
 import os
-from typing import List, Dict, Any
+import asyncio
+from difflib import SequenceMatcher
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from core.cache import LRUCache
 from core.http_client import get_json
+from core.tracing import annotate
+from services.destinations import canonical_name, haversine_km, normalize
+from services.dietary import rank_by_diet
 
 GOOGLE_PLACES_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
 YELP_KEY = os.getenv("YELP_API_KEY")
 
+# Both sources share one deadline (seconds); merged lists are cached per city + cuisine
+RESTAURANT_DEADLINE = float(os.getenv("RESTAURANT_DEADLINE", "6"))
+RESTAURANT_CACHE_TTL = float(os.getenv("RESTAURANT_CACHE_TTL", "1800"))
+# Lists missing a source (failed or past the deadline) expire sooner so it gets another go
+RESTAURANT_PARTIAL_CACHE_TTL = float(os.getenv("RESTAURANT_PARTIAL_CACHE_TTL", "60"))
+_cache = LRUCache(maxsize=int(os.getenv("RESTAURANT_CACHE_SIZE", "512")), ttl=RESTAURANT_CACHE_TTL)
+
+# Two listings closer than this (metres) are the same place if the names agree
+SAME_PLACE_METERS = 150
+# ~1 km grid cells for the geo blocking index
+_GEO_CELL_DEG = 0.01
+# Words that don't tell restaurants apart
+_NAME_STOPWORDS = {"the", "restaurant", "ristorante", "cafe", "bar", "and", "&"}
+# Street-type and filler words skipped when keying addresses
+_STREET_WORDS = {
+    "st", "street", "ave", "avenue", "rd", "road", "blvd", "via", "viale", "piazza", "rue", "calle",
+    "de", "del", "dei", "della", "di", "la", "le", "du", "des", "the", "of",
+}
+
+
 async def search_restaurants(
     city: str,
     cuisine_types: List[str] = None,
     price_range: str = None,
-    dietary_restrictions: List[str] = None
+    dietary_restrictions: List[str] = None,
+    strict_dietary: bool = False,
 ) -> List[Dict[str, Any]]:
     """
     Search for restaurants based on preferences.
-    Combines Google Places and Yelp data.
+    Queries Google Places and Yelp concurrently under RESTAURANT_DEADLINE,
+    merges listings of the same place across sources and caches the merged
+    list per city, cuisine and price range (for RESTAURANT_PARTIAL_CACHE_TTL
+    only if a source didn't answer in time). Dietary restrictions rank the
+    results (strict_dietary also drops conflicting places).
     """
-    restaurants = []
-    
-    # Try Google Places first
-    if GOOGLE_PLACES_KEY:
-        try:
-            restaurants.extend(await _search_google_places(city, cuisine_types, price_range))
-        except Exception:
-            pass
-    
-    # Try Yelp for additional results
-    if YELP_KEY:
-        try:
-            restaurants.extend(await _search_yelp(city, cuisine_types, price_range))
-        except Exception:
-            pass
-    
+    city = canonical_name(city)
+    key = (normalize(city), tuple(sorted(normalize(c) for c in cuisine_types or [])), price_range or "")
+    restaurants = _cache.get(key)
+    annotate("cache", "miss" if restaurants is None else "hit")
+    if restaurants is None:
+        restaurants, complete = await _search_all_sources(city, cuisine_types, price_range)
+        if restaurants:  # don't pin an outage in the cache
+            _cache.set(key, restaurants, ttl=None if complete else RESTAURANT_PARTIAL_CACHE_TTL)
+
     # Filter by dietary restrictions
     if dietary_restrictions:
-        restaurants = _filter_by_dietary_restrictions(restaurants, dietary_restrictions)
-    
-    # Remove duplicates and limit results
-    seen_names = set()
-    unique_restaurants = []
-    for restaurant in restaurants:
-        name = restaurant.get("name", "").lower()
-        if name not in seen_names:
-            seen_names.add(name)
-            unique_restaurants.append(restaurant)
-    
-    return unique_restaurants[:15]
+        restaurants = _filter_by_dietary_restrictions(restaurants, dietary_restrictions, strict=strict_dietary)
+
+    return restaurants[:15]
+
+
+async def _search_all_sources(
+    city: str, cuisine_types: List[str], price_range: str
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """(merged restaurants, whether every configured source answered)."""
+    searches = []
+    if GOOGLE_PLACES_KEY:
+        searches.append(_search_google_places(city, cuisine_types, price_range))
+    if YELP_KEY:
+        searches.append(_search_yelp(city, cuisine_types, price_range))
+    if not searches:
+        return [], True
+
+    # Google first in the merge, so its listing wins when both have a place
+    tasks = [asyncio.ensure_future(s) for s in searches]
+    try:
+        await asyncio.wait(tasks, timeout=RESTAURANT_DEADLINE)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    # a source that failed or missed the deadline just contributes nothing
+    results = [t.result() for t in tasks if not t.cancelled() and t.exception() is None]
+    return merge_restaurants(results), len(results) == len(tasks)
+
+
+def _name_tokens(name: str) -> Tuple[str, ...]:
+    return tuple(t for t in normalize(name).split() if t not in _NAME_STOPWORDS)
+
+
+def _name_similarity(a: Tuple[str, ...], b: Tuple[str, ...]) -> float:
+    """Token containment ("Joe's Pizza" in "Joe's Pizza NYC" = 1.0), or character ratio for spelling variants."""
+    if not a or not b:
+        return 0.0
+    sa, sb = set(a), set(b)
+    # a lone shared word ("pizza") is not enough for containment
+    containment = len(sa & sb) / min(len(sa), len(sb)) if min(len(sa), len(sb)) > 1 or sa == sb else 0.0
+    return max(containment, SequenceMatcher(None, " ".join(a), " ".join(b)).ratio())
+
+
+def _street_key(address: Any) -> Optional[str]:
+    """House number + first distinctive street word: "7 carmine" for both "7 Carmine St" and "Via Carmine, 7"."""
+    if isinstance(address, list):
+        address = " ".join(str(a) for a in address)
+    words = normalize(address or "").split()
+    number = next((w for w in words if w[0].isdigit()), None)
+    street = next((w for w in words if w.isalpha() and w not in _STREET_WORDS), None)
+    return f"{number} {street}" if number and street else None
+
+
+def _same_place(a: Dict[str, Any], b: Dict[str, Any], tokens_a: Tuple[str, ...], tokens_b: Tuple[str, ...]) -> bool:
+    # cheap location checks first; names are only compared for plausible pairs
+    if a.get("lat") is not None and b.get("lat") is not None:
+        # 0.002 degrees of latitude is ~220 m: skip the trigonometry for obvious misses
+        if abs(a["lat"] - b["lat"]) > 0.002:
+            return False
+        if haversine_km(a["lat"], a["lon"], b["lat"], b["lon"]) * 1000 > SAME_PLACE_METERS:
+            return False
+        return _name_similarity(tokens_a, tokens_b) >= 0.75
+    street_a, street_b = _street_key(a.get("address")), _street_key(b.get("address"))
+    if street_a and street_b:
+        return street_a == street_b and _name_similarity(tokens_a, tokens_b) >= 0.75
+    # nothing to compare locations with: only near-identical names
+    return _name_similarity(tokens_a, tokens_b) >= 0.9
+
+
+def _merge_into(kept: Dict[str, Any], other: Dict[str, Any]) -> None:
+    for field, value in other.items():
+        if field in ("source", "sources", "rating"):
+            continue
+        if value not in (None, "", [], "Unknown") and kept.get(field) in (None, "", [], "Unknown"):
+            kept[field] = value
+    if other.get("source") not in kept["sources"]:
+        kept["sources"].append(other.get("source"))
+    ratings = [r for r in (kept.get("rating"), other.get("rating")) if r]
+    if ratings:
+        kept["rating"] = round(sum(ratings) / len(ratings), 1)
+
+
+def merge_restaurants(sources: Iterable[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge listings from several sources, folding listings of the same place
+    into the first one seen. Candidates come from a blocking index (~1 km geo
+    cells, street address key and leading name token), so each listing is
+    compared with a handful of neighbours instead of every other listing.
+    """
+    merged: List[Dict[str, Any]] = []
+    tokens: List[Tuple[str, ...]] = []
+    blocks: Dict[Any, List[int]] = {}
+
+    def cell(r: Dict[str, Any]) -> Optional[Tuple[int, int]]:
+        if r.get("lat") is None or r.get("lon") is None:
+            return None
+        return (int(r["lat"] // _GEO_CELL_DEG), int(r["lon"] // _GEO_CELL_DEG))
+
+    for listings in sources:
+        for r in listings:
+            toks = _name_tokens(r.get("name", ""))
+            c = cell(r)
+            street = _street_key(r.get("address"))
+            # Listings with coordinates only need name blocking against listings
+            # without them; two located listings always share neighbouring cells
+            name_key = (("name" if c is None else "name_geo"), toks[0]) if toks else None
+            lookups = [("name", toks[0])] if toks else []
+            if c is None and toks:
+                lookups.append(("name_geo", toks[0]))
+            if street:
+                lookups.append(("street", street))
+            candidates = set()
+            for k in lookups:
+                candidates.update(blocks.get(k, ()))
+            if c is not None:
+                for dy in (-1, 0, 1):
+                    for dx in (-1, 0, 1):
+                        candidates.update(blocks.get(("geo", c[0] + dy, c[1] + dx), ()))
+            keys = [k for k in (name_key, ("street", street) if street else None, ("geo", *c) if c else None) if k]
+
+            match = None
+            for i in sorted(candidates):
+                if _same_place(merged[i], r, tokens[i], toks):
+                    match = i
+                    break
+            if match is not None:
+                _merge_into(merged[match], r)
+                continue
+
+            merged.append({**r, "sources": [r.get("source")]})
+            tokens.append(toks)
+            for k in keys:
+                blocks.setdefault(k, []).append(len(merged) - 1)
+    return merged
 
 async def _search_google_places(city: str, cuisine_types: List[str], price_range: str) -> List[Dict[str, Any]]:
     """Search Google Places API for restaurants"""
@@ -76,7 +223,10 @@ async def _search_google_places(city: str, cuisine_types: List[str], price_range
             "price_level": price_map.get(price_level, "Unknown"),
             "cuisine": ", ".join(place.get("types", [])),
             "address": place.get("formatted_address", ""),
-            "photos": place.get("photos", []),
+            # one reference instead of the full photos array
+            "photo_reference": (place.get("photos") or [{}])[0].get("photo_reference"),
+            "lat": (place.get("geometry") or {}).get("location", {}).get("lat"),
+            "lon": (place.get("geometry") or {}).get("location", {}).get("lng"),
             "source": "google_places"
         })
     
@@ -112,7 +262,9 @@ async def _search_yelp(city: str, cuisine_types: List[str], price_range: str) ->
             "rating": business.get("rating", 0),
             "price_level": business.get("price", "Unknown"),
             "cuisine": ", ".join([cat["title"] for cat in business.get("categories", [])]),
-            "address": business.get("location", {}).get("display_address", []),
+            "address": ", ".join(business.get("location", {}).get("display_address", [])),
+            "lat": (business.get("coordinates") or {}).get("latitude"),
+            "lon": (business.get("coordinates") or {}).get("longitude"),
             "phone": business.get("phone", ""),
             "url": business.get("url", ""),
             "source": "yelp"
@@ -120,45 +272,13 @@ async def _search_yelp(city: str, cuisine_types: List[str], price_range: str) ->
     
     return restaurants
 
-def _filter_by_dietary_restrictions(restaurants: List[Dict[str, Any]], restrictions: List[str]) -> List[Dict[str, Any]]:
-    """Filter restaurants based on dietary restrictions"""
-    filtered = []
-    
-    for restaurant in restaurants:
-        cuisine = restaurant.get("cuisine", "").lower()
-        name = restaurant.get("name", "").lower()
-        
-        # Simple keyword matching for dietary restrictions
-        suitable = True
-        for restriction in restrictions:
-            restriction = restriction.lower()
-            
-            if restriction == "vegetarian":
-                if not any(keyword in cuisine or keyword in name 
-                          for keyword in ["vegetarian", "vegan", "salad", "mediterranean"]):
-                    # Don't exclude, just note it might not be ideal
-                    pass
-            elif restriction == "vegan":
-                if not any(keyword in cuisine or keyword in name 
-                          for keyword in ["vegan", "plant-based"]):
-                    pass
-            elif restriction == "gluten-free":
-                if not any(keyword in cuisine or keyword in name 
-                          for keyword in ["gluten-free", "gf"]):
-                    pass
-            elif restriction == "halal":
-                if not any(keyword in cuisine or keyword in name 
-                          for keyword in ["halal", "middle eastern", "turkish"]):
-                    pass
-            elif restriction == "kosher":
-                if not any(keyword in cuisine or keyword in name 
-                          for keyword in ["kosher", "jewish"]):
-                    pass
-        
-        if suitable:
-            filtered.append(restaurant)
-    
-    return filtered
+def _filter_by_dietary_restrictions(
+    restaurants: List[Dict[str, Any]],
+    restrictions: List[str],
+    strict: bool = False,
+) -> List[Dict[str, Any]]:
+    """Rank restaurants by dietary evidence; strict drops ones that conflict with a restriction."""
+    return rank_by_diet(restaurants, restrictions, strict=strict)
 
 async def get_restaurant_details(restaurant_name: str, city: str) -> Dict[str, Any]:
     """Get detailed information about a specific restaurant"""
@@ -181,7 +301,7 @@ async def get_restaurant_details(restaurant_name: str, city: str) -> Dict[str, A
                     "address": place.get("formatted_address", ""),
                     "price_level": place.get("price_level", 0),
                     "opening_hours": place.get("opening_hours", {}),
-                    "photos": place.get("photos", [])
+                    "photo_reference": (place.get("photos") or [{}])[0].get("photo_reference")
                 }
         except Exception:
             pass
@@ -0,0 +1,329 @@
+# services/trip_export.py
+"""
+Export pipeline for stored trip plans: ICS calendar, PDF and email (.eml).
+
+Rendering runs in a small process pool so a multi-week PDF never competes
+with plan requests for the API worker's event loop or GIL. Files are
+content-addressed (sha256 of format + renderer version + plan) and cached in
+EXPORT_DIR, so repeated exports of the same plan are a stat() away and
+concurrent requests for the same export share one render.
+"""
+import asyncio
+import hashlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from email.message import EmailMessage
+from typing import Any, Dict, List, Optional
+
+from core.serialization import dumps_bytes
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_WORKERS = int(os.getenv("EXPORT_WORKERS", "2"))
+# How long a request waits for a fresh render before answering "pending"
+EXPORT_WAIT_SECONDS = float(os.getenv("EXPORT_WAIT_SECONDS", "2.0"))
+
+# Bump when renderer output changes so cached files are not reused
+RENDERER_VERSION = "1"
+
+
+# --- Text helpers shared by the renderers ---
+
+def _summary_lines(trip_id: str, trip_data: Dict[str, Any]) -> List[str]:
+    lines = [
+        f"Trip to {trip_data.get('destination', '')}",
+        f"Dates: {trip_data.get('start_date', '')} to {trip_data.get('end_date', '')}",
+        f"Travelers: {trip_data.get('adults', 1)}",
+    ]
+    cost = trip_data.get("estimated_cost")
+    if isinstance(cost, (int, float)):
+        lines.append(f"Estimated cost: {cost:,.2f}")
+    lines.append(f"Trip id: {trip_id}")
+
+    flights = trip_data.get("flights", [])[:3]
+    if flights:
+        lines += ["", "Flights"]
+        for f in flights:
+            lines.append(f"- {f.get('airline') or 'Flight'}: {f.get('departure_time') or ''} -> "
+                         f"{f.get('arrival_time') or ''} ({f.get('price', '')})")
+
+    hotels = trip_data.get("hotels", [])[:5]
+    if hotels:
+        lines += ["", "Hotels"]
+        for h in hotels:
+            lines.append(f"- {h.get('name') or 'Hotel'} ({h.get('rating', '')}*, {h.get('price_per_night', '')}/night)")
+
+    itinerary = trip_data.get("itinerary", [])
+    if itinerary:
+        lines += ["", "Daily itinerary"]
+        for day in itinerary:
+            lines.append(str(day.get("date", "")))
+            for activity in day.get("activities", []):
+                lines.append(f"  - {activity}")
+
+    restaurants = trip_data.get("restaurants", [])[:10]
+    if restaurants:
+        lines += ["", "Restaurants"]
+        lines += [f"- {r.get('name', '')} {r.get('price_level', '')}" for r in restaurants]
+
+    events = trip_data.get("events", [])[:5]
+    if events:
+        lines += ["", "Events"]
+        lines += [f"- {e.get('name', '')} {e.get('start_time', '')}".rstrip() for e in events]
+
+    visa = trip_data.get("visa_info") or {}
+    if visa:
+        lines += ["", f"Visa required: {visa.get('visa_required', 'unknown')}"]
+    return lines
+
+
+# --- ICS ---
+
+def _ics_escape(text: str) -> str:
+    return (
+        str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n")
+    )
+
+
+def _ics_fold(line: str) -> str:
+    # RFC 5545: lines longer than 75 octets are folded with CRLF + space
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return line
+    parts, chunk = [], b""
+    for ch in line:
+        enc = ch.encode("utf-8")
+        if len(chunk) + len(enc) > (75 if not parts else 74):
+            parts.append(chunk.decode("utf-8"))
+            chunk = b""
+        chunk += enc
+    parts.append(chunk.decode("utf-8"))
+    return "\r\n ".join(parts)
+
+
+def render_ics(trip_id: str, trip_data: Dict[str, Any]) -> bytes:
+    """One all-day VEVENT per itinerary day, plus timed events when known."""
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    destination = trip_data.get("destination", "")
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//AI Trip Planner//Trip Export//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{_ics_escape(f'Trip to {destination}')}",
+    ]
+    for day in trip_data.get("itinerary", []):
+        try:
+            d = date.fromisoformat(str(day.get("date")))
+        except ValueError:
+            continue
+        description = "\n".join(str(a) for a in day.get("activities", []))
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{trip_id}-{d.isoformat()}@ai-trip-planner",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART;VALUE=DATE:{d.strftime('%Y%m%d')}",
+            f"DTEND;VALUE=DATE:{(d + timedelta(days=1)).strftime('%Y%m%d')}",
+            f"SUMMARY:{_ics_escape(f'{destination} - day plan')}",
+            f"DESCRIPTION:{_ics_escape(description)}",
+            f"LOCATION:{_ics_escape(destination)}",
+            "END:VEVENT",
+        ]
+    for i, event in enumerate(trip_data.get("events", [])):
+        try:
+            start = datetime.fromisoformat(str(event.get("start_time")))
+        except ValueError:
+            continue
+        dtstart = start.strftime("%Y%m%dT%H%M%S") if len(str(event.get("start_time"))) > 10 else None
+        lines += [
+            "BEGIN:VEVENT",
+            f"UID:{trip_id}-event-{i}@ai-trip-planner",
+            f"DTSTAMP:{stamp}",
+            f"DTSTART:{dtstart}" if dtstart else f"DTSTART;VALUE=DATE:{start.strftime('%Y%m%d')}",
+            f"SUMMARY:{_ics_escape(event.get('name', 'Event'))}",
+            f"DESCRIPTION:{_ics_escape(event.get('url', ''))}",
+            "END:VEVENT",
+        ]
+    lines.append("END:VCALENDAR")
+    return ("\r\n".join(_ics_fold(l) for l in lines) + "\r\n").encode("utf-8")
+
+
+# --- PDF ---
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(line: str, width: int) -> List[str]:
+    out = []
+    while len(line) > width:
+        cut = line.rfind(" ", 0, width)
+        cut = cut if cut > 0 else width
+        out.append(line[:cut])
+        line = "    " + line[cut:].lstrip()
+    out.append(line)
+    return out
+
+
+def render_pdf(trip_id: str, trip_data: Dict[str, Any]) -> bytes:
+    """Plain text PDF (Helvetica, A4) built without third-party dependencies."""
+    lines: List[str] = []
+    for line in _summary_lines(trip_id, trip_data):
+        lines += _wrap(line, 95)
+    per_page = 60
+    pages = [lines[i:i + per_page] for i in range(0, len(lines), per_page)] or [[]]
+
+    objects: List[bytes] = []
+    # 1: catalog, 2: pages, 3: font; each page adds a page object and a content stream
+    page_ids = [4 + 2 * i for i in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{pid} 0 R" for pid in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+    for pid, page in zip(page_ids, pages):
+        text = ["BT", "/F1 10 Tf", "13 TL", "50 800 Td"]
+        for i, line in enumerate(page):
+            if pid == page_ids[0] and i == 0:  # title line
+                text += ["/F1 14 Tf", f"({_pdf_escape(line)}) Tj", "/F1 10 Tf", "T*"]
+            else:
+                text += [f"({_pdf_escape(line)}) Tj", "T*"]
+        text.append("ET")
+        stream = "\n".join(text).encode("cp1252", errors="replace")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {pid + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+# --- Email ---
+
+def render_email(trip_id: str, trip_data: Dict[str, Any]) -> bytes:
+    """RFC 822 message with the text summary and the calendar attached."""
+    msg = EmailMessage()
+    msg["Subject"] = f"Your trip to {trip_data.get('destination', '')}"
+    msg["From"] = os.getenv("EXPORT_EMAIL_FROM", "trips@travel-ai.com")
+    msg.set_content("\n".join(_summary_lines(trip_id, trip_data)))
+    msg.add_attachment(
+        render_ics(trip_id, trip_data), maintype="text", subtype="calendar", filename=f"trip-{trip_id}.ics"
+    )
+    return bytes(msg)
+
+
+# format -> (file extension, media type, renderer)
+EXPORT_FORMATS = {
+    "pdf": ("pdf", "application/pdf", render_pdf),
+    "calendar": ("ics", "text/calendar", render_ics),
+    "email": ("eml", "message/rfc822", render_email),
+}
+MEDIA_TYPES = {ext: media for ext, media, _ in EXPORT_FORMATS.values()}
+
+
+def export_digest(trip_id: str, trip_data: Dict[str, Any], fmt: str) -> str:
+    h = hashlib.sha256()
+    h.update(f"{RENDERER_VERSION}:{fmt}:{trip_id}:".encode())
+    h.update(dumps_bytes(trip_data, sort_keys=True))
+    return h.hexdigest()
+
+
+def _render_to_file(fmt: str, trip_id: str, trip_data: Dict[str, Any], path: str) -> str:
+    """Worker-process entrypoint: render and atomically publish the file."""
+    _, _, renderer = EXPORT_FORMATS[fmt]
+    data = renderer(trip_id, trip_data)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+    return path
+
+
+class ExportManager:
+    """Dedupes, caches and schedules export renders on a process pool."""
+
+    def __init__(self, export_dir: str = EXPORT_DIR, workers: int = EXPORT_WORKERS):
+        self.export_dir = export_dir
+        self.workers = workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        os.makedirs(export_dir, exist_ok=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn keeps workers independent of the API process's threads
+            ctx = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx)
+        return self._executor
+
+    def path_for(self, filename: str) -> str:
+        return os.path.join(self.export_dir, filename)
+
+    async def request(
+        self, trip_id: str, trip_data: Dict[str, Any], fmt: str, wait: float = EXPORT_WAIT_SECONDS
+    ) -> Dict[str, Any]:
+        """
+        Return export status, starting a render if needed. Waits up to `wait`
+        seconds for a fresh render, then reports "pending"; calling again
+        with the same plan picks up the same in-flight render.
+        """
+        ext, media_type, _ = EXPORT_FORMATS[fmt]
+        digest = export_digest(trip_id, trip_data, fmt)
+        filename = f"{digest}.{ext}"
+        path = self.path_for(filename)
+
+        if not os.path.exists(path):
+            fut = self._inflight.get(digest)
+            if fut is None:
+                loop = asyncio.get_running_loop()
+                fut = loop.run_in_executor(self._get_executor(), _render_to_file, fmt, trip_id, trip_data, path)
+                self._inflight[digest] = fut
+                fut.add_done_callback(lambda _f, d=digest: self._inflight.pop(d, None))
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), timeout=wait)
+            except asyncio.TimeoutError:
+                return {"status": "pending", "filename": filename, "media_type": media_type}
+
+        stat = os.stat(path)
+        return {
+            "status": "ready",
+            "filename": filename,
+            "media_type": media_type,
+            "size": stat.st_size,
+            "generated_at": datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+        }
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_manager: Optional[ExportManager] = None
+
+
+def get_export_manager() -> ExportManager:
+    global _manager
+    if _manager is None:
+        _manager = ExportManager()
+    return _manager
+
+
+def close_export_manager() -> None:
+    global _manager
+    if _manager is not None:
+        try:
+            _manager.close()
+        finally:
+            _manager = None
@@ -0,0 +1,117 @@
+# services/trip_store.py
+"""
+Persistent store for generated trip plans.
+
+Plans are written once by the planning endpoint and then read by the summary,
+export, booking and support endpoints, so those never recompute an itinerary
+or touch a provider. A bounded in-process LRU sits in front of SQLite; the
+database holds zlib-compressed JSON so millions of trips stay on disk while
+memory is capped at TRIP_STORE_CACHE_SIZE plans.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from typing import Any, Dict, Optional
+
+from core.cache import LRUCache
+from core.serialization import dumps_bytes, loads
+
+TRIP_STORE_PATH = os.getenv("TRIP_STORE_PATH", "trips.db")
+TRIP_STORE_CACHE_SIZE = int(os.getenv("TRIP_STORE_CACHE_SIZE", "1024"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trips (
+    trip_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    destination TEXT,
+    plan BLOB NOT NULL
+) WITHOUT ROWID
+"""
+
+
+def encode_plan(plan: Dict[str, Any]) -> bytes:
+    return zlib.compress(dumps_bytes(plan), 6)
+
+
+def decode_plan(blob: bytes) -> Dict[str, Any]:
+    return loads(zlib.decompress(blob))
+
+
+class TripStore:
+    """
+    LRU-fronted SQLite store. Reads hit the cache in O(1) and otherwise do a
+    single primary-key lookup; SQLite work runs in a worker thread so the
+    event loop never blocks on disk.
+
+    Returned plans are shared with the cache and must be treated as read-only.
+    """
+
+    def __init__(self, path: str = TRIP_STORE_PATH, cache_size: int = TRIP_STORE_CACHE_SIZE):
+        self.path = path
+        self._cache = LRUCache(maxsize=cache_size)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(_SCHEMA)
+
+    def _insert(self, trip_id: str, destination: Optional[str], blob: bytes) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO trips (trip_id, created_at, destination, plan) VALUES (?, ?, ?, ?)",
+                (trip_id, time.time(), destination, blob),
+            )
+
+    def _select(self, trip_id: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute("SELECT plan FROM trips WHERE trip_id = ?", (trip_id,)).fetchone()
+        return row[0] if row else None
+
+    async def save(self, plan: Dict[str, Any], trip_id: Optional[str] = None) -> str:
+        """Persist a plan and return its trip_id."""
+        trip_id = trip_id or uuid.uuid4().hex
+        blob = encode_plan(plan)
+        destination = (plan.get("request") or {}).get("destination")
+        await asyncio.to_thread(self._insert, trip_id, destination, blob)
+        self._cache.set(trip_id, plan)
+        return trip_id
+
+    async def get(self, trip_id: str) -> Optional[Dict[str, Any]]:
+        """Return the stored plan, or None if the trip_id is unknown."""
+        plan = self._cache.get(trip_id)
+        if plan is not None:
+            return plan
+        blob = await asyncio.to_thread(self._select, trip_id)
+        if blob is None:
+            return None
+        plan = decode_plan(blob)
+        self._cache.set(trip_id, plan)
+        return plan
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+        self._cache.clear()
+
+
+_store: Optional[TripStore] = None
+
+
+def get_trip_store() -> TripStore:
+    global _store
+    if _store is None:
+        _store = TripStore()
+    return _store
+
+
+def close_trip_store() -> None:
+    global _store
+    if _store is not None:
+        try:
+            _store.close()
+        finally:
+            _store = None
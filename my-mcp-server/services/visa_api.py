@@ -1,27 +1,66 @@
 # services/visa_api.py
 import os
+import asyncio
 from typing import Dict, Any
 from core.http_client import get_json
+from services.destinations import country_code
+from services.visa_data import get_advisories, get_visa_matrix
+
+# The remote service is only asked about pairs missing from the local matrix
+VISA_REMOTE_TIMEOUT = float(os.getenv("VISA_REMOTE_TIMEOUT", "2"))
+
+_VISA_TYPES = {
+    "citizen": ("none", "Citizens need no visa"),
+    "visa_free": ("visa_free", None),
+    "eta": ("eta", "Apply online for an electronic travel authorization before departure"),
+    "visa_on_arrival": ("on_arrival", "Visa issued on arrival; check fees and accepted payment"),
+    "e_visa": ("e_visa", "Apply online for an e-visa before departure"),
+    "visa_required": ("embassy", "Apply for a visa at an embassy or consulate before travel"),
+    "no_admission": ("no_admission", "Entry is not permitted with this passport"),
+}
+_NO_VISA = {"citizen", "visa_free", "eta"}
+
 
 async def check_visa_requirements(origin_country: str, destination_country: str) -> Dict[str, Any]:
     """
     Check visa requirements between countries.
-    Uses a free visa API or fallback to basic info.
+    Served from the local memory-mapped matrix (services.visa_data), which
+    only covers the passports in the bundled dataset; other passports and
+    missing pairs go to a free visa API within VISA_REMOTE_TIMEOUT, then to
+    basic info. "source" says which of the three answered.
     """
+    origin = country_code(origin_country) or origin_country
+    destination = country_code(destination_country) or destination_country
+
+    try:
+        matrix = get_visa_matrix()
+        covered = origin.upper() in matrix.passports
+        rule = matrix.lookup(origin, destination) if covered else None
+    except Exception:
+        matrix, covered, rule = None, False, None
+    if rule is not None:
+        visa_type, note = _VISA_TYPES[rule.requirement]
+        return {
+            "visa_required": rule.requirement not in _NO_VISA,
+            "visa_type": visa_type,
+            "duration": f"{rule.days} days" if rule.days else "unknown",
+            "requirements": [note] if note else [],
+            "last_updated": matrix.updated,
+            "source": "visa_matrix"
+        }
+
     try:
         # Example: VisaList API or similar free service
         url = "https://rough-sun-2523.fly.dev/api"  # Free visa API
-        params = {
-            "origin": origin_country,
-            "destination": destination_country
-        }
-        data = await get_json(url, params=params)
-        
+        params = {"origin": origin, "destination": destination}
+        data = await asyncio.wait_for(get_json(url, params=params), timeout=VISA_REMOTE_TIMEOUT)
+
         return {
             "visa_required": data.get("visa_required", False),
             "visa_type": data.get("visa_type", "unknown"),
             "duration": data.get("duration", "unknown"),
             "requirements": data.get("requirements", []),
+            "passport_covered": covered,
             "source": "visa_api"
         }
     except Exception:
@@ -29,24 +68,34 @@ async def check_visa_requirements(origin_country: str, destination_country: str)
         return {
             "visa_required": "unknown",
             "message": "Please check official embassy websites for visa requirements",
+            "passport_covered": covered,
             "source": "fallback"
         }
 
 async def get_safety_advisories(destination_country: str) -> Dict[str, Any]:
     """
-    Get travel safety information for a destination.
+    Get travel safety information for a destination, from the local
+    advisory index (levels 1-4, higher is riskier).
     """
     try:
-        # Example: Government travel advisory API
-        # For now, return basic structure
+        code = country_code(destination_country) or str(destination_country).upper()
+        advisory = get_advisories().get(code)
+        if advisory is None:
+            return {
+                "safety_level": "check_official_sources",
+                "advisories": [],
+                "last_updated": None,
+                "source": "advisory_index"
+            }
         return {
-            "safety_level": "check_official_sources",
-            "advisories": [],
-            "last_updated": None,
-            "source": "placeholder"
+            "safety_level": advisory.level,
+            "summary": advisory.summary,
+            "advisories": list(advisory.advisories),
+            "last_updated": advisory.updated,
+            "source": "advisory_index"
         }
     except Exception:
         return {
-            "safety_level": "unknown", 
+            "safety_level": "unknown",
             "message": "Check your government's travel advisory website"
         }
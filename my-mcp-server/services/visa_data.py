@@ -0,0 +1,264 @@
+# services/visa_data.py
+"""
+Local visa-requirement matrix and safety-advisory index.
+
+Visa rules change maybe monthly, so they are compiled offline into a compact
+binary origin x destination matrix (one requirement byte plus a uint16 day
+count per pair) that every process memory-maps read-only: a lookup is two
+offsets into the shared page cache, and N workers don't hold N copies.
+Advisories are a small CSV indexed by country code.
+
+The refresh job rebuilds both files next to the live ones and swaps them in
+with os.replace, so readers see either the old or the new file, never a
+partial one. Running processes notice the new inode and remap:
+
+    python -m services.visa_data --visa-source passport-index-tidy-iso2.csv \
+        --advisory-source advisories.csv
+
+The visa source uses the passport-index tidy layout (Passport, Destination,
+Requirement with ISO 3166 alpha-2 codes); a requirement is a day count,
+"visa free", "visa on arrival", "eta", "e-visa", "visa required",
+"no admission" or -1 for the passport's own country. The date the rules were
+collected comes from an optional Updated column (YYYY-MM-DD, latest wins) or
+--updated, and is stored in the matrix header; it is not the compile time.
+Only passports with rows in the source are covered (see VisaMatrix.passports).
+"""
+import argparse
+import csv
+import datetime
+import mmap
+import os
+import struct
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from services.destinations import DESTINATION_DATA_DIR
+
+VISA_SOURCE_PATH = os.getenv("VISA_SOURCE_PATH", os.path.join(DESTINATION_DATA_DIR, "visa_requirements.csv"))
+VISA_MATRIX_PATH = os.getenv("VISA_MATRIX_PATH", os.path.join(DESTINATION_DATA_DIR, "visa_matrix.bin"))
+ADVISORY_PATH = os.getenv("ADVISORY_PATH", os.path.join(DESTINATION_DATA_DIR, "safety_advisories.csv"))
+# How often (seconds) a process checks whether the refresh job swapped a file
+VISA_DATA_CHECK_INTERVAL = float(os.getenv("VISA_DATA_CHECK_INTERVAL", "60"))
+
+# Requirement byte values; 0 means the pair isn't in the dataset
+REQUIREMENTS = ("unknown", "citizen", "visa_free", "eta", "visa_on_arrival", "e_visa", "visa_required", "no_admission")
+_CODES = {name: i for i, name in enumerate(REQUIREMENTS)}
+_SOURCE_VALUES = {
+    "-1": "citizen",
+    "visa free": "visa_free",
+    "eta": "eta",
+    "visa on arrival": "visa_on_arrival",
+    "e-visa": "e_visa",
+    "visa required": "visa_required",
+    "no admission": "no_admission",
+}
+
+# magic, country count, built-at (unix seconds), data date (days since epoch, 0 = unknown)
+_HEADER = struct.Struct("<8sHIH")
+_MAGIC = b"VISAMTX2"
+_EPOCH = datetime.date(1970, 1, 1)
+
+
+class VisaRule(NamedTuple):
+    requirement: str
+    days: Optional[int]
+
+
+def parse_requirement(value: str) -> VisaRule:
+    value = str(value or "").strip().lower()
+    if value.isdigit():
+        return VisaRule("visa_free", int(value))
+    return VisaRule(_SOURCE_VALUES.get(value, "unknown"), None)
+
+
+def encode_matrix(
+    rows: Iterable[Tuple[str, str, str]], built_at: Optional[int] = None, updated: Optional[str] = None
+) -> bytes:
+    """(passport, destination, requirement) rows -> matrix file contents; `updated` is the data date."""
+    rules: Dict[Tuple[str, str], VisaRule] = {}
+    countries = set()
+    for passport, destination, requirement in rows:
+        passport, destination = passport.strip().upper(), destination.strip().upper()
+        if len(passport) != 2 or len(destination) != 2:
+            continue
+        rules[(passport, destination)] = parse_requirement(requirement)
+        countries.update((passport, destination))
+
+    codes = sorted(countries)
+    index = {c: i for i, c in enumerate(codes)}
+    n = len(codes)
+    kinds = bytearray(n * n)
+    days = bytearray(2 * n * n)
+    for (passport, destination), rule in rules.items():
+        cell = index[passport] * n + index[destination]
+        kinds[cell] = _CODES[rule.requirement]
+        struct.pack_into("<H", days, 2 * cell, min(rule.days or 0, 0xFFFF))
+    as_of = (datetime.date.fromisoformat(updated) - _EPOCH).days if updated else 0
+    header = _HEADER.pack(_MAGIC, n, int(time.time() if built_at is None else built_at), as_of)
+    return header + "".join(codes).encode("ascii") + bytes(kinds) + bytes(days)
+
+
+class VisaMatrix:
+    """Read-only view over matrix file contents (an mmap or bytes)."""
+
+    def __init__(self, buf):
+        magic, n, built_at, as_of = _HEADER.unpack_from(buf, 0)
+        if magic != _MAGIC:
+            raise ValueError("not a visa matrix file")
+        self._buf = buf
+        self.size = n
+        self.built_at = built_at
+        # when the rules were collected (YYYY-MM-DD), None if the source didn't say
+        self.updated = (_EPOCH + datetime.timedelta(days=as_of)).isoformat() if as_of else None
+        codes = bytes(buf[_HEADER.size:_HEADER.size + 2 * n]).decode("ascii")
+        self._index = {codes[2 * i:2 * i + 2]: i for i in range(n)}
+        self._kinds = _HEADER.size + 2 * n
+        self._days = self._kinds + n * n
+        # passports with at least one rule; other codes only appear as destinations
+        self.passports = frozenset(
+            code for code, i in self._index.items() if any(buf[self._kinds + i * n:self._kinds + (i + 1) * n])
+        )
+
+    @classmethod
+    def open(cls, path: str) -> "VisaMatrix":
+        with open(path, "rb") as f:
+            # the mapping outlives the descriptor and survives the file being replaced
+            return cls(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    def lookup(self, passport: str, destination: str) -> Optional[VisaRule]:
+        i, j = self._index.get(passport.upper()), self._index.get(destination.upper())
+        if i is None or j is None:
+            return None
+        cell = i * self.size + j
+        kind = self._buf[self._kinds + cell]
+        if not kind:
+            return None
+        (days,) = struct.unpack_from("<H", self._buf, self._days + 2 * cell)
+        return VisaRule(REQUIREMENTS[kind], days or None)
+
+
+class Advisory(NamedTuple):
+    country_code: str
+    level: int
+    summary: str
+    advisories: Tuple[str, ...]
+    updated: Optional[str]
+
+
+def load_advisories(path: str) -> Dict[str, Advisory]:
+    index: Dict[str, Advisory] = {}
+    with open(path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f):
+            code = row["country_code"].strip().upper()
+            index[code] = Advisory(
+                code,
+                int(row["level"] or 0),
+                row["summary"],
+                tuple(a for a in (row.get("advisories") or "").split("|") if a),
+                row.get("updated") or None,
+            )
+    return index
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as fh:
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    os.replace(tmp, path)
+
+
+def build_visa_matrix(
+    source: str = VISA_SOURCE_PATH, out: str = VISA_MATRIX_PATH, updated: Optional[str] = None
+) -> int:
+    """Compile the source CSV into `out` atomically; returns the country count."""
+    with open(source, encoding="utf-8", newline="") as f:
+        reader = list(csv.DictReader(f))
+    rows = [(r["Passport"], r["Destination"], r["Requirement"]) for r in reader]
+    updated = max((r.get("Updated") or "" for r in reader), default="") or updated
+    data = encode_matrix(rows, updated=updated)
+    _write_atomic(out, data)
+    return _HEADER.unpack_from(data, 0)[1]
+
+
+def publish_advisories(source: str, out: str = ADVISORY_PATH) -> int:
+    """Validate an advisory CSV and swap it in atomically; returns the row count."""
+    count = len(load_advisories(source))
+    with open(source, "rb") as f:
+        _write_atomic(out, f.read())
+    return count
+
+
+class _Reloading:
+    """A value loaded from a file, reloaded when the file is replaced (checked at most every interval)."""
+
+    def __init__(self, path_getter, loader, prepare=None):
+        self._path_getter = path_getter
+        self._loader = loader
+        self._prepare = prepare
+        self._value = None
+        self._stamp: Optional[Tuple[int, int]] = None
+        self._checked = float("-inf")
+
+    def get(self):
+        now = time.monotonic()
+        if self._value is not None and now - self._checked < VISA_DATA_CHECK_INTERVAL:
+            return self._value
+        self._checked = now
+        path = self._path_getter()
+        if self._prepare is not None:
+            self._prepare(path)
+        st = os.stat(path)
+        stamp = (st.st_ino, st.st_mtime_ns)
+        if stamp != self._stamp:
+            self._value, self._stamp = self._loader(path), stamp
+        return self._value
+
+    def reset(self) -> None:
+        self._value, self._stamp, self._checked = None, None, float("-inf")
+
+
+def _is_current(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(_MAGIC)) == _MAGIC
+
+
+def _ensure_matrix(path: str) -> None:
+    # First run on a fresh checkout (or a file from an older format): compile the bundled dataset
+    if not os.path.exists(path) or not _is_current(path) or (
+        os.path.exists(VISA_SOURCE_PATH) and os.path.getmtime(VISA_SOURCE_PATH) > os.path.getmtime(path)
+    ):
+        build_visa_matrix(VISA_SOURCE_PATH, path)
+
+
+_matrix = _Reloading(lambda: VISA_MATRIX_PATH, VisaMatrix.open, prepare=_ensure_matrix)
+_advisories = _Reloading(lambda: ADVISORY_PATH, load_advisories)
+
+
+def get_visa_matrix() -> VisaMatrix:
+    return _matrix.get()
+
+
+def get_advisories() -> Dict[str, Advisory]:
+    return _advisories.get()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rebuild the local visa matrix and advisory index.")
+    parser.add_argument("--visa-source", default=VISA_SOURCE_PATH, help="passport-index tidy CSV (ISO2 codes)")
+    parser.add_argument("--visa-out", default=VISA_MATRIX_PATH)
+    parser.add_argument("--updated", help="date the visa rules were collected (YYYY-MM-DD), if the source has no Updated column")
+    parser.add_argument("--advisory-source", help="advisory CSV to publish")
+    parser.add_argument("--advisory-out", default=ADVISORY_PATH)
+    args = parser.parse_args(argv)
+
+    countries = build_visa_matrix(args.visa_source, args.visa_out, args.updated)
+    print(f"visa matrix: {countries} countries -> {args.visa_out}")
+    if args.advisory_source:
+        count = publish_advisories(args.advisory_source, args.advisory_out)
+        print(f"advisories: {count} countries -> {args.advisory_out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,55 @@
 # app/services/weather_api.py
 import os
-import httpx
+import asyncio
 from core.http_client import get_json
-from typing import List, Dict, Any
+from core.cache import LRUCache
+from core.rate_limit import TokenBucket
+from core.tracing import annotate
+from services.destinations import resolve
+from typing import List, Dict, Any, Iterable, Optional, Tuple, Union
+
+import numpy as np
 
 OPENWEATHER_KEY = os.getenv("WEATHER_API_KEY")
 BASE_OWM = "https://api.openweathermap.org/data/2.5"
 
+# One budget for every OpenWeather call made by this process
+WEATHER_RATE_PER_SEC = float(os.getenv("WEATHER_RATE_PER_SEC", "1"))
+WEATHER_RATE_BURST = int(os.getenv("WEATHER_RATE_BURST", "10"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "600"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "2048"))
+
+_rate = TokenBucket(WEATHER_RATE_PER_SEC, burst=WEATHER_RATE_BURST)
+# Raw /forecast responses and their daily summaries, keyed by location + units
+_raw_cache = LRUCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL)
+_daily_cache = LRUCache(maxsize=WEATHER_CACHE_SIZE, ttl=WEATHER_CACHE_TTL)
+_inflight: Dict[Tuple, asyncio.Future] = {}
+
+# A city name or a (lat, lon) pair
+Location = Union[str, Tuple[float, float]]
+
+
+def _location_key(location: Location, units: str) -> Tuple:
+    if isinstance(location, (tuple, list)):
+        lat, lon = location
+        return ("coord", round(float(lat), 2), round(float(lon), 2), units)
+    return ("q", " ".join(str(location).lower().split()), units)
+
+
+def _canonical_location(location: Location) -> Location:
+    """Known cities become their bundled coordinates, so spellings share a cache entry."""
+    if isinstance(location, str):
+        dest = resolve(location)
+        if dest is not None:
+            return dest.coords
+    return tuple(location) if isinstance(location, list) else location
+
+
+def _location_params(location: Location) -> Dict[str, Any]:
+    if isinstance(location, (tuple, list)):
+        return {"lat": location[0], "lon": location[1]}
+    return {"q": location}
+
 async def get_weather(city: str, units: str = "metric") -> Dict[str, Any]:
     """
     Returns current weather + short forecast info for a city.
@@ -15,7 +58,8 @@ async def get_weather(city: str, units: str = "metric") -> Dict[str, Any]:
         raise RuntimeError("Missing WEATHER_API_KEY in env")
 
     url = f"{BASE_OWM}/weather"
-    params = {"q": city, "appid": OPENWEATHER_KEY, "units": units}
+    params = {**_location_params(_canonical_location(city)), "appid": OPENWEATHER_KEY, "units": units}
+    await _rate.acquire()
     data = await get_json(url, params=params)
 
     normalized = {
@@ -28,27 +72,143 @@ async def get_weather(city: str, units: str = "metric") -> Dict[str, Any]:
     }
     return normalized
 
-async def get_forecast(city: str, units: str = "metric") -> List[Dict[str, Any]]:
+
+def aggregate_daily(entries: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
-    5-day / 3-hour forecast simplified to daily summaries (best-effort).
+    Collapse 3-hourly forecast entries into daily summaries with NumPy:
+    min/max temperature, most frequent description, max precipitation
+    probability and the 3-hourly precipitation probabilities themselves.
     """
-    url = f"{BASE_OWM}/forecast"
-    params = {"q": city, "appid": OPENWEATHER_KEY, "units": units}
-    data = await get_json(url, params=params)
+    if not entries:
+        return []
+    n = len(entries)
+    stamps = [e.get("dt_txt", "") for e in entries]
+    dates = np.array([s.split(" ")[0] for s in stamps])
+    temps = np.array(
+        [np.nan if (t := (e.get("main") or {}).get("temp")) is None else t for e in entries], dtype=float
+    )
+    descs = np.array([((e.get("weather") or [{}])[0].get("description") or "") for e in entries])
+    pops = np.array([np.nan if e.get("pop") is None else e["pop"] for e in entries], dtype=float)
+
+    day_labels, day_idx = np.unique(dates, return_inverse=True)
+    desc_labels, desc_idx = np.unique(descs, return_inverse=True)
+    n_days = len(day_labels)
+
+    temp_min = np.full(n_days, np.inf)
+    temp_max = np.full(n_days, -np.inf)
+    pop_max = np.full(n_days, -np.inf)
+    valid_t = ~np.isnan(temps)
+    np.minimum.at(temp_min, day_idx[valid_t], temps[valid_t])
+    np.maximum.at(temp_max, day_idx[valid_t], temps[valid_t])
+    valid_p = ~np.isnan(pops)
+    np.maximum.at(pop_max, day_idx[valid_p], pops[valid_p])
+
+    # per-day description histogram -> mode, ignoring empty descriptions
+    counts = np.bincount(day_idx * len(desc_labels) + desc_idx, minlength=n_days * len(desc_labels))
+    counts = counts.reshape(n_days, len(desc_labels))
+    if desc_labels[0] == "":
+        counts[:, 0] = 0
+    mode_idx = counts.argmax(axis=1)
+    has_desc = counts.max(axis=1) > 0
+
+    order = np.argsort(day_idx, kind="stable")
+    boundaries = np.searchsorted(day_idx[order], np.arange(n_days + 1))
 
-    # group by date
-    daily = {}
-    for entry in data.get("list", []):
-        date = entry.get("dt_txt", "").split(" ")[0]
-        temps = daily.setdefault(date, {"temps": [], "descriptions": []})
-        temps["temps"].append(entry.get("main", {}).get("temp"))
-        temps["descriptions"].append(entry.get("weather", [{}])[0].get("description"))
     summary = []
-    for date, info in daily.items():
+    for d in range(n_days):
+        rows = order[boundaries[d]:boundaries[d + 1]]
         summary.append({
-            "date": date,
-            "temp_min": min(info["temps"]) if info["temps"] else None,
-            "temp_max": max(info["temps"]) if info["temps"] else None,
-            "description": max(set(info["descriptions"]), key=info["descriptions"].count) if info["descriptions"] else None
+            "date": str(day_labels[d]),
+            "temp_min": float(temp_min[d]) if np.isfinite(temp_min[d]) else None,
+            "temp_max": float(temp_max[d]) if np.isfinite(temp_max[d]) else None,
+            "description": str(desc_labels[mode_idx[d]]) if has_desc[d] else None,
+            "pop_max": float(pop_max[d]) if np.isfinite(pop_max[d]) else None,
+            "pop_hourly": [
+                {"time": stamps[i].split(" ")[-1][:5], "pop": None if np.isnan(pops[i]) else float(pops[i])}
+                for i in rows
+            ],
         })
     return summary
+
+
+async def _fetch_forecast_raw(location: Location, units: str) -> Dict[str, Any]:
+    key = _location_key(location, units)
+    cached = _raw_cache.get(key)
+    if cached is not None:
+        annotate("cache", "hit")
+        return cached
+    # coalesce concurrent requests for the same location into one upstream call
+    fut = _inflight.get(key)
+    if fut is not None:
+        annotate("coalesced", True)
+        return await asyncio.shield(fut)
+    annotate("cache", "miss")
+
+    async def _fetch() -> Dict[str, Any]:
+        params = {**_location_params(location), "appid": OPENWEATHER_KEY, "units": units}
+        await _rate.acquire()
+        data = await get_json(f"{BASE_OWM}/forecast", params=params)
+        _raw_cache.set(key, data)
+        return data
+
+    fut = asyncio.ensure_future(_fetch())
+    _inflight[key] = fut
+    try:
+        return await asyncio.shield(fut)
+    finally:
+        if fut.done():
+            _inflight.pop(key, None)
+        else:
+            fut.add_done_callback(lambda _f: _inflight.pop(key, None))
+
+
+async def get_forecast(
+    city: str = None,
+    units: str = "metric",
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    5-day / 3-hour forecast simplified to daily summaries (best-effort).
+    Pass lat/lon instead of city to skip OpenWeather's geocoding.
+    """
+    location: Location = (lat, lon) if lat is not None and lon is not None else _canonical_location(city)
+    key = _location_key(location, units)
+    summary = _daily_cache.get(key)
+    if summary is not None:
+        return summary
+    data = await _fetch_forecast_raw(location, units)
+    summary = aggregate_daily(data.get("list", []))
+    _daily_cache.set(key, summary)
+    return summary
+
+
+async def get_forecasts(
+    locations: Iterable[Location],
+    units: str = "metric",
+) -> Dict[Location, Optional[List[Dict[str, Any]]]]:
+    """
+    Batched forecasts for many cities and/or (lat, lon) pairs. Locations are
+    canonicalized and deduplicated, fetched concurrently under the shared rate budget and
+    served from the per-location caches when fresh. A failed location maps
+    to None.
+    """
+    unique: Dict[Tuple, Location] = {}
+    requested: List[Tuple[Location, Tuple]] = []
+    for loc in locations:
+        loc = tuple(loc) if isinstance(loc, list) else loc
+        canonical = _canonical_location(loc)
+        key = _location_key(canonical, units)
+        unique.setdefault(key, canonical)
+        requested.append((loc, key))
+
+    async def _one(loc: Location) -> Optional[List[Dict[str, Any]]]:
+        try:
+            if isinstance(loc, tuple):
+                return await get_forecast(units=units, lat=loc[0], lon=loc[1])
+            return await get_forecast(loc, units=units)
+        except Exception:
+            return None
+
+    results = dict(zip(unique.keys(), await asyncio.gather(*(_one(loc) for loc in unique.values()))))
+    return {loc: results[key] for loc, key in requested}
@@ -0,0 +1,22 @@
+# services/weather_rules.py
+"""
+What counts as bad weather, shared by the planner (which days to keep
+outdoors) and live alerts, so an alert never disagrees with the plan.
+"""
+from typing import Any, Dict
+
+# A day is "bad" when precipitation is this likely in any 3-hour slot
+BAD_WEATHER_POP = 0.6
+
+SEVERE_WEATHER_KEYWORDS = ("storm", "thunder")
+
+
+def is_severe_weather(entry: Dict[str, Any]) -> bool:
+    desc = (entry.get("description") or "").lower()
+    return any(k in desc for k in SEVERE_WEATHER_KEYWORDS)
+
+
+def is_bad_weather_day(entry: Dict[str, Any]) -> bool:
+    """A daily forecast summary with pop_max >= BAD_WEATHER_POP, or a storm."""
+    pop = entry.get("pop_max")
+    return (isinstance(pop, (int, float)) and pop >= BAD_WEATHER_POP) or is_severe_weather(entry)
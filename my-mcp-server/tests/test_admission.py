@@ -0,0 +1,103 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from core.admission import AdaptiveLimiter, AdmissionMiddleware, route_class
+from main import app
+
+
+def test_limit_follows_latency():
+    limiter = AdaptiveLimiter("planning", initial=10, max_limit=50)
+    for _ in range(50):
+        limiter.record(0.1, in_flight=10)
+    grown = limiter.limit
+    assert grown > 10
+
+    # latency triples under load: the limit backs off
+    for _ in range(30):
+        limiter.record(0.3, in_flight=int(limiter.limit))
+    assert limiter.limit < grown / 2
+    assert limiter.limit >= limiter.min_limit
+
+    # an idle, healthy limiter doesn't drift upward
+    idle = AdaptiveLimiter("lookup", initial=10)
+    for _ in range(50):
+        idle.record(0.1, in_flight=1)
+    assert idle.limit == 10
+
+
+def test_sheds_with_retry_after_once_queue_is_full():
+    release = asyncio.Event()
+    limiters = {
+        "planning": AdaptiveLimiter("planning", initial=1, max_limit=1, max_queue=1, queue_timeout=5),
+        "lookup": AdaptiveLimiter("lookup", initial=1, max_limit=1, max_queue=0),
+    }
+    busy_app = FastAPI()
+    busy_app.add_middleware(AdmissionMiddleware, limiters=limiters, enabled=True)
+
+    @busy_app.post("/plan-trip/")
+    async def plan():
+        await release.wait()
+        return {"ok": True}
+
+    @busy_app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    async def run():
+        transport = httpx.ASGITransport(app=busy_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            running = asyncio.ensure_future(client.post("/plan-trip/"))
+            await asyncio.sleep(0.05)
+            queued = asyncio.ensure_future(client.post("/plan-trip/"))
+            await asyncio.sleep(0.05)
+            assert limiters["planning"].in_flight == 1 and limiters["planning"].queued == 1
+            shed = await client.post("/plan-trip/")
+            health = await client.get("/health")
+            release.set()
+            return shed, health, await running, await queued
+
+    shed, health, first, second = asyncio.run(run())
+    assert shed.status_code == 503
+    assert int(shed.headers["retry-after"]) >= 1
+    assert health.status_code == 200
+    assert first.status_code == second.status_code == 200
+    assert limiters["planning"].in_flight == 0
+    assert limiters["planning"].rejected == 1 and limiters["planning"].admitted == 2
+
+
+def test_queue_timeout_sheds_and_frees_the_queue():
+    async def run():
+        limiter = AdaptiveLimiter("lookup", initial=1, max_limit=1, max_queue=2, queue_timeout=0.05)
+        assert await limiter.acquire()
+        timed_out = await limiter.acquire()
+        limiter.release(0.01)
+        return limiter, timed_out
+
+    limiter, timed_out = asyncio.run(run())
+    assert timed_out is False
+    assert limiter.queued == 0 and limiter.in_flight == 0
+
+
+def test_metrics_endpoint_reports_route_classes():
+    client = TestClient(app)
+    client.get("/health")
+    body = client.get("/metrics").json()
+    assert set(body["admission"]) == {"planning", "lookup"}
+    assert body["admission"]["planning"]["limit"] >= 1
+
+
+def test_only_synchronous_plans_are_planning():
+    def cls(method, path, query=b""):
+        return route_class({"type": "http", "method": method, "path": path, "query_string": query})
+
+    assert cls("POST", "/api/v1/travel/plan") == "planning"
+    assert cls("POST", "/api/v1/travel/plan", b"mode=sync&fields=trip_plan") == "planning"
+    assert cls("POST", "/plan-trip/") == "planning"
+    # job submits return 202 at once and booking reads a stored plan
+    assert cls("POST", "/api/v1/travel/plan", b"priority=1&mode=job") == "lookup"
+    assert cls("POST", "/api/v1/travel/plan/abc/book") == "lookup"
+    assert cls("GET", "/api/v1/travel/plan/abc") == "lookup"
+    assert cls("GET", "/api/v1/travel/jobs/abc/events") is None
@@ -0,0 +1,78 @@
+import json
+import os
+import time
+
+import pytest
+
+import services.analytics_sink as analytics_sink
+from services.analytics_sink import AnalyticsSink, read_table
+
+EXTERNAL = {
+    "flights": [{"airline": "AZ", "price": 420.5, "departure_time": "08:00", "stops": 0}],
+    "return_flights": [{"airline": "AZ", "price": "399", "stops": "1"}],
+    "hotels": [{"property_id": "h1", "name": "Hotel Roma", "price_per_night": 180.0, "rating": 4.5}],
+    "places": [{"place_id": "p1", "name": "Colosseum", "types": ["museum", "landmark"], "lat": 41.89, "lon": 12.49}],
+    "restaurants": [],
+    "forecast": [{"date": "2026-05-01", "temp_min": 14.0, "temp_max": 23.5, "description": "clear sky"}],
+}
+CONTEXT = {"origin": "London", "destination": "Rome", "start_date": "2026-05-01", "end_date": "2026-05-04",
+           "captured_at": time.mktime((2026, 4, 20, 12, 0, 0, 0, 0, -1))}
+
+
+def test_record_only_queues_until_flush(tmp_path):
+    sink = AnalyticsSink(root=str(tmp_path), flush_interval=3600, batch_runs=100)
+    sink.record(CONTEXT, EXTERNAL)
+    assert not any(tmp_path.iterdir())
+    files = sink.flush()
+    sink.close()
+    kinds = sorted(os.path.relpath(f, tmp_path).split(os.sep)[0] for f in files)
+    assert kinds == ["flights", "forecasts", "hotels", "places"]  # no empty restaurant parts
+    assert all(f"{os.sep}date=2026-04-20{os.sep}destination=rome{os.sep}" in f for f in files)
+    assert not list(tmp_path.rglob("*.tmp"))
+
+
+def test_batch_threshold_wakes_the_writer_thread(tmp_path):
+    sink = AnalyticsSink(root=str(tmp_path), flush_interval=3600, batch_runs=2)
+    sink.record(CONTEXT, EXTERNAL)
+    sink.record({**CONTEXT, "destination": "Paris"}, EXTERNAL)
+    deadline = time.time() + 5
+    while time.time() < deadline and not list(tmp_path.rglob("part-*")):
+        time.sleep(0.01)
+    sink.close()
+    assert {p.parent.name for p in tmp_path.rglob("part-*")} == {"destination=rome", "destination=paris"}
+
+
+def test_queue_is_bounded(tmp_path):
+    sink = AnalyticsSink(root=str(tmp_path), flush_interval=3600, max_queued=1)
+    sink.record(CONTEXT, EXTERNAL)
+    sink.record(CONTEXT, EXTERNAL)
+    assert sink.dropped == 1
+    sink.close()
+
+
+def test_jsonl_fallback_without_pyarrow(tmp_path, monkeypatch):
+    monkeypatch.setattr(analytics_sink, "pa", None)
+    sink = AnalyticsSink(root=str(tmp_path), flush_interval=3600)
+    sink.record(CONTEXT, EXTERNAL)
+    files = sink.flush()
+    sink.close()
+    flights = [f for f in files if f"{os.sep}flights{os.sep}" in f]
+    with open(flights[0]) as fh:
+        rows = [json.loads(line) for line in fh]
+    assert [(r["leg"], r["price"], r["stops"]) for r in rows] == [("outbound", 420.5, 0), ("return", 399.0, 1)]
+
+
+def test_arrow_parts_read_back_as_one_table(tmp_path):
+    pytest.importorskip("pyarrow")
+    sink = AnalyticsSink(root=str(tmp_path), flush_interval=3600)
+    sink.record(CONTEXT, EXTERNAL)
+    sink.flush()
+    sink.record({**CONTEXT, "run_id": "second"}, EXTERNAL)
+    sink.close()
+
+    table = read_table("flights", root=str(tmp_path), destination="Rome")
+    assert table.num_rows == 4
+    assert table.column("price").to_pylist() == [420.5, 399.0, 420.5, 399.0]
+    assert table.schema.field("captured_at").type.unit == "ms"
+    assert read_table("places", root=str(tmp_path)).column("types").to_pylist() == ["museum|landmark"] * 2
+    assert read_table("hotels", root=str(tmp_path), date="2020-01-01").num_rows == 0
@@ -0,0 +1,41 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from services.autocomplete import get_autocomplete_index, prefix_distance
+
+client = TestClient(app)
+
+
+def test_prefix_ranked_by_popularity():
+    ids = [s["id"] for s in get_autocomplete_index().search("lon")]
+    assert ids[0] == "london"
+    assert "LHR" in ids
+
+
+def test_iata_code_and_later_words():
+    index = get_autocomplete_index()
+    assert index.search("jfk")[0]["id"] == "JFK"
+    assert index.search("heathrow")[0]["id"] == "LHR"
+
+
+def test_distance_breaks_ties():
+    near_sd = [s["id"] for s in get_autocomplete_index().search("san ", kinds=("city",), near=(32.7, -117.1))]
+    near_sf = [s["id"] for s in get_autocomplete_index().search("san ", kinds=("city",), near=(37.8, -122.4))]
+    assert near_sd.index("san-diego") < near_sd.index("san-francisco")
+    assert near_sf.index("san-francisco") < near_sf.index("san-diego")
+
+
+def test_fuzzy_fallback_for_typos():
+    assert prefix_distance("barcelna", "barcelona", 2) == 1
+    results = get_autocomplete_index().search("tokio")
+    assert results[0]["id"] == "tokyo" and results[0]["fuzzy"]
+    assert get_autocomplete_index().search("zzzz") == []
+
+
+def test_endpoint():
+    resp = client.get("/autocomplete/", params={"q": "par", "types": "city", "limit": 3})
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["suggestions"][0]["label"] == "Paris, France"
+    assert all(s["type"] == "city" for s in body["suggestions"])
+    assert client.get("/autocomplete/", params={"q": "par", "types": "train"}).status_code == 400
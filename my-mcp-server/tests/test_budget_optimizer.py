@@ -0,0 +1,102 @@
+import itertools
+import random
+
+import pytest
+
+import services.budget_optimizer as budget_optimizer
+from services.budget_optimizer import _Problem, STYLE_WEIGHTS, optimize_budget, party_size, price_level
+
+DAYS = ["2026-05-01", "2026-05-02", "2026-05-03"]
+
+
+def _external(seed=5, flights=3, hotels=3, events_per_day=2):
+    rng = random.Random(seed)
+    return {
+        "itineraries": [
+            {"total_price": round(200 + rng.random() * 400, 2), "legs": [{"airline": "AZ", "stops": rng.randint(0, 1)}]}
+            for _ in range(flights)
+        ],
+        "hotels": [
+            {"property_id": f"h{i}", "name": f"Hotel {i}", "price_per_night": round(50 + rng.random() * 250, 2),
+             "rating": round(2.5 + rng.random() * 2.5, 1)}
+            for i in range(hotels)
+        ],
+        "events": [
+            {"name": f"Show {d}-{i}", "date": d, "price": rng.choice([None, 0, 25, 80])}
+            for d in DAYS for i in range(events_per_day)
+        ],
+        "restaurants": [
+            {"name": "Cheap Eats", "price_level": "$", "rating": 4.0},
+            {"name": "Bistro", "price_level": "$$$", "rating": 4.6},
+        ],
+    }
+
+
+def test_price_level_and_party():
+    assert [price_level(v) for v in ("$", "$$$$", 2, "Free", "Unknown", 0)] == [1, 4, 2, None, None, None]
+    assert party_size(adults=2, children=2, senior_citizens=1) == (5, 4.0, 2)
+
+
+@pytest.mark.parametrize("budget", [1500.0, 2500.0, 4000.0])
+def test_matches_brute_force(monkeypatch, budget):
+    monkeypatch.setattr(budget_optimizer, "BUDGET_BINS", 20000)
+    external = _external()
+    result = optimize_budget(external, DAYS, budget=budget)
+    plan = result["plan"]
+    assert result["within_budget"] and plan["total_cost"] <= budget
+
+    problem = _Problem(external, DAYS, len(DAYS) - 1, party_size(), STYLE_WEIGHTS["balanced"], [], [], False)
+    savings = len(DAYS) / budget
+    per_day = [[None] + [i for i, e in enumerate(problem.events) if e["date"] == d] for d in DAYS]
+    best = float("-inf")
+    for f, h, *rest in itertools.product(
+        range(len(problem.flights)), range(len(problem.hotels)), *per_day,
+        *[range(len(problem.dining_levels))] * len(DAYS),
+    ):
+        events = [e for e in rest[:len(DAYS)] if e is not None]
+        dining = list(rest[len(DAYS):])
+        cost = (problem.flight_cost[f] + problem.hotel_cost[h] + problem.event_cost[events].sum()
+                + problem.dining_cost[dining].sum())
+        value = (problem.flight_util[f] + problem.hotel_util[h] + problem.event_util[events].sum()
+                 + problem.dining_util[dining].sum() - savings * cost)
+        if cost <= budget:
+            best = max(best, value)
+    assert plan["score"] == pytest.approx(best, abs=1e-2)
+
+
+def test_alternatives_bracket_the_plan():
+    result = optimize_budget(_external(), DAYS, budget=1500)
+    plan, cheaper, premium = result["plan"], result["alternatives"]["cheaper"], result["alternatives"]["premium"]
+    assert cheaper["total_cost"] <= 0.8 * plan["total_cost"]
+    assert plan["total_cost"] < premium["total_cost"] <= 1500 * 1.3
+    assert [d["date"] for d in plan["dining"]] == DAYS
+    assert len({e["date"] for e in plan["events"]}) == len(plan["events"])  # at most one per day
+
+
+def test_style_and_travellers_shift_the_choice():
+    external = _external()
+    thrifty = optimize_budget(external, DAYS, budget=4000, trip_style="backpacking")["plan"]
+    lavish = optimize_budget(external, DAYS, budget=4000, trip_style="luxury")["plan"]
+    assert thrifty["total_cost"] < lavish["total_cost"]
+    family = optimize_budget(external, DAYS, budget=4000, adults=2, children=2)["plan"]
+    assert family["breakdown"]["flights"] == family["flight"]["total_price"] * 4
+
+
+def test_over_budget_falls_back_to_cheapest():
+    result = optimize_budget(_external(), DAYS, budget=100)
+    assert not result["within_budget"]
+    assert result["plan"]["events"] == [] and result["alternatives"]["cheaper"] is None
+    assert {d["price_level"] for d in result["plan"]["dining"]} == {"$"}
+
+
+def test_ten_day_trip_picks_at_most_one_event_per_day():
+    # latency target for this size lives in benchmarks/budget_optimizer.py
+    days = [f"2026-06-{d:02d}" for d in range(1, 11)]
+    external = _external(flights=10, hotels=10, events_per_day=0)
+    external["events"] = [{"name": f"Gig {i}", "date": days[i % 10], "price": 30 + i} for i in range(50)]
+    result = optimize_budget(external, days, budget=6000, trip_style="luxury", adults=2, children=1)
+    plan = result["plan"]
+    assert result["within_budget"] and plan["total_cost"] <= 6000
+    event_days = [e["date"] for e in plan["events"]]
+    assert len(event_days) == len(set(event_days))
+    assert len(plan["dining"]) == len(days)
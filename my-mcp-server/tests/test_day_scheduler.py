@@ -0,0 +1,76 @@
+import random
+
+import numpy as np
+
+from services.day_scheduler import DAY_END, DAY_START, UNKNOWN_TRAVEL_MINUTES, schedule_days, travel_minutes_matrix
+from services.places_api import opening_intervals, weekly_intervals
+
+DAYS = [f"2026-05-{d:02d}" for d in range(1, 15)]
+
+
+def _hours(open_, close, closed_day=None):
+    return {"periods": [
+        {"open": {"day": d, "time": open_}, "close": {"day": (d + (close < open_)) % 7, "time": close}}
+        for d in range(7) if d != closed_day
+    ]}
+
+
+def _places(n=200, seed=11):
+    rng = random.Random(seed)
+    places = []
+    for i in range(n):
+        place = {
+            "name": f"Place {i}", "place_id": f"p{i}", "rating": round(3.5 + rng.random() * 1.5, 1),
+            "lat": 41.85 + rng.random() * 0.1, "lon": 12.45 + rng.random() * 0.1,
+            "types": [rng.choice(["museum", "park", "church", "tourist_attraction", "art_gallery"])],
+        }
+        roll = rng.random()
+        if roll < 0.5:
+            place["opening_hours"] = _hours("0900", "1700", closed_day=rng.randint(0, 6))
+        elif roll < 0.7:
+            place["opening_hours"] = _hours("1000", "1400")
+        places.append(place)
+    return places
+
+
+def _minutes(hhmm):
+    return int(hhmm[:2]) * 60 + int(hhmm[3:])
+
+
+def test_weekly_intervals_match_per_day_lookup():
+    late = _hours("2000", "0200")
+    week = weekly_intervals(late)
+    assert all(week[d] == opening_intervals(late, d) for d in range(7))
+    assert week[0] == [(0, 120), (1200, 1560)]
+
+
+def test_travel_matrix_by_mode():
+    lats, lons = np.array([41.90, 41.90, 41.95, np.nan]), np.array([12.50, 12.505, 12.50, 12.50])
+    walking, public, car = (travel_minutes_matrix(lats, lons, m) for m in ("walking", "public transport", "rental car"))
+    assert walking[0, 1] == public[0, 1] == car[0, 1]  # a short hop is walked anyway
+    assert walking[0, 2] > public[0, 2] > car[0, 2]
+    assert public[3, 0] == public[0, 3] == UNKNOWN_TRAVEL_MINUTES and public[3, 3] == 0
+
+
+def test_days_respect_hours_travel_and_weather():
+    places = _places()
+    by_id = {p["place_id"]: p for p in places}
+    bad = {DAYS[2], DAYS[3]}
+    itinerary = schedule_days(DAYS, places, bad_weather_days=bad, base={"lat": 41.9, "lon": 12.5}, mode="public")
+    assert [d["date"] for d in itinerary] == DAYS
+    seen = set()
+    for day in itinerary:
+        weekday = np.datetime64(day["date"]).astype(object).weekday()
+        assert day["schedule"], day["date"]
+        previous_end = DAY_START
+        for stop in day["schedule"]:
+            place = by_id[stop["place_id"]]
+            start, end = _minutes(stop["time"]), _minutes(stop["end"])
+            assert start >= previous_end + stop["travel_minutes"] and end <= DAY_END
+            intervals = opening_intervals(place.get("opening_hours"), weekday) or [(0, 1440)]
+            assert any(o <= start and end <= c for o, c in intervals)
+            if day["date"] in bad:
+                assert day["weather"] == "bad" and place["types"][0] in ("museum", "church", "art_gallery")
+            assert stop["place_id"] not in seen
+            seen.add(stop["place_id"])
+            previous_end = end
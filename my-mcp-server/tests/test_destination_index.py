@@ -0,0 +1,33 @@
+from services.destinations import airport_code, canonical_name, country_code, normalize, resolve
+
+
+def test_spellings_resolve_to_one_destination():
+    ids = {resolve(s).id for s in ["Tokyo", "tokyo ", "Tokyo, Japan", "TOKYO JP", "HND"]}
+    assert ids == {"tokyo"}
+    tokyo = resolve("Tokyo")
+    assert tokyo.country_code == "JP" and tokyo.iata[0] == "HND"
+    assert round(tokyo.lat) == 36 and round(tokyo.lon) == 140
+
+
+def test_accents_aliases_and_punctuation():
+    assert normalize("  São  Paulo ") == "sao paulo"
+    assert resolve("sao paulo").id == "sao-paulo"
+    assert resolve("St. Petersburg").id == "saint-petersburg"
+    assert resolve("Washington D.C.").id == "washington"
+    assert resolve("Bombay").id == "mumbai"
+
+
+def test_conflicting_or_unknown_qualifiers_stay_unresolved():
+    assert resolve("Kyoto, Kansai, Japan").id == "kyoto"
+    assert resolve("Paris, Texas") is None
+    assert resolve("Atlantis") is None
+    assert canonical_name(" atlantis  city ") == "atlantis city"
+
+
+def test_airport_and_country_codes():
+    assert airport_code("New York") == "JFK"
+    assert airport_code("lgw") == "LGW"
+    assert airport_code("Atlantis") == "Atlantis"
+    assert country_code("Rome") == "IT"
+    assert country_code("Japan") == "JP"
+    assert resolve("London").region == "uk"
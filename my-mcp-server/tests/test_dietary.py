@@ -0,0 +1,51 @@
+import re
+
+from services.dietary import DietaryMatcher, canonical_diet, get_matcher, rank_by_diet, trie_regex
+
+
+def test_trie_regex_matches_the_same_words_as_a_plain_alternation():
+    words = ["pizza", "pizzeria", "pasta", "noodle", "noodles", "ham", "hamburger", "gf"]
+    trie = re.compile(r"\b(?:" + trie_regex(words) + r")\b")
+    plain = re.compile(r"\b(?:" + "|".join(sorted(words, key=len, reverse=True)) + r")\b")
+    text = "pizzeria pizza pastas noodles noodle ham hamburger hams gf gfx"
+    assert [m.group(0) for m in trie.finditer(text)] == [m.group(0) for m in plain.finditer(text)]
+    assert trie_regex(["pizza", "pizzeria"]) == "pizz(?:a|eria)"
+
+
+def test_restrictions_are_canonicalized_and_matchers_cached():
+    assert canonical_diet("Gluten Free") == "gluten-free"
+    assert canonical_diet("pescetarian") == "pescatarian"
+    assert get_matcher(["Vegan", "gluten free"]) is get_matcher(["gluten-free", "vegan", " "])
+    assert get_matcher(["paleo"]).diets == ("paleo",)
+
+
+def test_rank_orders_by_evidence_and_strict_drops_conflicts():
+    restaurants = [
+        {"name": "Smokey's BBQ", "cuisine": "Barbecue"},
+        {"name": "Trattoria Roma", "cuisine": "Italian"},
+        {"name": "Green Leaf", "cuisine": "Vegan, Salad"},
+    ]
+    ranked = rank_by_diet(restaurants, ["vegetarian"])
+    assert [r["name"] for r in ranked] == ["Green Leaf", "Trattoria Roma", "Smokey's BBQ"]
+    assert ranked[0]["dietary"]["suits"] == ["vegetarian"]
+    assert ranked[-1]["dietary"]["conflicts"] == ["vegetarian"]
+    assert "dietary" not in restaurants[0]
+
+    strict = rank_by_diet(restaurants, ["vegetarian"], strict=True)
+    assert [r["name"] for r in strict] == ["Green Leaf", "Trattoria Roma"]
+    assert rank_by_diet(restaurants, []) == restaurants
+
+
+def test_categories_and_types_are_scanned():
+    matcher = get_matcher(["halal"])
+    assert matcher.score({"name": "Bosphorus", "types": ["restaurant", "Turkish"]})["suits"] == ["halal"]
+    assert matcher.score({"name": "The Crown", "categories": ["Gastropub"]})["conflicts"] == ["halal"]
+
+
+def test_large_keyword_lists_compile_to_one_pattern():
+    keywords = {f"diet{i}": ([f"good{i}x{j}" for j in range(300)], [f"bad{i}x{j}" for j in range(300)])
+                for i in range(5)}
+    matcher = DietaryMatcher(keywords)
+    found = matcher.match("Good3x299 and BAD0x7, not good3x2999")
+    assert found["diet3"]["matched"] == ["good3x299"]
+    assert found["diet0"]["conflicts"] == ["bad0x7"]
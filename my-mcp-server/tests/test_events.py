@@ -0,0 +1,85 @@
+import asyncio
+
+import services.events_api as events_api
+from services.events_api import filter_events_by_days, merge_events
+
+
+def _e(name, start, source):
+    return {"name": name, "start_time": start, "date": start[:10], "venue": "", "source": source}
+
+
+def test_merge_orders_by_start_time_and_folds_duplicates():
+    eventbrite = [_e("Jazz Night", "2026-05-01T21:00:00", "eventbrite"), _e("Food Fair", "2026-05-02T10:00:00", "eventbrite")]
+    ticketmaster = [
+        _e("Opera Gala", "2026-05-01T19:00:00", "ticketmaster"),
+        {**_e("Jazz night", "2026-05-01T21:00:00", "ticketmaster"), "venue": "Blue Note"},
+        _e("Jazz Night", "2026-05-03T21:00:00", "ticketmaster"),
+    ]
+    merged = merge_events([eventbrite, ticketmaster])
+    assert [(m["name"], m["date"]) for m in merged] == [
+        ("Opera Gala", "2026-05-01"), ("Jazz Night", "2026-05-01"), ("Food Fair", "2026-05-02"), ("Jazz Night", "2026-05-03"),
+    ]
+    assert merged[1]["sources"] == ["eventbrite", "ticketmaster"]
+    assert merged[1]["venue"] == "Blue Note"
+
+
+def test_filter_by_days_caps_each_day_and_keeps_suggestions():
+    events = [_e(f"e{i}", f"2026-05-0{1 + i // 3}T1{i}:00", "x") for i in range(6)] + [{"name": "Walking tour"}]
+    kept = filter_events_by_days(events, ["2026-05-02"], per_day=2)
+    assert [e["name"] for e in kept] == ["e3", "e4", "Walking tour"]
+
+
+def _install_fake_providers(monkeypatch, calls, tm_pages=3, fail_tm_page=None):
+    async def fake_get_json(url, params=None, headers=None):
+        if "eventbrite" in url:
+            calls.append(("eventbrite", params["start_date.range_start"][:10], params["page"]))
+            start = params["start_date.range_start"][:10]
+            return {
+                "events": [{"name": {"text": "Street Market"}, "start": {"local": f"{start}T09:00:00"}}],
+                "pagination": {"page_count": 1},
+            }
+        page = int(params["page"])
+        calls.append(("ticketmaster", params["startDateTime"][:10], params["page"]))
+        if page == fail_tm_page:
+            raise RuntimeError("boom")
+        day = f"2026-05-0{page + 1}"
+        return {
+            "_embedded": {"events": [
+                {"name": f"Concert {page}", "dates": {"start": {"localDate": day, "localTime": "20:00:00"}}},
+                {"name": "Street Market", "dates": {"start": {"localDate": "2026-05-01"}}} if page == 0 else
+                {"name": f"Play {page}", "dates": {"start": {"localDate": day, "localTime": "18:00:00"}}},
+            ]},
+            "page": {"totalPages": tm_pages},
+        }
+
+    monkeypatch.setattr(events_api, "EVENTBRITE_KEY", "k")
+    monkeypatch.setattr(events_api, "TICKETMASTER_KEY", "k")
+    monkeypatch.setattr(events_api, "get_json", fake_get_json)
+    events_api._cache.clear()
+
+
+def test_search_pages_sources_and_shares_cached_days(monkeypatch):
+    calls = []
+    _install_fake_providers(monkeypatch, calls)
+
+    first = asyncio.run(events_api.search_events("Rome", "2026-05-01", "2026-05-03"))
+    assert [e["name"] for e in first] == ["Street Market", "Concert 0", "Play 1", "Concert 1", "Play 2", "Concert 2"]
+    assert sorted(first[0]["sources"]) == ["eventbrite", "ticketmaster"]
+    assert sorted(c[2] for c in calls if c[0] == "ticketmaster") == ["0", "1", "2"]
+
+    # overlapping trip: only the uncached day is fetched
+    calls.clear()
+    second = asyncio.run(events_api.search_events("rome, italy", "2026-05-02", "2026-05-04", days=["2026-05-02"]))
+    assert {c[1] for c in calls} == {"2026-05-04"}
+    assert [e["name"] for e in second] == ["Play 1", "Concert 1"]
+
+
+def test_truncated_source_only_caches_days_before_the_gap(monkeypatch):
+    calls = []
+    _install_fake_providers(monkeypatch, calls, fail_tm_page=2)
+
+    events = asyncio.run(events_api.search_events("Rome", "2026-05-01", "2026-05-03"))
+    assert "Concert 2" not in [e["name"] for e in events]
+    assert ("rome", "2026-05-01") in events_api._cache
+    assert ("rome", "2026-05-02") not in events_api._cache
+    assert ("rome", "2026-05-03") not in events_api._cache
@@ -0,0 +1,57 @@
+import asyncio
+
+import services.flights_api as flights_api
+from services.flights_api import join_legs
+
+
+def _f(price, dep, arr, airline="XA"):
+    return {"airline": airline, "price": price, "departure_time": dep, "arrival_time": arr}
+
+
+def test_round_trip_join_sorted_by_price():
+    outbound = [_f(300, "2025-05-01T08:00", "2025-05-01T12:00"), _f(200, "2025-05-01T09:00", "2025-05-01T13:00")]
+    inbound = [_f(150, "2025-05-08T10:00", "2025-05-08T14:00"), _f(0, "2025-05-08T11:00", "2025-05-08T15:00")]
+    index = join_legs([outbound, inbound])
+    assert list(index.prices) == [350.0, 450.0]  # the unpriced return never joins
+    best = index.cheapest(1)[0]
+    assert best["total_price"] == 350.0
+    assert [leg["price"] for leg in best["legs"]] == [200, 150]
+    assert len(index.within(400)) == 1
+
+
+def test_connection_window_is_enforced():
+    first = [_f(100, "2025-05-01T08:00", "2025-05-01T10:00")]
+    second = [
+        _f(50, "2025-05-01T10:30", "2025-05-01T12:00"),   # 30 min: too tight
+        _f(80, "2025-05-01T11:30", "2025-05-01T13:00"),   # 90 min: ok
+        _f(60, "2025-05-01T20:00", "2025-05-01T22:00"),   # 10 h: too long
+        _f(90, None, None),                               # unknown times: allowed
+    ]
+    index = join_legs([first, second], min_connection_minutes=60, max_connection_minutes=240)
+    assert sorted(index.prices) == [180.0, 190.0]
+    assert index.cheapest(1)[0]["connections_minutes"] == [90]
+
+
+def test_multi_city_fetches_legs_concurrently(monkeypatch):
+    started = []
+    all_started = asyncio.Event()
+
+    async def fake_search(origin, destination, date, **kwargs):
+        started.append(origin)
+        if len(started) == 3:
+            all_started.set()
+        # only released once every leg is in flight; sequential fetching times out here
+        await asyncio.wait_for(all_started.wait(), 5)
+        return [_f(100, f"{date}T08:00", f"{date}T10:00"), _f(120, f"{date}T18:00", f"{date}T20:00")]
+
+    monkeypatch.setattr(flights_api, "search_flights", fake_search)
+    legs = [
+        {"origin": "LON", "destination": "PAR", "date": "2025-05-01"},
+        {"origin": "PAR", "destination": "ROM", "date": "2025-05-03"},
+        {"origin": "ROM", "destination": "LON", "date": "2025-05-06"},
+    ]
+    result = asyncio.run(flights_api.search_multi_city(legs, top_n=3))
+    assert sorted(started) == ["LON", "PAR", "ROM"]
+    assert result["itinerary_count"] == 8
+    assert result["itineraries"][0]["total_price"] == 300.0
+    assert [leg["destination"] for leg in result["itineraries"][0]["legs"]] == ["PAR", "ROM", "LON"]
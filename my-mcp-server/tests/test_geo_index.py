@@ -0,0 +1,69 @@
+import random
+
+import numpy as np
+from fastapi.testclient import TestClient
+
+from main import app
+from services.geo_index import GeoIndex, get_destination_index, haversine_km_many, update_destination_index
+
+client = TestClient(app)
+
+
+def _points(n=2000, seed=3):
+    rng = random.Random(seed)
+    return [
+        (rng.choice(["place", "hotel", "restaurant"]),
+         {"place_id": str(i), "name": f"Spot {i}", "lat": 41.85 + rng.random() * 0.1, "lon": 12.45 + rng.random() * 0.1})
+        for i in range(n)
+    ]
+
+
+def test_queries_match_brute_force():
+    points = _points()
+    index = GeoIndex(points)
+    lats = np.array([p["lat"] for _, p in points])
+    lons = np.array([p["lon"] for _, p in points])
+    kinds = np.array([k for k, _ in points])
+    rng = random.Random(7)
+    for _ in range(200):
+        lat, lon = 41.8 + rng.random() * 0.2, 12.4 + rng.random() * 0.2
+        want_kinds = rng.choice([None, ["hotel"], ["place", "restaurant"]])
+        mask = np.isin(kinds, want_kinds) if want_kinds else np.ones(len(points), bool)
+        dist = haversine_km_many(lat, lon, lats, lons)[mask]
+
+        k = rng.choice([1, 5, 25])
+        got = [r["distance_km"] for r in index.nearest(lat, lon, k, kinds=want_kinds)]
+        assert got == [round(d, 3) for d in np.sort(dist)[:k]]
+
+        radius = rng.choice([0.3, 1.0, 4.0])
+        got = index.radius(lat, lon, radius, kinds=want_kinds)
+        assert len(got) == int((dist <= radius).sum())
+        assert all(r["type"] in (want_kinds or ["place", "hotel", "restaurant"]) for r in got)
+
+
+def test_nearest_far_outside_the_populated_area():
+    index = GeoIndex(_points(200))
+    assert len(index.nearest(48.85, 2.35, 3)) == 3
+    assert index.nearest(48.85, 2.35, 3, max_km=50) == []
+
+
+def test_update_merges_and_replaces_newer_copies():
+    update_destination_index("Testville", places=[{"place_id": "a", "name": "Old", "lat": 1.0, "lon": 1.0}])
+    index = update_destination_index(
+        "testville",
+        places=[{"place_id": "a", "name": "New", "lat": 1.001, "lon": 1.0}, {"name": "No coordinates"}],
+        hotels=[{"property_id": "h", "name": "Inn", "lat": 1.002, "lon": 1.0}],
+    )
+    assert get_destination_index("TESTVILLE") is index
+    assert [(k, p["name"]) for k, p in index.points()] == [("place", "New"), ("hotel", "Inn")]
+    assert index.find("h")[1]["name"] == "Inn"
+
+
+def test_endpoint():
+    update_destination_index("Nearbyton", places=[{"place_id": "p1", "name": "Museum", "lat": 10.0, "lon": 10.0}],
+                             restaurants=[{"name": "Trattoria", "lat": 10.001, "lon": 10.0}])
+    resp = client.get("/nearby/", params={"destination": "Nearbyton", "anchor": "p1", "types": "restaurant"})
+    assert resp.status_code == 200
+    assert [r["name"] for r in resp.json()["results"]] == ["Trattoria"]
+    assert client.get("/nearby/", params={"destination": "Nowhere", "lat": 1, "lon": 1}).status_code == 404
+    assert client.get("/nearby/", params={"destination": "Nearbyton", "lat": 1, "lon": 1, "types": "bar"}).status_code == 400
@@ -0,0 +1,75 @@
+import asyncio
+
+import services.hotels_api as hotels_api
+
+
+def _raw(page, n, price=100.0, rating=4.0):
+    return [
+        {"id": f"p{page}-{i}", "name": f"Hotel {page}-{i}", "price": {"current": price + i}, "rating": rating}
+        for i in range(n)
+    ]
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+def test_top_k_across_pages_with_dedupe(monkeypatch):
+    monkeypatch.setattr(hotels_api, "BOOKING_KEY", "test")
+    calls = []
+
+    async def fake_fetch(*args, page_number=None):
+        calls.append(page_number)
+        await asyncio.sleep(0.01 * (4 - page_number))  # later pages answer first
+        rows = _raw(page_number, 3, price=400.0 - 100 * page_number)
+        rows.append({"id": "dup", "name": "Everywhere Inn", "price": {"current": 10}, "rating": 1.0})
+        return rows
+
+    monkeypatch.setattr(hotels_api, "_fetch_page", fake_fetch)
+    hotels = _run(hotels_api.search_hotels("Rome", "2025-01-01", "2025-01-03", page_size=4, pages=3, top_k=2, sort_by="price"))
+    assert sorted(calls) == [1, 2, 3]
+    assert [h["property_id"] for h in hotels] == ["dup", "p3-0"]
+
+
+def test_short_page_stops_scan_and_filters_apply(monkeypatch):
+    monkeypatch.setattr(hotels_api, "BOOKING_KEY", "test")
+
+    async def fake_fetch(*args, page_number=None):
+        if page_number == 1:
+            return _raw(1, 2, rating=5.0) + _raw(9, 1, rating=2.0)
+        await asyncio.sleep(10)
+        return _raw(page_number, 3)
+
+    monkeypatch.setattr(hotels_api, "_fetch_page", fake_fetch)
+    hotels = _run(hotels_api.search_hotels_top_k(
+        "Rome", "2025-01-01", "2025-01-03", page_size=5, pages=4, min_rating=4.0, sort_by="rating", time_budget=2,
+    ))
+    assert {h["property_id"] for h in hotels} == {"p1-0", "p1-1"}
+
+
+def test_all_pages_failing_raises(monkeypatch):
+    monkeypatch.setattr(hotels_api, "BOOKING_KEY", "test")
+
+    async def fake_fetch(*args, page_number=None):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(hotels_api, "_fetch_page", fake_fetch)
+    try:
+        _run(hotels_api.search_hotels_top_k("Rome", "2025-01-01", "2025-01-03", pages=2))
+    except RuntimeError as e:
+        assert "upstream down" in str(e)
+    else:
+        raise AssertionError("expected RuntimeError")
+
+
+def test_accommodation_type_matches_provider_variants():
+    def hotel(kind):
+        return {"rating": 4.0, "accommodation_type": kind}
+
+    for kind in ("Hotel", "Resort", "Boutique hotel", "Aparthotel", "Country inn", None):
+        assert hotels_api._matches(hotel(kind), "hotel", None), kind
+    for kind in ("Hostel", "Apartment", "Guesthouse"):
+        assert not hotels_api._matches(hotel(kind), "hotel", None), kind
+    assert hotels_api._matches(hotel("Serviced apartment"), "apartment", None)
+    assert hotels_api._matches(hotel("Aparthotel"), "apartment", None)
+    assert hotels_api._matches(hotel("Capsule hotel"), "Capsule", None)  # unknown types match by substring
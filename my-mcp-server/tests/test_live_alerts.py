@@ -0,0 +1,82 @@
+import asyncio
+
+import services.weather_api as weather_api
+from services.ai_trip_planner import _filter_days_by_weather
+from services.live_alerts import LiveAlertHub, forecast_alerts
+
+
+def test_one_poll_per_city_and_only_deltas_are_pushed(monkeypatch):
+    calls = []
+    forecasts = [
+        [{"date": "2030-01-01", "description": "clear sky", "pop_max": 0.0}],
+        [{"date": "2030-01-01", "description": "heavy rain", "pop_max": 0.9}, {"date": "2030-01-05", "description": "snow", "pop_max": 0.7}],
+    ]
+
+    async def fake_forecasts(cities, units="metric"):
+        calls.append(list(cities))
+        return {city: forecasts[min(len(calls), len(forecasts)) - 1] for city in cities}
+
+    monkeypatch.setattr(weather_api, "get_forecasts", fake_forecasts)
+
+    async def run():
+        hub = LiveAlertHub(interval=0.01)
+        hub.register("t1", "Tokyo", "2030-01-01", "2030-01-02")
+        hub.register("t2", " tokyo", "2030-01-01", "2030-01-10")
+        q1, q2 = hub.subscribe("t1"), hub.subscribe("t2")
+        # the clear-sky poll produces no alerts, so the first message is the rain/snow delta
+        first = await asyncio.wait_for(q1.get(), 5)
+        second = await asyncio.wait_for(q2.get(), 5)
+        await hub.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert all(batch == ["Tokyo"] for batch in calls)  # both trips share the Tokyo watch
+    assert first["type"] == "delta"
+    assert [a["date"] for a in first["added"]] == ["2030-01-01"]
+    assert sorted(a["date"] for a in second["added"]) == ["2030-01-01", "2030-01-05"]
+
+
+def test_all_cities_are_polled_in_one_batch_and_failures_keep_alerts(monkeypatch):
+    calls = []
+    rainy = [{"date": "2030-01-01", "description": "light rain", "pop_max": 0.8}]
+
+    async def fake_forecasts(cities, units="metric"):
+        calls.append(sorted(cities))
+        # Paris fails after its first poll
+        return {city: None if city == "Paris" and len(calls) > 1 else rainy for city in cities}
+
+    monkeypatch.setattr(weather_api, "get_forecasts", fake_forecasts)
+
+    async def run():
+        hub = LiveAlertHub(interval=0.01)
+        hub.register("t1", "Tokyo", "2030-01-01", "2030-01-02")
+        hub.register("t2", "Paris", "2030-01-01", "2030-01-02")
+        while len(calls) < 3:
+            await asyncio.sleep(0.01)
+        alerts = hub.current_alerts("t2")
+        await hub.close()
+        return alerts
+
+    paris_alerts = asyncio.run(run())
+    assert all(batch == ["Paris", "Tokyo"] for batch in calls)
+    assert [a["date"] for a in paris_alerts] == ["2030-01-01"]
+
+
+def test_alerts_and_planner_agree_on_bad_days():
+    forecast = [
+        {"date": "2030-01-01", "description": "light rain", "pop_max": 0.2},
+        {"date": "2030-01-02", "description": "clear sky", "pop_max": 0.7},
+        {"date": "2030-01-03", "description": "thunderstorm", "pop_max": 0.1},
+    ]
+    days = ["2030-01-01", "2030-01-02", "2030-01-03"]
+    alerts = forecast_alerts(forecast)
+    kept = _filter_days_by_weather(days, forecast, avoid_bad_weather=True)
+    assert sorted(day for day, _ in alerts) == sorted(set(days) - set(kept)) == ["2030-01-02", "2030-01-03"]
+    assert alerts[("2030-01-03", "weather")]["severity"] == "medium"
+    # messages say why the day was flagged, not the (possibly sunny) description
+    assert alerts[("2030-01-02", "weather")]["message"] == "70% chance of precipitation, consider indoor activities"
+    assert alerts[("2030-01-03", "weather")]["message"] == "Thunderstorm expected, consider indoor activities"
+    stormy = forecast_alerts([{"date": "2030-01-04", "description": "thunderstorm with rain", "pop_max": 0.9}])
+    assert stormy[("2030-01-04", "weather")]["message"] == (
+        "Thunderstorm with rain expected (90% chance of precipitation), consider indoor activities"
+    )
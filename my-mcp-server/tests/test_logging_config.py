@@ -0,0 +1,101 @@
+import glob
+import json
+import logging
+import threading
+import time
+
+import core.logging_config as logging_config
+from core.tracing import start_trace
+
+
+class _SlowHandler(logging.Handler):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+        self.messages = []
+
+    def emit(self, record):
+        time.sleep(self.delay)
+        self.messages.append((record.getMessage(), record.request_id, threading.current_thread().name))
+
+
+def test_log_calls_never_wait_for_io():
+    slow = _SlowHandler(delay=0.05)
+    logging_config.configure_logging(handlers=[slow])
+    log = logging.getLogger("test.slow")
+    try:
+        started = time.perf_counter()
+        with start_trace("GET /x", request_id="req-9"):
+            for i in range(20):
+                log.info("provider %s done", i)
+        elapsed = time.perf_counter() - started
+    finally:
+        logging_config.shutdown_logging()
+    # a blocking handler would take 20 x 50 ms on the caller
+    assert elapsed < 0.3
+    assert [m for m, _, _ in slow.messages] == [f"provider {i} done" for i in range(20)]
+    assert {rid for _, rid, _ in slow.messages} == {"req-9"}
+    assert threading.main_thread().name not in {t for _, _, t in slow.messages}
+
+
+def test_json_lines_rotate_and_debug_is_sampled(tmp_path, monkeypatch):
+    monkeypatch.setattr(logging_config, "LOG_MAX_BYTES", 2000)
+    monkeypatch.setattr(logging_config, "LOG_BACKUP_COUNT", 2)
+    path = str(tmp_path / "app.log")
+    logging_config.configure_logging(level="DEBUG", path=path, console=False, debug_sample_rate=0.0)
+    log = logging.getLogger("test.json")
+    try:
+        with start_trace("POST /plan-trip/", request_id="req-1"):
+            log.debug("dropped by sampling")
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                log.exception("provider failed")
+        for i in range(100):
+            log.info("filler line %d", i)
+    finally:
+        logging_config.shutdown_logging()
+
+    assert len(glob.glob(path + ".*")) == 2  # rotated, and old files capped
+    lines = []
+    for name in sorted(glob.glob(path + "*")):
+        with open(name) as fh:
+            lines += [json.loads(line) for line in fh]
+    assert not any(line["msg"] == "dropped by sampling" for line in lines)
+    latest = [line for line in lines if line["msg"] == "filler line 99"]
+    assert latest and latest[0]["request_id"] is None and latest[0]["level"] == "INFO"
+
+
+def test_request_id_and_exception_in_json(tmp_path):
+    path = str(tmp_path / "app.log")
+    logging_config.configure_logging(path=path, console=False)
+    try:
+        with start_trace("POST /plan-trip/", request_id="req-1"):
+            try:
+                raise ValueError("boom")
+            except ValueError:
+                logging.getLogger("test.exc").exception("provider failed")
+    finally:
+        logging_config.shutdown_logging()
+    with open(path) as fh:
+        [entry] = [json.loads(line) for line in fh]
+    assert entry["request_id"] == "req-1"
+    assert entry["logger"] == "test.exc" and entry["level"] == "ERROR"
+    assert "ValueError: boom" in entry["exc"]
+
+
+def test_full_queue_drops_instead_of_blocking():
+    gate = threading.Event()
+
+    class _Stuck(logging.Handler):
+        def emit(self, record):
+            gate.wait(5)
+
+    handler = logging_config.configure_logging(handlers=[_Stuck()], queue_size=5)
+    try:
+        for i in range(50):
+            logging.getLogger("test.full").warning("burst %d", i)
+        assert handler.dropped > 0
+    finally:
+        gate.set()
+        logging_config.shutdown_logging()
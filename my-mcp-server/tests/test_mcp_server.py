@@ -0,0 +1,85 @@
+import asyncio
+import json
+from importlib.metadata import version
+
+import pytest
+
+if int(version("mcp").split(".")[0]) >= 2:
+    pytest.skip("mcp_server is written against the mcp 1.x Server API", allow_module_level=True)
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import mcp_server
+import services.ai_trip_planner as planner
+import services.hotels_api as hotels_api
+
+PLAN_ARGS = {"origin": "NYC", "destination": "Rome", "start_date": "2025-09-01", "end_date": "2025-09-03"}
+
+
+def _call(name, arguments):
+    async def run():
+        async with create_connected_server_and_client_session(mcp_server.server) as client:
+            tools = await client.list_tools()
+            assert name in {tool.name for tool in tools.tools}
+            return await client.call_tool(name, arguments)
+
+    result = asyncio.run(run())
+    assert not result.isError, result.content
+    return json.loads(result.content[0].text)
+
+
+def test_hotels_are_paged_over_the_protocol(monkeypatch):
+    async def fake_search_hotels(location, check_in, check_out, **kwargs):
+        return [{"name": f"hotel {i}"} for i in range(5)]
+
+    monkeypatch.setattr(hotels_api, "search_hotels", fake_search_hotels)
+    args = {"location": "Rome", "check_in": "2025-09-01", "check_out": "2025-09-03"}
+
+    assert len(_call("search_hotels", args)) == 5
+    page = _call("search_hotels", {**args, "limit": 2, "offset": 1})
+    assert [h["name"] for h in page["items"]] == ["hotel 1", "hotel 2"]
+    assert page["total"] == 5 and page["next_offset"] == 3
+    last = _call("search_hotels", {**args, "limit": 2, "offset": 4})
+    assert len(last["items"]) == 1 and last["next_offset"] is None
+
+
+def test_plan_lists_are_trimmed_to_max_results(monkeypatch):
+    async def fake_generate_itinerary(payload):
+        assert "max_results" not in payload
+        listing = [{"id": i} for i in range(5)]
+        return {"itinerary": [], "trip_data": {"flights": listing, "hotels": list(listing), "forecast": list(listing)}}
+
+    monkeypatch.setattr(planner, "generate_itinerary", fake_generate_itinerary)
+    trip_data = _call("plan_trip", {**PLAN_ARGS, "max_results": 2})["trip_data"]
+    assert len(trip_data["flights"]) == 2 and len(trip_data["hotels"]) == 2
+    assert len(trip_data["forecast"]) == 5
+
+
+def test_cancelled_tool_call_cancels_provider_tasks(monkeypatch):
+    started, cancelled = [], []
+
+    def blocked(name):
+        async def provider(*args, **kwargs):
+            started.append(name)
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(name)
+                raise
+        return provider
+
+    for name in ("search_round_trip", "search_hotels", "get_forecast", "search_places",
+                 "search_events", "search_restaurants", "check_visa_requirements"):
+        monkeypatch.setattr(planner, name, blocked(name))
+
+    async def run():
+        call = asyncio.create_task(mcp_server.call_tool("plan_trip", dict(PLAN_ARGS)))
+        while len(started) < 7:
+            await asyncio.sleep(0.01)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(asyncio.wait_for(run(), 5))
+    assert sorted(cancelled) == sorted(started)
+    assert mcp_server._tool_slots._value == mcp_server.MAX_CONCURRENT_TOOLS
@@ -0,0 +1,65 @@
+import asyncio
+
+import services.places_api as places_api
+from services.ai_trip_planner import _build_itinerary
+from services.places_api import enrich_places, opening_intervals
+
+# Mon-Fri 09:00-17:00 (Google days: Sunday = 0)
+OFFICE_HOURS = {"periods": [{"open": {"day": d, "time": "0900"}, "close": {"day": d, "time": "1700"}} for d in range(1, 6)]}
+
+
+def test_opening_intervals_handle_overnight_and_always_open():
+    assert opening_intervals(OFFICE_HOURS, 0) == [(540, 1020)]
+    assert opening_intervals(OFFICE_HOURS, 6) == []
+    assert opening_intervals(None, 0) is None
+
+    # Friday 20:00 to Saturday 02:00
+    late = {"periods": [{"open": {"day": 5, "time": "2000"}, "close": {"day": 6, "time": "0200"}}]}
+    assert opening_intervals(late, 4) == [(1200, 1560)]
+    assert opening_intervals(late, 5) == [(0, 120)]
+    assert opening_intervals({"periods": [{"open": {"day": 0, "time": "0000"}}]}, 3) == [(0, 1440)]
+
+
+def test_enrich_fetches_only_uncached_ids_within_the_deadline(monkeypatch):
+    calls, active, peak = [], [0], [0]
+
+    async def fake_details(place_id, fields=None):
+        calls.append((place_id, fields))
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        try:
+            await asyncio.sleep(10 if place_id == "slow" else 0.01)
+        finally:
+            active[0] -= 1
+        return {"opening_hours": OFFICE_HOURS} if place_id != "nohours" else {}
+
+    monkeypatch.setattr(places_api, "GOOGLE_KEY", "k")
+    monkeypatch.setattr(places_api, "get_place_details", fake_details)
+    monkeypatch.setattr(places_api, "PLACE_DETAILS_CONCURRENCY", 2)
+    monkeypatch.setattr(places_api, "PLACE_DETAILS_DEADLINE", 0.2)
+    places_api._details_cache.clear()
+
+    places = [{"name": n, "place_id": n} for n in ("a", "b", "a", "nohours", "slow")] + [{"name": "no id"}]
+    enriched = asyncio.run(enrich_places(places))
+    assert sorted(c[0] for c in calls) == ["a", "b", "nohours", "slow"]
+    assert {c[1] for c in calls} == {places_api.ENRICH_FIELDS}
+    assert peak[0] <= 2
+    assert [bool(p.get("opening_hours")) for p in enriched] == [True, True, True, False, False, False]
+    assert "opening_hours" not in places[0]
+
+    calls.clear()
+    asyncio.run(enrich_places(places))
+    assert [c[0] for c in calls] == ["slow"]  # only the one that missed the deadline
+
+
+def test_itinerary_schedules_places_when_they_are_open():
+    places = [
+        {"name": "Office Museum", "place_id": "m", "opening_hours": OFFICE_HOURS},
+        {"name": "Park", "place_id": "p"},
+        {"name": "Gallery", "place_id": "g"},
+        {"name": "Tower", "place_id": "t"},
+    ]
+    # 2026-05-02 is a Saturday: the museum waits for Monday
+    itinerary = _build_itinerary(["2026-05-02", "2026-05-04"], places)
+    assert itinerary[0]["activities"] == ["Visit Park", "Visit Gallery", "Visit Tower"]
+    assert [(s["name"], s["time"], s["end"]) for s in itinerary[1]["schedule"]] == [("Office Museum", "09:20", "10:35")]
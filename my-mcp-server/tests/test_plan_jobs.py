@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from services.plan_jobs import JobQueueFull, PlanJobManager
+
+
+def test_jobs_are_fair_across_clients_and_survive_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+
+    async def run():
+        manager = PlanJobManager(path=path, workers=0)
+        await manager.start(runner=None)
+        a1 = await manager.submit({"n": "a1"}, client_id="a")
+        a2 = await manager.submit({"n": "a2"}, client_id="a")
+        b1 = await manager.submit({"n": "b1"}, client_id="b")
+        urgent = await manager.submit({"n": "urgent"}, client_id="a", priority=0)
+        order = [manager._dequeue()["payload"]["n"] for _ in range(4)]
+        await manager.stop()
+
+        # nothing ran, so a fresh manager recovers every job from the local queue
+        restarted = PlanJobManager(path=path, workers=0)
+        await restarted.start(runner=None)
+        recovered = sorted(job["payload"]["n"] for job in restarted._jobs.values())
+        await restarted.stop()
+        return order, recovered
+
+    order, recovered = asyncio.run(run())
+    assert order == ["urgent", "a1", "b1", "a2"]
+    assert recovered == ["a1", "a2", "b1", "urgent"]
+
+
+def test_cancelling_a_queued_job_frees_its_place(tmp_path):
+    async def run():
+        # no workers: jobs stay queued, as when every worker is busy
+        manager = PlanJobManager(path=str(tmp_path / "jobs.db"), workers=0, max_per_client=2)
+        await manager.start(runner=None)
+        first = await manager.submit({"n": 1}, client_id="a")
+        await manager.submit({"n": 2}, client_id="a")
+        with pytest.raises(JobQueueFull):
+            await manager.submit({"n": 3}, client_id="a")
+        cancelled = await manager.cancel(first["job_id"])
+        third = await manager.submit({"n": 3}, client_id="a")
+        order = [manager._dequeue()["payload"]["n"] for _ in range(2)]
+        queued = manager._queued
+        await manager.stop()
+        return cancelled["status"], third["status"], order, queued
+
+    assert asyncio.run(run()) == ("cancelled", "queued", [2, 3], 0)
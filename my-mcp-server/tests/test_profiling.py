@@ -0,0 +1,98 @@
+import asyncio
+import os
+
+from fastapi.testclient import TestClient
+
+import core.profiling as profiling
+import services.ai_trip_planner as planner
+from main import app
+
+
+def _hot_loop(n):
+    return sum(i * i for i in range(n))
+
+
+def _unrelated_work(n):
+    return sum(i * i for i in range(n))
+
+
+async def _provider():
+    buffers = [bytearray(1024) for _ in range(2000)]
+    for _ in range(10):
+        _hot_loop(3000)
+        await asyncio.sleep(0)
+    return len(buffers)
+
+
+async def _plan():
+    # provider work runs in child tasks, as in gather_external_data
+    return await asyncio.gather(_provider(), _provider())
+
+
+def test_profile_covers_the_run_and_its_tasks_only(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_INTERVAL", 0.001)
+
+    async def other_request():
+        for _ in range(50):
+            _unrelated_work(3000)
+            await asyncio.sleep(0)
+
+    async def run():
+        other = asyncio.ensure_future(other_request())
+        async with profiling.profile_run("req-1", "generate_itinerary", directory=str(tmp_path)) as profile_run:
+            await _plan()
+        await other
+        return profile_run
+
+    assert asyncio.run(run()) is not None
+    summary = profiling.load_profile("req-1", directory=str(tmp_path))
+    folded = profiling.load_flamegraph("req-1", directory=str(tmp_path))
+    assert summary["samples"] > 0 and summary["name"] == "generate_itinerary"
+    assert "_hot_loop" in folded and "_unrelated_work" not in folded
+    for line in folded.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0 and "_run_once" not in stack
+    assert any("test_profiling.py" in a["location"] for a in summary["top_allocations"])
+    assert profiling.load_profile("../etc/passwd", directory=str(tmp_path)) is None
+
+
+def test_disabled_profiling_does_nothing(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+    plan = profiling.profiled("generate_itinerary")(_plan)
+
+    async def run():
+        with profiling.profiling_requested("wrong") as request:
+            assert request is None
+            await plan()
+
+    asyncio.run(run())
+    assert os.listdir(tmp_path) == []
+
+
+def test_profile_header_profiles_one_plan_and_serves_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+    @profiling.profiled("generate_itinerary")
+    async def fake_generate_itinerary(payload, progress=None):
+        await _plan()
+        return {"itinerary": [], "estimated_cost": 0}
+
+    monkeypatch.setattr(planner, "generate_itinerary", fake_generate_itinerary)
+    client = TestClient(app)
+    body = {"origin": "NYC", "destination": "Rome", "start_date": "2025-09-01", "end_date": "2025-09-03"}
+
+    plain = client.post("/plan-trip/", json=body)
+    assert plain.status_code == 200 and "x-profile-id" not in plain.headers
+    assert os.listdir(tmp_path) == []
+
+    profiled = client.post("/plan-trip/", json=body, headers={"X-Profile": "secret", "X-Request-ID": "req-42"})
+    assert profiled.headers["x-profile-id"] == "req-42"
+
+    assert client.get("/profiles/req-42").status_code == 403
+    summary = client.get("/profiles/req-42", headers={"X-Profile": "secret"}).json()
+    assert summary["profile_id"] == "req-42" and "top_allocations" in summary
+    flamegraph = client.get("/profiles/req-42/flamegraph", headers={"X-Profile": "secret"})
+    assert flamegraph.status_code == 200 and flamegraph.headers["content-type"].startswith("text/plain")
+    assert client.get("/profiles/missing", headers={"X-Profile": "secret"}).status_code == 404
@@ -0,0 +1,142 @@
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+
+import services.trip_store as trip_store
+from core.responses import CompressionMiddleware, negotiate_encoding
+from main import app
+from services.response_shaping import normalize_plan, parse_fields, shape_plan_response
+
+HOTEL = {"property_id": "h1", "name": "Hotel Roma", "price": 120}
+EVENT = {"id": "e1", "name": "Opera night", "date": "2025-09-02"}
+LEG = {"airline": "AZ", "flight_number": "AZ 610", "price": 300}
+
+
+def _trip_data():
+    return {
+        "destination": "Rome",
+        "hotels": [HOTEL, {"property_id": "h2", "name": "Hotel Two", "price": 90}],
+        "events": [EVENT],
+        "flights": [LEG],
+        "itineraries": [{"price": 300, "legs": [LEG]}],
+        "itinerary": [{"date": "2025-09-02", "activities": ["Visit Colosseum"]}],
+        "budget_plan": {
+            "plan": {"hotel": HOTEL, "flight": LEG, "events": [{**EVENT, "estimated_price": 45}], "total": 800},
+            "alternatives": {"cheaper": {"hotel": HOTEL, "flight": LEG, "events": [], "total": 700}},
+        },
+    }
+
+
+def test_sparse_fieldsets():
+    assert parse_fields("a.b, a.c,d") == {"a": {"b": True, "c": True}, "d": True}
+    assert parse_fields("a.b,a") == {"a": True}
+    assert parse_fields(" ") is None
+
+    body = {"status": "success", "trip_id": "t1", "trip_plan": _trip_data(), "quick_summary": {"x": 1}}
+    shaped = shape_plan_response(body, fields="trip_plan.hotels.name,trip_plan.itinerary")
+    assert shaped == {
+        "status": "success",
+        "trip_id": "t1",
+        "trip_plan": {"hotels": [{"name": "Hotel Roma"}, {"name": "Hotel Two"}], "itinerary": _trip_data()["itinerary"]},
+    }
+
+
+def test_normalized_plan_stores_each_entity_once():
+    out = normalize_plan(_trip_data())
+    plan, entities = out["trip_plan"], out["entities"]
+    assert entities["hotels"] == {"h1": HOTEL, "h2": {"property_id": "h2", "name": "Hotel Two", "price": 90}}
+    assert plan["hotels"] == ["h1", "h2"]
+    assert plan["budget_plan"]["plan"]["hotel"] == "h1"
+    assert plan["budget_plan"]["alternatives"]["cheaper"]["hotel"] == "h1"
+    # the budget adds a price to the stored event, so that mention keeps it
+    assert plan["budget_plan"]["plan"]["events"] == [{"ref": "e1", "estimated_price": 45}]
+    # a leg without a provider id is keyed by a digest of its fields, shared by every mention
+    [leg_id] = entities["flights"]
+    assert plan["flights"] == [leg_id] and plan["budget_plan"]["plan"]["flight"] == leg_id
+    [itinerary_id] = entities["itineraries"]
+    assert entities["itineraries"][itinerary_id]["legs"] == [leg_id]
+    assert len(json.dumps(out)) < len(json.dumps(_trip_data()))
+
+
+def test_negotiate_encoding():
+    assert negotiate_encoding("gzip, deflate", ("br", "gzip")) == "gzip"
+    assert negotiate_encoding("gzip;q=0.5, br", ("br", "gzip")) == "br"
+    assert negotiate_encoding("br;q=0, *", ("br", "gzip")) == "gzip"
+    assert negotiate_encoding("identity", ("br", "gzip")) is None
+    assert negotiate_encoding("*;q=0", ("gzip",)) is None
+
+
+def test_compression_middleware_skips_small_and_streamed_events():
+    small_app = FastAPI()
+    small_app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @small_app.get("/big")
+    async def big():
+        return PlainTextResponse("x" * 500)
+
+    @small_app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @small_app.get("/events")
+    async def events():
+        return StreamingResponse(iter([b"data: 1\n\n"] * 200), media_type="text/event-stream")
+
+    @small_app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([b'{"a": 1}'] * 200), media_type="application/json")
+
+    client = TestClient(small_app)
+    headers = {"Accept-Encoding": "gzip"}
+    big_response = client.get("/big", headers=headers)
+    assert big_response.headers["content-encoding"] == "gzip"
+    assert big_response.headers["vary"] == "Accept-Encoding"
+    assert big_response.text == "x" * 500
+    assert "content-encoding" not in client.get("/small", headers=headers).headers
+    assert "content-encoding" not in client.get("/events", headers=headers).headers
+    streamed = client.get("/stream", headers=headers)
+    assert streamed.headers["content-encoding"] == "gzip"
+    assert streamed.content == b'{"a": 1}' * 200
+    assert "content-encoding" not in client.get("/big", headers={"Accept-Encoding": "identity"}).headers
+
+
+
+def test_range_capable_files_are_never_encoded():
+    files_app = FastAPI()
+    files_app.add_middleware(CompressionMiddleware, minimum_size=100)
+    body = b"BEGIN:VCALENDAR\r\n" + b"X-FILLER:abc\r\n" * 100
+
+    @files_app.get("/trip.ics")
+    async def ics():
+        headers = {"Accept-Ranges": "bytes", "ETag": '"abc"'}
+        return Response(body, media_type="text/calendar", headers=headers)
+
+    response = TestClient(files_app).get("/trip.ics", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == '"abc"' and response.content == body
+
+def test_stored_plan_endpoint_shapes_and_compresses(tmp_path, monkeypatch):
+    store = trip_store.TripStore(path=str(tmp_path / "trips.db"))
+    monkeypatch.setattr(trip_store, "_store", store)
+    trip_data = _trip_data()
+    trip_data["places"] = [{"name": f"Place {i}", "description": "A long description " * 5} for i in range(20)]
+    trip_id = asyncio.run(store.save({"request": {"destination": "Rome"}, "trip_data": trip_data}))
+    client = TestClient(app)
+
+    full = client.get(f"/api/v1/travel/plan/{trip_id}", headers={"Accept-Encoding": "gzip"})
+    assert full.status_code == 200
+    assert full.headers["content-encoding"] == "gzip"
+    assert full.num_bytes_downloaded < len(full.content) / 2
+
+    shaped = client.get(
+        f"/api/v1/travel/plan/{trip_id}",
+        params={"fields": "trip_plan.hotels,trip_plan.budget_plan", "normalized": "true"},
+    ).json()
+    assert set(shaped) == {"status", "trip_id", "trip_plan", "entities"}
+    assert shaped["trip_plan"]["hotels"] == ["h1", "h2"]
+    assert set(shaped["entities"]) == {"hotels", "events", "flights"}
+    store.close()
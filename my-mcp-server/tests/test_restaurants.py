@@ -0,0 +1,77 @@
+import asyncio
+import time
+
+import services.restaurants_api as restaurants_api
+from services.restaurants_api import merge_restaurants
+
+
+def _r(name, source, lat=None, lon=None, address="", rating=4.0):
+    return {"name": name, "rating": rating, "address": address, "lat": lat, "lon": lon, "source": source}
+
+
+def test_merge_folds_same_place_across_sources():
+    google = [
+        _r("Joe's Pizza NYC", "google_places", 40.7306, -74.0021, rating=4.6),
+        _r("Katz's Delicatessen", "google_places", 40.7223, -73.9874),
+    ]
+    yelp = [
+        _r("Joe's Pizza", "yelp", 40.7307, -74.0022, rating=4.0),
+        _r("Joe's Pizza", "yelp", 40.7580, -73.9855),        # another branch across town
+        _r("Pizza Suprema", "yelp", 40.7306, -74.0021),       # next door, different name
+    ]
+    merged = merge_restaurants([google, yelp])
+    assert [m["name"] for m in merged] == ["Joe's Pizza NYC", "Katz's Delicatessen", "Joe's Pizza", "Pizza Suprema"]
+    assert merged[0]["sources"] == ["google_places", "yelp"]
+    assert merged[0]["rating"] == 4.3
+
+
+def test_merge_without_coordinates_uses_street_address():
+    merged = merge_restaurants([
+        [_r("Trattoria Da Enzo", "google_places", address="Via dei Vascellari 29, Roma")],
+        [_r("Da Enzo", "yelp", address="Via dei Vascellari, 29"), _r("Da Enzo", "yelp", address="Via Roma 3")],
+    ])
+    assert [(m["name"], m["sources"]) for m in merged] == [
+        ("Trattoria Da Enzo", ["google_places", "yelp"]),
+        ("Da Enzo", ["yelp"]),
+    ]
+
+
+def test_sources_share_a_deadline_and_results_are_cached(monkeypatch):
+    calls = []
+
+    async def google(city, cuisine_types, price_range):
+        calls.append("google")
+        return [_r("Fast Place", "google_places", 41.9, 12.5)]
+
+    async def yelp(city, cuisine_types, price_range):
+        calls.append("yelp")
+        await asyncio.sleep(5)
+        return [_r("Slow Place", "yelp", 41.9, 12.5)]
+
+    async def fast_yelp(city, cuisine_types, price_range):
+        calls.append("yelp")
+        return [_r("Slow Place", "yelp", 41.9, 12.52)]
+
+    monkeypatch.setattr(restaurants_api, "GOOGLE_PLACES_KEY", "k")
+    monkeypatch.setattr(restaurants_api, "YELP_KEY", "k")
+    monkeypatch.setattr(restaurants_api, "RESTAURANT_DEADLINE", 0.05)
+    monkeypatch.setattr(restaurants_api, "_search_google_places", google)
+    monkeypatch.setattr(restaurants_api, "_search_yelp", yelp)
+
+    monkeypatch.setattr(restaurants_api, "RESTAURANT_PARTIAL_CACHE_TTL", 0.05)
+    restaurants_api._cache.clear()
+
+    first = asyncio.run(restaurants_api.search_restaurants("rome", ["Pizza"]))
+    second = asyncio.run(restaurants_api.search_restaurants("Rome, Italy", ["pizza"]))
+    assert [r["name"] for r in first] == ["Fast Place"] == [r["name"] for r in second]
+    assert calls == ["google", "yelp"]
+
+    # the partial list expires quickly; once both sources answer, the full merge is kept
+    time.sleep(0.1)
+    monkeypatch.setattr(restaurants_api, "RESTAURANT_DEADLINE", 10)
+    monkeypatch.setattr(restaurants_api, "_search_yelp", fast_yelp)
+    third = asyncio.run(restaurants_api.search_restaurants("rome", ["pizza"]))
+    time.sleep(0.1)
+    fourth = asyncio.run(restaurants_api.search_restaurants("rome", ["pizza"]))
+    assert [r["name"] for r in third] == ["Fast Place", "Slow Place"] == [r["name"] for r in fourth]
+    assert calls == ["google", "yelp", "google", "yelp"]
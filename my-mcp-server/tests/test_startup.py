@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _run(code: str, env: dict | None = None) -> str:
+    out = subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+        env={**os.environ, **(env or {})},
+    )
+    return out.stdout.strip()
+
+
+def _eager_modules(entry: str, modules: list[str], env: dict | None = None) -> list[str]:
+    code = f"import sys, {entry}; print(','.join(m for m in {modules!r} if m in sys.modules))"
+    return [m for m in _run(code, env).split(",") if m]
+
+
+def test_main_defers_service_imports():
+    assert _eager_modules("main", ["services.ai_trip_planner", "core.http_client"]) == []
+
+
+def test_mcp_http_server_defers_fetch_imports_and_checks_tokens_without_a_key():
+    pytest.importorskip("fastmcp")
+    env = {"AUTH_TOKEN": "secret", "MY_NUMBER": "0"}
+    assert _eager_modules("mcp_http_server", ["readabilipy", "markdownify"], env) == []
+    code = (
+        "import asyncio, mcp_http_server as m; "
+        "print(asyncio.run(m.mcp.auth.verify_token('secret')).client_id, asyncio.run(m.mcp.auth.verify_token('nope')))"
+    )
+    assert _run(code, env).splitlines()[-1] == "puch-client None"
@@ -0,0 +1,97 @@
+import asyncio
+import json
+
+import httpx
+from fastapi.testclient import TestClient
+
+import core.http_client as http_client
+import core.tracing as tracing
+from core.tasks import gather_cancelling
+from main import app
+
+
+def _use_file_exporter(monkeypatch, tmp_path, rate=1.0):
+    exporter = tracing.TraceExporter(kind="file", path=str(tmp_path / "traces.jsonl"), flush_interval=60)
+    monkeypatch.setattr(tracing, "TRACE_EXPORTER", "file")
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", rate)
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    return exporter
+
+
+def _read(exporter):
+    exporter.close()
+    with open(exporter.path) as fh:
+        return [json.loads(line) for line in fh]
+
+
+def test_spans_nest_across_provider_tasks_and_retries(tmp_path, monkeypatch):
+    exporter = _use_file_exporter(monkeypatch, tmp_path)
+    seen_ids = []
+    calls = {"n": 0}
+
+    def handler(request):
+        seen_ids.append(request.headers.get("x-request-id"))
+        calls["n"] += 1
+        if calls["n"] == 1:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"ok": True})
+
+    async def run():
+        monkeypatch.setattr(http_client, "_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        async def provider():
+            tracing.annotate("cache", "miss")
+            return await http_client.get_json("https://api.example.com/v1/things", backoff=0)
+
+        with tracing.start_trace("POST /plan-trip/", request_id="req-1"):
+            with tracing.span("generate_itinerary"):
+                return await gather_cancelling(
+                    tracing.traced_await("provider.a", provider()),
+                    tracing.traced_await("provider.b", asyncio.sleep(0, result="b")),
+                )
+
+    assert asyncio.run(run()) == [{"ok": True}, "b"]
+    assert seen_ids == ["req-1", "req-1"]
+
+    [trace] = _read(exporter)
+    assert trace["request_id"] == "req-1"
+    spans = {s["name"]: s for s in trace["spans"] if not s["name"].startswith("HTTP")}
+    attempts = [s for s in trace["spans"] if s["name"] == "HTTP GET"]
+    assert spans["generate_itinerary"]["parent_id"] == spans["POST /plan-trip/"]["span_id"]
+    assert spans["provider.a"]["parent_id"] == spans["generate_itinerary"]["span_id"]
+    assert spans["provider.b"]["parent_id"] == spans["generate_itinerary"]["span_id"]
+    assert spans["provider.a"]["attributes"]["cache"] == "miss"
+    assert [a["attributes"]["http.status_code"] for a in attempts] == [503, 200]
+    assert attempts[1]["attributes"]["retry"] is True
+    assert all(a["parent_id"] == spans["provider.a"]["span_id"] for a in attempts)
+
+
+def test_unsampled_requests_record_nothing_but_keep_the_request_id(tmp_path, monkeypatch):
+    exporter = _use_file_exporter(monkeypatch, tmp_path, rate=0.0)
+    with tracing.start_trace("GET /weather/", request_id="req-2") as root:
+        with tracing.span("child") as child:
+            child.set("ignored", True)
+            assert tracing.current_request_id() == "req-2"
+            assert tracing.current_span() is None
+    assert root is tracing.NOOP_SPAN
+    assert tracing.current_request_id() is None
+    assert exporter.flush() == 0
+
+
+def test_incoming_traceparent_is_continued_and_exported_as_otlp(tmp_path, monkeypatch):
+    exporter = _use_file_exporter(monkeypatch, tmp_path, rate=0.0)
+    parent = "00-" + "ab" * 16 + "-" + "cd" * 8 + "-01"
+    response = TestClient(app).get("/health", headers={"traceparent": parent, "x-request-id": "req-3"})
+    assert response.headers["x-request-id"] == "req-3"
+
+    traces = list(exporter._queue)
+    [trace] = traces
+    body = tracing.to_otlp(traces)
+    [otlp_span] = body["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert otlp_span["traceId"] == "ab" * 16
+    assert otlp_span["parentSpanId"] == "cd" * 8
+    assert otlp_span["name"] == "GET /health"
+    attributes = {a["key"]: a["value"] for a in otlp_span["attributes"]}
+    assert attributes["http.status_code"] == {"intValue": "200"}
+    assert attributes["request.id"] == {"stringValue": "req-3"}
+    assert _read(exporter)[0]["trace_id"] == trace.trace_id
@@ -0,0 +1,127 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+import services.trip_export as trip_export
+import services.trip_store as trip_store
+from main import app
+from services.trip_export import ExportManager, export_digest, render_ics, render_pdf
+
+TRIP = {
+    "destination": "Rome",
+    "start_date": "2025-09-01",
+    "end_date": "2025-09-02",
+    "itinerary": [
+        {"date": "2025-09-01", "activities": ["Visit Colosseum, then lunch"]},
+        {"date": "2025-09-02", "activities": []},
+    ],
+}
+
+
+def test_render_ics_has_one_event_per_day():
+    ics = render_ics("abc", TRIP).decode()
+    assert ics.startswith("BEGIN:VCALENDAR\r\n")
+    assert ics.count("BEGIN:VEVENT") == 2
+    assert "DTSTART;VALUE=DATE:20250901" in ics
+    assert "Visit Colosseum\\, then lunch" in ics
+
+
+def test_render_pdf_is_well_formed():
+    pdf = render_pdf("abc", TRIP)
+    assert pdf.startswith(b"%PDF-1.4") and pdf.rstrip().endswith(b"%%EOF")
+    xref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    assert pdf[xref:xref + 4] == b"xref"
+
+
+def test_export_digest_is_content_addressed():
+    assert export_digest("abc", TRIP, "pdf") == export_digest("abc", dict(TRIP), "pdf")
+    assert export_digest("abc", TRIP, "pdf") != export_digest("abc", TRIP, "calendar")
+
+
+def _stored_trip(tmp_path, monkeypatch, workers=1):
+    store = trip_store.TripStore(path=str(tmp_path / "trips.db"))
+    manager = ExportManager(export_dir=str(tmp_path / "exports"), workers=workers)
+    monkeypatch.setattr(trip_store, "_store", store)
+    monkeypatch.setattr(trip_export, "_manager", manager)
+    trip_id = asyncio.run(store.save({"request": {"destination": "Rome"}, "trip_data": TRIP}))
+    return trip_id, store, manager
+
+
+def test_request_reports_pending_then_shares_the_render(tmp_path):
+    manager = ExportManager(export_dir=str(tmp_path), workers=1)
+
+    async def run():
+        pending = await manager.request("abc", TRIP, "calendar", wait=0)
+        again = await manager.request("abc", TRIP, "calendar", wait=0)
+        assert len(manager._inflight) == 1  # the second call joined the first render
+        ready = await manager.request("abc", TRIP, "calendar", wait=60)
+        return pending, again, ready
+
+    try:
+        pending, again, ready = asyncio.run(run())
+    finally:
+        manager.close()
+    assert pending["status"] == again["status"] == "pending"
+    assert ready["status"] == "ready" and ready["filename"] == pending["filename"]
+    assert ready["filename"] == f"{export_digest('abc', TRIP, 'calendar')}.ics"
+    assert (tmp_path / ready["filename"]).read_bytes().startswith(b"BEGIN:VCALENDAR")
+    assert not manager._inflight and not list(tmp_path.glob("*.tmp"))
+
+
+def test_export_endpoint_renders_in_the_worker_pool(tmp_path, monkeypatch):
+    trip_id, store, manager = _stored_trip(tmp_path, monkeypatch)
+    client = TestClient(app)
+    try:
+        assert client.get(f"/api/v1/travel/export/{trip_id}/docx").status_code == 400
+        assert client.get("/api/v1/travel/export/missing/pdf").status_code == 404
+
+        deadline = time.monotonic() + 60
+        while True:
+            export = client.get(f"/api/v1/travel/export/{trip_id}/pdf").json()
+            if export["status"] == "ready" or time.monotonic() > deadline:
+                break
+            assert export["status"] == "pending"
+        assert export["status"] == "ready" and export["size"] > 0
+        assert export["download_url"] == f"/api/v1/travel/downloads/{export_digest(trip_id, TRIP, 'pdf')}.pdf"
+        download = client.get(export["download_url"])
+        assert download.status_code == 200 and download.content.startswith(b"%PDF-1.4")
+    finally:
+        manager.close()
+        store.close()
+
+
+def test_downloads_support_ranges_and_conditional_requests(tmp_path, monkeypatch):
+    trip_id, store, manager = _stored_trip(tmp_path, monkeypatch)
+    digest = export_digest(trip_id, TRIP, "calendar")
+    body = render_ics(trip_id, TRIP)
+    (tmp_path / "exports" / f"{digest}.ics").write_bytes(body)
+    url = f"/api/v1/travel/downloads/{digest}.ics"
+    client = TestClient(app)
+    try:
+        full = client.get(url, headers={"Accept-Encoding": "gzip"})
+        assert full.status_code == 200 and full.content == body
+        assert full.headers["etag"] == f'"{digest}"'
+        assert full.headers["accept-ranges"] == "bytes"
+        assert full.headers["content-type"].startswith("text/calendar")
+        assert "content-encoding" not in full.headers
+
+        head = client.get(url, headers={"Range": "bytes=0-14"})
+        assert head.status_code == 206 and head.content == body[:15]
+        assert head.headers["content-range"] == f"bytes 0-14/{len(body)}"
+        tail = client.get(url, headers={"Range": "bytes=-10"})
+        assert tail.status_code == 206 and tail.content == body[-10:]
+
+        unsatisfiable = client.get(url, headers={"Range": f"bytes={len(body)}-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == f"bytes */{len(body)}"
+
+        cached = client.get(url, headers={"If-None-Match": f'"{digest}"'})
+        assert cached.status_code == 304 and cached.content == b""
+
+        # only content-addressed names inside EXPORT_DIR are served
+        for name in (f"{digest}.txt", f"{digest[:10]}.ics", "..%2Ftrips.db", f"{'0' * 64}.ics"):
+            assert client.get(f"/api/v1/travel/downloads/{name}").status_code == 404
+    finally:
+        manager.close()
+        store.close()
@@ -0,0 +1,20 @@
+import asyncio
+
+from services.trip_store import TripStore
+
+
+def test_trip_store_round_trip(tmp_path):
+    store = TripStore(path=str(tmp_path / "trips.db"), cache_size=1)
+    plan = {"request": {"destination": "Tokyo"}, "trip_data": {"itinerary": [{"date": "2025-09-01", "activities": []}]}}
+
+    async def run():
+        first = await store.save(plan)
+        second = await store.save({"request": {"destination": "Rome"}, "trip_data": {}})
+        # first was evicted from the LRU, so this read comes from SQLite
+        return await store.get(first), await store.get(second), await store.get("missing")
+
+    loaded, other, missing = asyncio.run(run())
+    store.close()
+    assert loaded == plan
+    assert other["request"]["destination"] == "Rome"
+    assert missing is None
@@ -0,0 +1,83 @@
+import asyncio
+
+import services.visa_api as visa_api
+import services.visa_data as visa_data
+from services.visa_data import VisaMatrix, VisaRule, build_visa_matrix, encode_matrix
+
+
+def _write_source(path, rows):
+    path.write_text("Passport,Destination,Requirement\n" + "".join(f"{p},{d},{r}\n" for p, d, r in rows))
+
+
+def test_matrix_round_trip():
+    matrix = VisaMatrix(encode_matrix([
+        ("US", "JP", "90"), ("IN", "GB", "visa required"), ("GB", "US", "eta"), ("us", "us", "-1"), ("XXX", "JP", "90"),
+    ], built_at=1700000000, updated="2025-06-01"))
+    assert matrix.size == 4
+    assert matrix.built_at == 1700000000
+    assert matrix.updated == "2025-06-01"
+    assert matrix.passports == {"US", "IN", "GB"}
+    assert matrix.lookup("US", "JP") == VisaRule("visa_free", 90)
+    assert matrix.lookup("in", "gb") == VisaRule("visa_required", None)
+    assert matrix.lookup("US", "US") == VisaRule("citizen", None)
+    assert matrix.lookup("JP", "US") is None  # both known, pair not in the dataset
+    assert matrix.lookup("FR", "JP") is None
+
+
+def test_refresh_swaps_file_and_readers_remap(tmp_path, monkeypatch):
+    source, out = tmp_path / "visa.csv", tmp_path / "visa.bin"
+    _write_source(source, [("US", "BR", "90")])
+    monkeypatch.setattr(visa_data, "VISA_SOURCE_PATH", str(source))
+    monkeypatch.setattr(visa_data, "VISA_MATRIX_PATH", str(out))
+    monkeypatch.setattr(visa_data, "VISA_DATA_CHECK_INTERVAL", 0)
+    visa_data._matrix.reset()
+
+    old = visa_data.get_visa_matrix()  # compiled on first use
+    assert old.lookup("US", "BR") == VisaRule("visa_free", 90)
+
+    fresh = tmp_path / "fresh.csv"
+    _write_source(fresh, [("US", "BR", "e-visa")])
+    build_visa_matrix(str(fresh), str(out))
+    assert visa_data.get_visa_matrix().lookup("US", "BR") == VisaRule("e_visa", None)
+    # the old mapping stays readable after the swap
+    assert old.lookup("US", "BR") == VisaRule("visa_free", 90)
+    assert not list(tmp_path.glob("*.tmp"))
+    visa_data._matrix.reset()
+
+
+def test_visa_and_safety_are_served_locally(monkeypatch):
+    async def no_network(*args, **kwargs):
+        raise AssertionError("remote visa API called")
+
+    monkeypatch.setattr(visa_api, "get_json", no_network)
+    visa = asyncio.run(visa_api.check_visa_requirements("New York", "Tokyo"))
+    assert visa["source"] == "visa_matrix"
+    assert visa["visa_required"] is False
+    assert visa["duration"] == "90 days"
+    assert visa["last_updated"] == "2025-06-01"  # the dataset's date, not when it was compiled
+
+    safety = asyncio.run(visa_api.get_safety_advisories("Paris"))
+    assert safety["source"] == "advisory_index"
+    assert safety["safety_level"] == 2
+    assert "Terrorism" in safety["advisories"]
+
+
+def test_uncovered_passports_go_to_the_remote_api(monkeypatch):
+    asked = []
+
+    async def fake_get_json(url, params=None, **kwargs):
+        asked.append(params)
+        return {"visa_required": True, "visa_type": "e_visa"}
+
+    monkeypatch.setattr(visa_api, "get_json", fake_get_json)
+    # BR is in the matrix as a destination, but no Brazilian passport rules are bundled
+    visa = asyncio.run(visa_api.check_visa_requirements("BR", "JP"))
+    assert asked == [{"origin": "BR", "destination": "JP"}]
+    assert visa["source"] == "visa_api" and visa["passport_covered"] is False
+
+    async def down(*args, **kwargs):
+        raise OSError("unreachable")
+
+    monkeypatch.setattr(visa_api, "get_json", down)
+    visa = asyncio.run(visa_api.check_visa_requirements("BR", "JP"))
+    assert visa["source"] == "fallback" and visa["visa_required"] == "unknown"
@@ -0,0 +1,40 @@
+import asyncio
+
+import services.weather_api as weather_api
+from services.weather_api import aggregate_daily
+
+
+def _entry(stamp, temp, desc, pop):
+    return {"dt_txt": stamp, "main": {"temp": temp}, "weather": [{"description": desc}], "pop": pop}
+
+
+def test_aggregate_daily_min_max_mode_and_pop():
+    entries = [
+        _entry("2025-09-01 09:00:00", 18.0, "light rain", 0.7),
+        _entry("2025-09-01 12:00:00", 22.5, "clear sky", 0.1),
+        _entry("2025-09-01 15:00:00", 21.0, "light rain", 0.4),
+        _entry("2025-09-02 00:00:00", 15.0, "few clouds", None),
+    ]
+    first, second = aggregate_daily(entries)
+    assert first["date"] == "2025-09-01"
+    assert (first["temp_min"], first["temp_max"]) == (18.0, 22.5)
+    assert first["description"] == "light rain"
+    assert first["pop_max"] == 0.7
+    assert [p["time"] for p in first["pop_hourly"]] == ["09:00", "12:00", "15:00"]
+    assert second["pop_max"] is None and second["description"] == "few clouds"
+
+
+def test_get_forecasts_dedupes_spellings_and_maps_failures_to_none(monkeypatch):
+    calls = []
+
+    async def fake_get_forecast(city=None, units="metric", lat=None, lon=None):
+        calls.append(city or (lat, lon))
+        if city == "Atlantis":
+            raise RuntimeError("upstream down")
+        return [{"date": "2025-09-01"}]
+
+    monkeypatch.setattr(weather_api, "get_forecast", fake_get_forecast)
+    result = asyncio.run(weather_api.get_forecasts(["Tokyo", " tokyo", "Atlantis"]))
+    assert len(calls) == 2  # both Tokyo spellings share one fetch
+    assert result["Tokyo"] == result[" tokyo"] == [{"date": "2025-09-01"}]
+    assert result["Atlantis"] is None